@@ -1,125 +1,499 @@
 """
 Buckeling Automation Logic
-Handles the automation workflow for processing depth and surface weight inputs
+Handles the automation workflow for processing depth and surface weight
+(or depth and WOB, in Bottom Up mode) inputs
 """
 from __future__ import annotations
 
 import time
-from typing import Any, Callable, Dict, List, Optional
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from Button_Repository import Button_Repository
+from automation_backend import AutomationBackend
+from batch_scheduler import OrderedResults, changed_fields, plan_batch
+from completion_wait import DEFAULT_ROW_TIMEOUT, CancelToken, CompletionCancelledError, CompletionWaiter
+from input_values import ROW_MODES, row_inputs
+from instrumentation import NULL_TRACER, InstrumentedBackend, TraceCollector
+from recovery import DEFAULT_RECOVERY, STALE, WINDOW, RecoveryPolicy, classify_failure
+from result_cache import ResultCache
+from result_export import MultiSink, ResultSink, export_record
+from run_journal import RunJournal
+
+if TYPE_CHECKING:
+    # numpy is only loaded once a batch runs
+    from result_store import ResultStore
+
+
+# Backend method selecting each row mode, and typing each input
+MODE_BUTTONS = {
+    "surface_weight": "Surface_Weight_Button",
+    "bottom_up": "Bottom_Up_Button",
+}
+FIELD_SETTERS = {
+    "depth": "Depth_Value",
+    "surface_weight": "Surface_Weight_Button_Value",
+    "wob": "WOB_input_box",
+}
+
+
+def cache_key_inputs(inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """Inputs a row's result is cached under: its mode's fields, without the mode"""
+    # Surface Weight rows keep the cache keys they had before rows had a mode
+    return {name: inputs[name] for name in ROW_MODES[inputs["mode"]][1]}
 
 
 def run_automation_batch(
     data_list: List[Dict[str, Any]],
     status_callback: Optional[Callable[[str], None]] = None,
     result_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
-    stop_check: Optional[Callable[[], bool]] = None
-) -> List[Dict[str, Any]]:
+    stop_check: Optional[Callable[[], bool]] = None,
+    row_timeout: float = DEFAULT_ROW_TIMEOUT,
+    cache: Optional[ResultCache] = None,
+    repo: Optional[AutomationBackend] = None,
+    journal: Optional[RunJournal] = None,
+    trace_callback: Optional[Callable[[TraceCollector], None]] = None,
+    sink: Optional[ResultSink] = None,
+    cancel_token: Optional[CancelToken] = None,
+    recovery: Optional[RecoveryPolicy] = DEFAULT_RECOVERY,
+    store: Optional[ResultStore] = None
+) -> ResultStore:
     """
     Execute automation for a batch of input rows.
-    
+
     Parameters
     ----------
     data_list : List[Dict[str, Any]]
-        List of input dictionaries with 'depth' and 'surface_weight' keys
+        List of input dictionaries with 'depth' and 'surface_weight' or 'wob'
+        keys and an optional 'mode' (see input_values.ROW_MODES); rows of
+        different modes may be mixed
     status_callback : Optional[Callable[[str], None]]
         Function to call with status updates
     result_callback : Optional[Callable[[Dict[str, Any]], None]]
-        Function to call with each result as it's generated
+        Function to call with each result, in the original row order; it
+        receives the ResultRow just stored, a read-only mapping
     stop_check : Optional[Callable[[], bool]]
         Function that returns True if automation should stop
-        
+    row_timeout : float
+        Seconds to wait for Orpheus to produce a new FOE value after Refresh
+        before raising CompletionTimeoutError
+    cache : Optional[ResultCache]
+        Result cache; rows already measured for the loaded model are answered
+        from it without touching the Orpheus UI
+    repo : Optional[AutomationBackend]
+        Already connected backend to drive (a Button_Repository, or a
+        SimulatedOrpheus for tests and benchmarks); a new connection to the
+        Orpheus window is made when omitted
+    journal : Optional[RunJournal]
+        Run journal; every completed row is appended (fsync'd) before the
+        next one starts. Rows already in the journal with the same inputs
+        are answered from it, which resumes an interrupted run. Failed rows
+        are not journaled, and a run with failed rows is not marked
+        finished, so resuming it runs them again.
+    trace_callback : Optional[Callable[[TraceCollector], None]]
+        When given, every backend operation and wait is timed and the
+        TraceCollector (latency histograms, per-row spans, JSON/CSV export)
+        is passed to this function when the batch ends. Off by default.
+    sink : Optional[ResultSink]
+        Export sink (see result_export); receives one record per row with
+        row number, inputs, FOE, source and seconds as soon as the row is
+        finished, which may be before an earlier row (the row number gives
+        the input order). The caller closes it.
+    cancel_token : Optional[CancelToken]
+        Stops the batch like stop_check, but also interrupts the wait for a
+        Refresh in progress instead of only being seen between rows
+    recovery : Optional[RecoveryPolicy]
+        How a failing row is retried (see recovery.py): warning dialogs are
+        dismissed, a lost window is reconnected and the row is tried again
+        after a delay. A row that keeps failing gets an empty FOE and an
+        "Error" instead of stopping the batch. None fails fast.
+    store : Optional[ResultStore]
+        Results are appended to this store, e.g. one another thread displays
+        while the batch runs; a new store is created when omitted
+
     Returns
     -------
-    List[Dict[str, Any]]
-        List of result dictionaries containing depth, surface_weight, and foe_value
+    ResultStore
+        One result per input row, in input order, as typed columns with the
+        source and seconds of every row. results[i] reads like a result
+        dictionary ("WOB Buckeling", and "Error" for failed rows). Duplicate
+        rows are evaluated once and share a result. If stopped early, every
+        row that finished is stored (and journaled); rows before it that did
+        not finish have status "not run" and no FOE.
     """
-    results = []
-    
-    # Connect to application once
-    if status_callback:
-        status_callback("Connecting to application...")
-    repo = Button_Repository()
-    #time.sleep(0.5)
-    
-    # Click Surface Weight button once
+    from result_store import FAILED, NOT_RUN, OrderedStoreSink, ResultStore
+
+    results = ResultStore() if store is None else store
+    start = len(results)
+    # Rows finish out of order; the store takes them in input order
+    store_sink = OrderedStoreSink(results)
+    try:
+        for position, _ in enumerate(iter_automation_batch(
+            data_list,
+            status_callback=status_callback,
+            stop_check=stop_check,
+            row_timeout=row_timeout,
+            cache=cache,
+            repo=repo,
+            journal=journal,
+            trace_callback=trace_callback,
+            # Every row reaches the store (and the caller's sink) before it is yielded
+            sink=store_sink if sink is None else MultiSink(store_sink, sink),
+            cancel_token=cancel_token,
+            recovery=recovery,
+        ), start):
+            if result_callback:
+                result_callback(results[position])
+    finally:
+        store_sink.flush(data_list)
     if status_callback:
-        status_callback("Selecting Surface Weight option...")
-    repo.Surface_Weight_Button()
-    #time.sleep(0.5)
-    
-    total_rows = len(data_list)
-    previous_foe = ""
-
-    #Get surface load
-    surface_load = repo.Surface_Load()
-    Depth_Value_current = repo.Depth_Value_get()
-    previous_foe = repo.FOE_Value()
-    
-    for idx, row in enumerate(data_list):
-        # Check if we should stop
-        if stop_check and stop_check():
-            if status_callback:
-                status_callback("Stopped by user")
-            break
-            
-        depth = row.get("depth", "")
-        weight = row.get("surface_weight", "")
-        
+        failed = results.count(FAILED, start)
+        completed = len(results) - start - results.count(NOT_RUN, start)
+        status_callback(f"Completed {completed} rows" + (f" ({failed} failed)" if failed else ""))
+
+    return results
+
+
+def iter_automation_batch(
+    rows: Iterable[Dict[str, Any]],
+    status_callback: Optional[Callable[[str], None]] = None,
+    result_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    stop_check: Optional[Callable[[], bool]] = None,
+    row_timeout: float = DEFAULT_ROW_TIMEOUT,
+    cache: Optional[ResultCache] = None,
+    repo: Optional[AutomationBackend] = None,
+    journal: Optional[RunJournal] = None,
+    chunk_size: Optional[int] = None,
+    trace_callback: Optional[Callable[[TraceCollector], None]] = None,
+    sink: Optional[ResultSink] = None,
+    cancel_token: Optional[CancelToken] = None,
+    recovery: Optional[RecoveryPolicy] = DEFAULT_RECOVERY
+) -> Iterator[Dict[str, Any]]:
+    """
+    Generator form of run_automation_batch: yields each result in input order.
+
+    rows may be any iterable, e.g. rows streamed from a file. With chunk_size
+    set, rows are read, planned and run chunk_size at a time, so only one
+    chunk is ever held in memory; otherwise the whole input is planned at once.
+    The Orpheus connection is made once and reused for every chunk.
+    With a journal, row indices count from the first row of rows.
+    """
+    # Connect to application once
+    if repo is None:
         if status_callback:
-            status_callback(f"Processing row {idx + 1}/{total_rows}...")
-        
+            status_callback("Connecting to application...")
+        # Imported here so the engine also runs against simulated backends off Windows
+        from Button_Repository import Button_Repository
+        repo = Button_Repository()
+    #time.sleep(0.5)
 
+    tracer = TraceCollector() if trace_callback else NULL_TRACER
+    if tracer.enabled:
+        repo = InstrumentedBackend(repo, tracer)
 
-        if surface_load == weight and Depth_Value_current == depth :
-            repo.Surface_Weight_Button_Value(float(weight) + 1000)
+    # The mode option is clicked before the first row that needs it, and again
+    # only when the plan moves on to rows of the other mode
+    runner = _BatchRunner(repo, status_callback, result_callback, stop_check, cache, journal)
+    runner.sink = sink
+    runner.tracer = tracer
+    runner.cancel_token = cancel_token
+    runner.recovery = recovery
+    runner.row_timeout = row_timeout
+    runner.read_state()
+    runner.model = repo.Model_Fingerprint() if cache is not None else ""
+    runner.connect_waiter()
+    try:
+        if chunk_size is None:
+            chunks: Iterable[List[Dict[str, Any]]] = [list(rows)]
+        else:
+            iterator = iter(rows)
+            chunks = iter(lambda: list(islice(iterator, chunk_size)), [])
+        for chunk in chunks:
+            yield from runner.run_chunk(chunk)
+            if runner.stopped:
+                break
+        else:
+            # Left open while failed rows remain, so the run is offered for resume
+            if journal is not None and not runner.failed_rows:
+                journal.finish()
+    finally:
+        runner.waiter.close()
+        if trace_callback:
+            trace_callback(tracer)
 
-            #Refresh
-            foe_result= repo.FOE_Value()
-            repo.Refresh()
-            while foe_result == previous_foe:
-                time.sleep(1)
-                foe_result = repo.FOE_Value()
 
-        repo.Surface_Weight_Button_Value(weight)
-        repo.Depth_Value(depth)
+class _BatchRunner:
+    """Orpheus state carried across planned chunks of one batch"""
 
+    def __init__(self, repo, status_callback, result_callback, stop_check, cache, journal):
+        self.repo = repo
+        self.journal = journal
+        self.status_callback = status_callback
+        self.result_callback = result_callback
+        self.stop_check = stop_check
+        self.cache = cache
+        self.model = ""
+        self.waiter: Optional[CompletionWaiter] = None
+        self.tracer = NULL_TRACER
+        self.sink: Optional[ResultSink] = None
+        self.cancel_token: Optional[CancelToken] = None
+        self.recovery: Optional[RecoveryPolicy] = None
+        self.row_timeout = DEFAULT_ROW_TIMEOUT
+        self.consecutive_failures = 0
+        self.last_source = ""
+        self.current_inputs: Dict[str, Any] = {}
+        self.previous_foe: Any = ""
+        # True once previous_foe was calculated by this batch for current_inputs
+        self.foe_current = False
+        self.rows_done = 0
+        self.rows_seen = 0
+        # Rows recorded with an error (and left out of the journal)
+        self.failed_rows = 0
+        self.stopped = False
 
-        # Set surface weight value
-        #repo.Surface_Weight_Button_Value(weight)
+    def run_chunk(self, data_list: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Plan one chunk of rows and yield its results in input order"""
+        data_list = [row_inputs(row) for row in data_list]
+        offset = self.rows_seen
+        self.rows_seen += len(data_list)
+        released: List[Dict[str, Any]] = []
+        ordered = OrderedResults(len(data_list), released.append)
 
-        foe_result = repo.FOE_Value()
+        # Rows finished in an earlier, interrupted run come straight from the journal
+        resumed = set()
+        if self.journal is not None:
+            for idx, row in enumerate(data_list):
+                result_data = self.journal.completed_result(offset + idx, row)
+                if result_data is not None:
+                    resumed.add(idx)
+                    self._export(offset + idx, data_list[idx], result_data, "journal", 0.0)
+                    ordered.add_row(idx, result_data)
+            if resumed and self.status_callback:
+                self.status_callback(f"Resumed {len(resumed)} rows from the run journal")
+        todo = [idx for idx in range(len(data_list)) if idx not in resumed]
 
+        # Collapse duplicates and order rows so consecutive steps share an input
+        plan = plan_batch([data_list[idx] for idx in todo], self.current_inputs)
+        for step in plan.steps:
+            step.row_indices = [todo[position] for position in step.row_indices]
+        if self.status_callback and plan.duplicate_rows:
+            self.status_callback(f"Planned {len(plan.steps)} unique rows ({plan.duplicate_rows} duplicates)")
 
-        #Refresh
-        foe_result= repo.FOE_Value()
-        repo.Refresh()
-        while foe_result == previous_foe:
-            time.sleep(1)
-            foe_result = repo.FOE_Value()
+        def release():
+            for result_data in released:
+                # Notify caller of new result
+                if self.result_callback:
+                    self.result_callback(result_data)
+                yield result_data
+            released.clear()
 
+        yield from release()
+        for idx, step in enumerate(plan.steps):
+            # Check if we should stop
+            if self._should_stop():
+                self._stop()
+                return
 
-        # Read FOE value
-        #foe_result = repo.FOE_Value()
-        
-        # Create result record
-        result_data = {
-            "WOB Buckeling": foe_result
-        }
-        
-        results.append(result_data)
-        
-        # Notify caller of new result
-        if result_callback:
-            result_callback(result_data)
+            if self.status_callback:
+                self.status_callback(
+                    f"Processing row {self.rows_done + idx + 1}/{self.rows_done + len(plan.steps)}..."
+                )
 
-        previous_foe = foe_result
-    
-    if status_callback:
-        status_callback(f"Completed {len(results)} rows")
-        
-    return results
+            started = time.perf_counter()
+            try:
+                with self.tracer.row(step.inputs) as span:
+                    foe_result, error = self._evaluate_with_recovery(step.inputs)
+                    span["source"] = self.last_source
+            except CompletionCancelledError:
+                # Cancelled during the Refresh wait; this row is left for a resume
+                self._stop()
+                return
+            seconds = time.perf_counter() - started
+
+            result_data = {"WOB Buckeling": foe_result}
+            if error:
+                result_data["Error"] = error
+                self.failed_rows += len(step.row_indices)
+            # Journaled and exported as soon as it is known, so a stopped run loses no
+            # finished row; the record's row number carries the input order
+            for row_idx in step.row_indices:
+                # Failed rows are not journaled, so a resume tries them again
+                if self.journal is not None and not error:
+                    self.journal.record(offset + row_idx, data_list[row_idx], result_data)
+                self._export(offset + row_idx, data_list[row_idx], result_data, self.last_source, seconds)
+            # Result record is released to the caller in original row order
+            ordered.add(step, result_data)
+            yield from release()
+
+        self.rows_done += len(plan.steps)
+
+    def _export(self, index: int, inputs: Dict[str, Any], result_data: Dict[str, Any], source: str, seconds: float):
+        if self.sink is not None:
+            self.sink.write(export_record(index, inputs, result_data, source, seconds))
+
+    def read_state(self):
+        """Take the inputs, mode and FOE Orpheus currently shows"""
+        repo = self.repo
+        # One round trip for every field where the backend supports it
+        snapshot = repo.Snapshot() if hasattr(repo, "Snapshot") else None
+        if snapshot is not None:
+            self.current_inputs = {
+                "mode": snapshot.get("mode") or "",
+                "depth": snapshot["depth"],
+                "surface_weight": snapshot["surface_weight"],
+                "wob": snapshot.get("wob", ""),
+            }
+            self.previous_foe = snapshot["foe"]
+        else:
+            # Selected mode unknown: the next row always clicks its option
+            self.current_inputs = {
+                "mode": "",
+                "depth": repo.Depth_Value_get(),
+                "surface_weight": repo.Surface_Load(),
+                "wob": "",
+            }
+            self.previous_foe = repo.FOE_Value()
+        self.foe_current = False
+
+    def connect_waiter(self):
+        """(Re)create the completion waiter, keeping the learned Refresh latency"""
+        latency = None
+        if self.waiter is not None:
+            latency = self.waiter.latency
+            self.waiter.close()
+        # Wakes on FOE value-changed events, falls back to adaptive polling
+        subscribe = getattr(self.repo, "subscribe_value_changed", None)
+        self.waiter = CompletionWaiter(
+            self.repo.FOE_Value,
+            subscribe=(lambda callback: subscribe("txtFOE/txtData", callback)) if subscribe else None,
+            timeout=self.row_timeout,
+            latency=latency,
+            cancel_token=self.cancel_token,
+        )
+
+    def _should_stop(self) -> bool:
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return True
+        return bool(self.stop_check and self.stop_check())
+
+    def _stop(self):
+        if self.status_callback:
+            self.status_callback("Stopped by user")
+        self.stopped = True
+
+    def _evaluate_with_recovery(self, inputs: Dict[str, Any]) -> Tuple[Any, str]:
+        """
+        _evaluate, retried according to the recovery policy.
+        Returns (FOE, "") or, for a row that kept failing, ("", error).
+        """
+        attempt = 1
+        while True:
+            try:
+                foe_result = self._evaluate(inputs)
+                self.consecutive_failures = 0
+                return foe_result, ""
+            except CompletionCancelledError:
+                raise
+            except Exception as exc:
+                if self.recovery is None:
+                    raise
+                kind = classify_failure(exc)
+                if kind not in self.recovery.retry_kinds or attempt >= self.recovery.max_attempts:
+                    return "", self._fail_row(kind, exc)
+                delay = self.recovery.delay(attempt)
+                if self.status_callback:
+                    self.status_callback(
+                        f"Row failed ({kind}: {exc}); retry {attempt}/{self.recovery.max_attempts - 1} in {delay:g}s"
+                    )
+                with self.tracer.span("recovery"):
+                    self._recover(kind, delay)
+                attempt += 1
+
+    def _recover(self, kind: str, delay: float):
+        """Wait, dismiss dialogs, reconnect if needed and re-read Orpheus before a retry"""
+        if self.cancel_token is not None:
+            if self.cancel_token.wait(delay):
+                raise CompletionCancelledError("Recovery cancelled")
+        else:
+            time.sleep(delay)
+        repo = self.repo
+        try:
+            if hasattr(repo, "Dismiss_Dialogs"):
+                dismissed = repo.Dismiss_Dialogs()
+                if dismissed and self.status_callback:
+                    self.status_callback(f"Dismissed {dismissed} Orpheus dialog(s)")
+            if kind in (STALE, WINDOW) and hasattr(repo, "Reconnect"):
+                repo.Reconnect()
+                self.connect_waiter()
+            self.read_state()
+        except Exception as exc:
+            # The retry will fail too and count towards max_attempts
+            if self.status_callback:
+                self.status_callback(f"Recovery failed: {exc}")
+            self.current_inputs = {"mode": ""}
+            self.foe_current = False
+
+    def _fail_row(self, kind: str, exc: Exception) -> str:
+        """Record a row as failed; stops the batch after too many failures in a row"""
+        self.consecutive_failures += 1
+        message = f"{kind}: {exc}"
+        if self.status_callback:
+            self.status_callback(f"Row failed, recorded as failed: {message}")
+        if self.consecutive_failures >= self.recovery.max_consecutive_failures:
+            raise RuntimeError(
+                f"{self.consecutive_failures} consecutive rows failed, stopping (last: {message})"
+            ) from exc
+        return message
+
+    def _evaluate(self, inputs: Dict[str, Any]) -> Any:
+        """FOE for one unique row, from the cache or by typing only the inputs that changed"""
+        repo, waiter = self.repo, self.waiter
+        mode = inputs["mode"]
+        fields = ROW_MODES[mode][1]
+
+        cache_inputs = cache_key_inputs(inputs)
+        if self.cache is not None:
+            with self.tracer.span("cache.get"):
+                cached_foe = self.cache.get(self.model, cache_inputs)
+            if cached_foe is not None:
+                self.last_source = "cache"
+                return cached_foe
+        self.last_source = "orpheus"
+
+        switched = mode != self.current_inputs.get("mode")
+        if switched:
+            if self.status_callback:
+                self.status_callback(f"Selecting {ROW_MODES[mode][0]} option...")
+            getattr(repo, MODE_BUTTONS[mode])()
+            self.current_inputs["mode"] = mode
+            self.foe_current = False
+
+        # Numeric comparison, so "5374" and "5,374.0" count as unchanged
+        changed = changed_fields(inputs, self.current_inputs)
+        if not changed and self.foe_current:
+            # Orpheus already shows the result for these inputs
+            foe_result = self.previous_foe
+        else:
+            # Load before depth, as an operator would type them
+            for name in reversed(fields):
+                if name in changed:
+                    getattr(repo, FIELD_SETTERS[name])(inputs[name])
+
+            #Refresh
+            waiter.arm()
+            repo.Refresh()
+            with self.tracer.span("wait.completion"):
+                # Completes on a new value or on a recompute event, even if FOE is unchanged;
+                # when polling, an unchanged FOE is taken once Orpheus has been quiet
+                # A mode switch alone may leave FOE as it was, like an unchanged row
+                foe_result = waiter.wait_for_refresh(self.previous_foe, expect_change=bool(changed))
+            self.foe_current = True
+
+        if self.cache is not None:
+            self.cache.put(self.model, cache_inputs, foe_result)
+
+        self.previous_foe = foe_result
+        self.current_inputs.update(inputs)
+        return foe_result
 
 
 if __name__ == "__main__":
@@ -128,18 +502,17 @@ if __name__ == "__main__":
         {"depth": "5374", "surface_weight": "138661.3"},
         {"depth": "5206", "surface_weight": "135469.6"},
     ]
-    
+
     def print_status(msg: str):
         print(f"Status: {msg}")
-    
+
     def print_result(result: Dict[str, Any]):
         print(f"Result: {result}")
-    
+
     results = run_automation_batch(
         test_data,
         status_callback=print_status,
         result_callback=print_result
     )
-    
-    print(f"\nFinal results: {results}")
 
+    print(f"\nFinal results: {[dict(result) for result in results]}")
@@ -1,15 +1,75 @@
-from pywinauto import Application, timings
+from pywinauto import Application, findwindows, handleprops, win32defines
 from pywinauto.findwindows import ElementNotFoundError
 from pywinauto.controls.uiawrapper import UIAWrapper
 from pywinauto.uia_element_info import UIAElementInfo
 from pywinauto.uia_defines import IUIA
-from pywinauto.uia_defines import get_elem_interface
-import time
-import comtypes.client
-from comtypes.gen.UIAutomationClient import IUIAutomation, TreeScope_Descendants
-from datetime import datetime
-import csv
+from pywinauto.uia_defines import NoPatternInterfaceError
+import ctypes
+import hashlib
+import re
+from comtypes import COMError, COMObject
+from comtypes.gen.UIAutomationClient import (
+    IUIAutomation,
+    IUIAutomationPropertyChangedEventHandler,
+    TreeScope_Children,
+    TreeScope_Descendants,
+    TreeScope_Element,
+    TreeScope_Subtree,
+)
 from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+from input_values import parse_number
+
+
+# Errors raised by a UIA element whose underlying control has been destroyed
+STALE_ELEMENT_ERRORS = (COMError, ElementNotFoundError)
+
+# UIA property ids reported when a text box is rewritten
+UIA_NAME_PROPERTY_ID = 30005
+UIA_VALUE_VALUE_PROPERTY_ID = 30045
+UIA_AUTOMATION_ID_PROPERTY_ID = 30011
+UIA_SELECTION_ITEM_IS_SELECTED_PROPERTY_ID = 30079
+UIA_CONTROL_TYPE_PROPERTY_ID = 30003
+UIA_VALUE_IS_READ_ONLY_PROPERTY_ID = 30046
+UIA_TOGGLE_TOGGLE_STATE_PROPERTY_ID = 30086
+UIA_EDIT_CONTROL_TYPE_ID = 50004
+
+# Snapshot keys -> automation id of the text box container (value is in its txtData child)
+SNAPSHOT_FIELDS = {
+    "surface_weight": "txtSW",
+    "depth": "txtDepth",
+    "wob": "txtWOB",
+    "foe": "txtFOE",
+}
+# Snapshot fields whose box not every Orpheus window has; read as "" when missing
+OPTIONAL_SNAPSHOT_FIELDS = ("wob",)
+# Snapshot "mode" -> automation id of the option button selecting it
+SNAPSHOT_MODES = {
+    "surface_weight": "optSW",
+    "bottom_up": "optBU",
+}
+
+# Model file path in the window title ("Orpheus - C:\Wells\A-12.orp")
+MODEL_PATH_PATTERN = re.compile(r"[A-Za-z]:\\[^<>:\"|?*\r\n]*\.\w+")
+
+
+# Errors meaning an input strategy is not available for a control
+INPUT_STRATEGY_ERRORS = (COMError, NoPatternInterfaceError, OSError)
+
+# OK buttons of the warning dialogs Orpheus raises, in the order they appear
+DIALOG_BUTTONS = ("btnOK", "cmdOK")
+# A dismissed dialog may be followed by another; give up after this many
+MAX_DIALOGS = 5
+
+
+class InputRejectedError(RuntimeError):
+    """Raised when no input strategy could put a value into a text box"""
+
+
+def get_iuia() -> IUIAutomation:
+    """Shared IUIAutomation instance (pywinauto's process-wide singleton)"""
+    return IUIA().iuia
 
 
 def find_element_fast(root_element, automation_id, found_index=0):
@@ -17,10 +77,7 @@ def find_element_fast(root_element, automation_id, found_index=0):
     Fast element search using direct UIA API
     10x faster than pywinauto's window() search
     """
-    uia = comtypes.client.GetModule('UIAutomationCore.dll')
-    iuia = comtypes.client.CreateObject('{ff48dba4-60ef-4201-aa87-54103eef594e}', interface=IUIAutomation)
-    
-    condition = iuia.CreatePropertyCondition(30011, automation_id)  # AutomationId
+    condition = get_iuia().CreatePropertyCondition(30011, automation_id)  # AutomationId
     
     if found_index == 0:
         # Just find first
@@ -36,87 +93,441 @@ def find_element_fast(root_element, automation_id, found_index=0):
 
 def find_element_by_title(root_element, title):
     """Fast search by title/name"""
-    uia = comtypes.client.GetModule('UIAutomationCore.dll')
-    iuia = comtypes.client.CreateObject('{ff48dba4-60ef-4201-aa87-54103eef594e}', interface=IUIAutomation)
-    
-    condition = iuia.CreatePropertyCondition(30005, title)  # Name property
+    condition = get_iuia().CreatePropertyCondition(30005, title)  # Name property
     element = root_element.FindFirst(TreeScope_Descendants, condition)
     return UIAWrapper(UIAElementInfo(element)) if element else None
 
+
+class OrpheusInstance(NamedTuple):
+    """A running Orpheus main window"""
+    process_id: int
+    handle: int
+    title: str
+
+
+def list_orpheus_instances() -> List[OrpheusInstance]:
+    """All running Orpheus main windows, one per process"""
+    instances = {}
+    for info in findwindows.find_elements(auto_id="frmOrpheus", backend="uia", top_level_only=True):
+        instances.setdefault(info.process_id, OrpheusInstance(info.process_id, info.handle, info.name))
+    return sorted(instances.values())
+
+
+def set_by_value_pattern(element, text):
+    """Set the text through the UIA ValuePattern; no mouse or keyboard involved"""
+    element.iface_value.SetValue(text)
+
+
+def set_by_window_text(element, text):
+    """Send WM_SETTEXT straight to the text box window"""
+    handle = element.element_info.handle
+    if not handle:
+        raise OSError("Element has no window handle")
+    ctypes.windll.user32.SendMessageW(handle, win32defines.WM_SETTEXT, 0, text)
+
+
+def set_by_keystrokes(element, text):
+    """Click the box, select all and type the value (moves the real mouse)"""
+    element.click_input()
+    element.type_keys("^a")  # Select all
+    element.type_keys(text)
+
+
+# Tried in order until the value reads back correctly; keystrokes always last
+INPUT_STRATEGIES = {
+    "value_pattern": set_by_value_pattern,
+    "window_text": set_by_window_text,
+    "keystrokes": set_by_keystrokes,
+}
+
+
+def values_match(shown, text):
+    """True when the field shows text, comparing numerically where possible"""
+    try:
+        return parse_number(shown) == parse_number(text)
+    except (TypeError, ValueError):
+        return str(shown).strip() == text.strip()
+
+
+class PropertyChangedHandler(COMObject):
+    """UIA property-changed sink that forwards every event to a Python callback"""
+    _com_interfaces_ = [IUIAutomationPropertyChangedEventHandler]
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def HandlePropertyChangedEvent(self, sender, propertyId, newValue):
+        self.callback()
+        return 0  # S_OK
+
+
+class ElementCache:
+    """
+    Resolved UIA elements keyed by automation-id path.
+
+    A path is a "/"-separated chain of automation ids searched from the window
+    root, e.g. "btnRefresh" or "txtSW/txtData". Parents are cached too, so
+    "txtSW/txtData" and "txtSW/lblName" share a single search for "txtSW".
+    """
+
+    def __init__(self, root_element):
+        self.root = root_element
+        self._elements = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, path):
+        """Return the element at path, searching only on a cache miss"""
+        element = self._elements.get(path)
+        if element is not None:
+            self.hits += 1
+            return element
+
+        self.misses += 1
+        parent_path, _, automation_id = path.rpartition("/")
+        parent = self.get(parent_path).element_info.element if parent_path else self.root
+        element = find_element_fast(parent, automation_id)
+        if element is None:
+            raise ElementNotFoundError(f"No element at automation-id path '{path}'")
+        self._elements[path] = element
+        return element
+
+    def invalidate(self, path=None):
+        """Drop path and everything below it, or the whole cache when path is None"""
+        if path is None:
+            dropped = list(self._elements)
+        else:
+            dropped = [key for key in self._elements if key == path or key.startswith(path + "/")]
+        for key in dropped:
+            del self._elements[key]
+        if dropped:
+            self.invalidations += 1
+
+    def reset_root(self, root_element):
+        """Point the cache at a new window root and forget every element"""
+        self.root = root_element
+        self.invalidate()
+
+    def stats(self):
+        """Hit/miss counters for reporting"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "cached": len(self._elements),
+        }
+
 class Button_Repository:
-    def __init__(self):
+    def __init__(self, process=None, input_strategies=tuple(INPUT_STRATEGIES)):
+        """
+        Connect to Orpheus. With several Orpheus windows open, pass the
+        process id of the one to drive (see list_orpheus_instances).
+        input_strategies limits and orders how values are typed into text
+        boxes, e.g. ("keystrokes",) for the old click-and-type behaviour.
+        """
+        self.process = process
+        self.input_strategies = tuple(input_strategies)
+        # Strategy that last set each field successfully, keyed by path
+        self._field_strategy: Dict[str, str] = {}
+        self._snapshot_query = None
         # Connect once and reuse the app connection
-        self.app = Application(backend="uia").connect(auto_id="frmOrpheus")
-        # Get root element for fast searches
-        self.root = self.app.top_window().element_info.element
+        self.app = self._connect()
+        self.elements = None
+        self._bind_window()
+
+    def _connect(self):
+        if self.process is not None:
+            return Application(backend="uia").connect(process=self.process)
+        return Application(backend="uia").connect(auto_id="frmOrpheus")
+
+    def _bind_window(self):
+        """Take the current top window as root for all element searches"""
+        top_window = self.app.top_window()
+        self.root = top_window.element_info.element
+        self.root_handle = top_window.handle
+        if self.elements is None:
+            self.elements = ElementCache(self.root)
+        else:
+            self.elements.reset_root(self.root)
+
+    def _ensure_window(self):
+        """Reconnect if the Orpheus window was closed and rebuilt"""
+        if not handleprops.iswindow(self.root_handle):
+            self.Reconnect()
+
+    def Reconnect(self):
+        """Connect to Orpheus again and drop every cached element"""
+        self.app = self._connect()
+        self._bind_window()
+        self._snapshot_query = None
+
+    def _element(self, path):
+        self._ensure_window()
+        return self.elements.get(path)
+
+    def _call(self, path, action):
+        """
+        Run action(element) on the cached element at path.
+        A stale element is re-resolved once and the action retried.
+        """
+        try:
+            return action(self._element(path))
+        except STALE_ELEMENT_ERRORS:
+            self.elements.invalidate(path.split("/")[0])
+            return action(self._element(path))
+
+    def _set_value(self, path, value):
+        """
+        Put value into the text box at path.
+        The field's last working strategy is tried first, then the others in
+        input_strategies order; a strategy only counts once the field reads
+        back the value. Keystrokes are the last resort and are not verified.
+        """
+        text = str(value)
+        preferred = self._field_strategy.get(path)
+        order = sorted(self.input_strategies, key=lambda name: name != preferred)
+        for name in order:
+            setter = INPUT_STRATEGIES[name]
+            if name == "keystrokes":
+                self._call(path, lambda element: setter(element, text))
+                self._field_strategy[path] = name
+                return
+            try:
+                self._call(path, lambda element: setter(element, text))
+                shown = self._call(path, lambda element: element.get_value())
+            except INPUT_STRATEGY_ERRORS:
+                continue
+            if values_match(shown, text):
+                self._field_strategy[path] = name
+                return
+        self._field_strategy.pop(path, None)
+        raise InputRejectedError(f"Could not set {path} to {text} with {', '.join(order)}")
+
+    def cache_stats(self):
+        """Element cache hit/miss counts"""
+        return self.elements.stats()
+
+    def input_strategy_stats(self):
+        """Input strategy chosen for each text box so far"""
+        return dict(self._field_strategy)
+
+    def Model_Fingerprint(self):
+        """
+        Short hash of the loaded well model's state: the window title (which
+        names the model file), the file's size and modification time when
+        the title shows its path, and every model input in the window (see
+        _model_fields). Editing the model changes it, saved or not.
+        """
+        self._ensure_window()
+        title = handleprops.text(self.root_handle) or ""
+        digest = hashlib.sha1(title.encode("utf-8"))
+        for match in MODEL_PATH_PATTERN.finditer(title):
+            try:
+                stat = Path(match.group()).stat()
+            except OSError:
+                continue
+            digest.update(f"|{match.group()}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        for path, value in self._model_fields():
+            digest.update(f"|{path}={value}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def _model_fields(self):
+        """
+        (path, value) of every editable text box, option button and check box
+        of the window, except the batch inputs, FOE and mode options
+        (SNAPSHOT_FIELDS, SNAPSHOT_MODES), read in one cross-process UIA call.
+        A path is the chain of automation ids (or child positions) from the root.
+        """
+        iuia = get_iuia()
+        request = iuia.CreateCacheRequest()
+        for property_id in (
+            UIA_AUTOMATION_ID_PROPERTY_ID,
+            UIA_CONTROL_TYPE_PROPERTY_ID,
+            UIA_VALUE_VALUE_PROPERTY_ID,
+            UIA_VALUE_IS_READ_ONLY_PROPERTY_ID,
+            UIA_SELECTION_ITEM_IS_SELECTED_PROPERTY_ID,
+            UIA_TOGGLE_TOGGLE_STATE_PROPERTY_ID,
+        ):
+            request.AddProperty(property_id)
+        request.TreeScope = TreeScope_Subtree
+        skipped = set(SNAPSHOT_FIELDS.values()) | set(SNAPSHOT_MODES.values())
+        fields = []
+        pending = [(self.root.BuildUpdatedCache(request), "")]
+        while pending:
+            element, path = pending.pop()
+            children = element.GetCachedChildren()
+            for idx in range(children.Length if children else 0):
+                child = children.GetElement(idx)
+                automation_id = child.CachedAutomationId
+                if automation_id in skipped:
+                    continue
+                child_path = f"{path}/{automation_id or idx}"
+                if child.CachedControlType == UIA_EDIT_CONTROL_TYPE_ID:
+                    if child.GetCachedPropertyValue(UIA_VALUE_IS_READ_ONLY_PROPERTY_ID) is False:
+                        fields.append((child_path, child.GetCachedPropertyValue(UIA_VALUE_VALUE_PROPERTY_ID)))
+                else:
+                    # Unsupported properties come back as a sentinel object, not a bool/int
+                    for property_id in (UIA_SELECTION_ITEM_IS_SELECTED_PROPERTY_ID, UIA_TOGGLE_TOGGLE_STATE_PROPERTY_ID):
+                        state = child.GetCachedPropertyValue(property_id)
+                        if isinstance(state, (bool, int)):
+                            fields.append((f"{child_path}#{property_id}", state))
+                pending.append((child, child_path))
+        return sorted(fields)
+
+    def subscribe_value_changed(self, path, callback):
+        """
+        Call callback whenever the element at path reports a value/name change.
+        Returns a function that removes the subscription.
+        """
+        element = self._element(path).element_info.element
+        handler = PropertyChangedHandler(callback)
+        iuia = get_iuia()
+        iuia.AddPropertyChangedEventHandler(
+            element,
+            TreeScope_Element,
+            None,
+            handler,
+            [UIA_VALUE_VALUE_PROPERTY_ID, UIA_NAME_PROPERTY_ID],
+        )
+
+        def unsubscribe():
+            try:
+                iuia.RemovePropertyChangedEventHandler(element, handler)
+            except COMError:
+                pass  # Element already gone with the window
+
+        return unsubscribe
+
+    def _build_snapshot_query(self):
+        """Condition matching every snapshot control and a cache request for their values"""
+        iuia = get_iuia()
+        ids = list(SNAPSHOT_FIELDS.values()) + list(SNAPSHOT_MODES.values())
+        condition = iuia.CreateOrConditionFromArray(
+            [iuia.CreatePropertyCondition(UIA_AUTOMATION_ID_PROPERTY_ID, automation_id) for automation_id in ids]
+        )
+        request = iuia.CreateCacheRequest()
+        for property_id in (
+            UIA_AUTOMATION_ID_PROPERTY_ID,
+            UIA_VALUE_VALUE_PROPERTY_ID,
+            UIA_SELECTION_ITEM_IS_SELECTED_PROPERTY_ID,
+        ):
+            request.AddProperty(property_id)
+        # Containers and their txtData children come back in the same call
+        request.TreeScope = TreeScope_Element | TreeScope_Children
+        return condition, request
+
+    def Snapshot(self):
+        """
+        Surface weight, depth, WOB and FOE text plus the selected mode, read in
+        one cross-process UIA call (FindAllBuildCache) instead of one search
+        and get_value per field.
+        Returns a dict with keys "surface_weight", "depth", "wob", "foe" and
+        "mode" ("surface_weight", "bottom_up" or "" when neither is selected);
+        "wob" is "" when the window has no WOB box
+        """
+        if self._snapshot_query is None:
+            self._snapshot_query = self._build_snapshot_query()
+        condition, request = self._snapshot_query
+        self._ensure_window()
+        try:
+            found = self.root.FindAllBuildCache(TreeScope_Descendants, condition, request)
+        except COMError:
+            # Window rebuilt between the check and the call
+            self.Reconnect()
+            found = self.root.FindAllBuildCache(TreeScope_Descendants, condition, request)
+
+        field_by_id = {automation_id: key for key, automation_id in SNAPSHOT_FIELDS.items()}
+        mode_by_id = {automation_id: mode for mode, automation_id in SNAPSHOT_MODES.items()}
+        snapshot = {"mode": ""}
+        for idx in range(found.Length):
+            element = found.GetElement(idx)
+            automation_id = element.CachedAutomationId
+            if automation_id in field_by_id:
+                children = element.GetCachedChildren()
+                for child_idx in range(children.Length if children else 0):
+                    child = children.GetElement(child_idx)
+                    if child.CachedAutomationId == "txtData":
+                        snapshot[field_by_id[automation_id]] = child.GetCachedPropertyValue(UIA_VALUE_VALUE_PROPERTY_ID)
+                        break
+            elif automation_id in mode_by_id:
+                if element.GetCachedPropertyValue(UIA_SELECTION_ITEM_IS_SELECTED_PROPERTY_ID) is True:
+                    snapshot["mode"] = mode_by_id[automation_id]
+
+        # A box the cached query could not see is read the usual way
+        for key, automation_id in SNAPSHOT_FIELDS.items():
+            if key not in snapshot:
+                try:
+                    snapshot[key] = self._call(f"{automation_id}/txtData", lambda element: element.get_value())
+                except STALE_ELEMENT_ERRORS:
+                    if key not in OPTIONAL_SNAPSHOT_FIELDS:
+                        raise
+                    snapshot[key] = ""
+        return snapshot
 
     def Surface_Weight_Button(self):
-        Surface_Weight_Button_Element = find_element_fast(self.root, "optSW")
-        Surface_Weight_Button_Element.click_input()
+        self._call("optSW", lambda element: element.click_input())
 
     def Surface_Weight_Button_Value(self,value):
-        SW_Pane = find_element_fast(self.root, "txtSW")
-        SW_Value_Element = find_element_fast(SW_Pane.element_info.element, "txtData")
-        SW_Value_Element.click_input()
-        SW_Value_Element.type_keys("^a")  # Select all
-        SW_Value_Element.type_keys(str(value))
+        self._set_value("txtSW/txtData", value)
 
     def Refresh(self):
-        Refresh_Button = find_element_fast(self.root, "btnRefresh")
-        Refresh_Button.click_input()
+        self._call("btnRefresh", lambda element: element.click_input())
 
 
     def Bypass_Warning_Button(self):
-        Bypass_Warning_Button1=find_element_fast(self.root, "btnOK")
-        self.Bypass_Warning_Button1=Bypass_Warning_Button1
-
-        self.Bypass_Warning_Button1.click_input()
-
-        # Connect once and reuse the app connection
-        self.app2 = Application(backend="uia").connect(auto_id="frmOrpheus")
-        # Get root element for fast searches
-        self.root2 = self.app2.top_window().element_info.element
-
-        Bypass_Warning_Button2=find_element_fast(self.root2, "cmdOK")
-        self.Bypass_Warning_Button2=Bypass_Warning_Button2
+        """Click OK on the warning dialogs (btnOK, then cmdOK)"""
+        return self.Dismiss_Dialogs()
 
-        self.Bypass_Warning_Button2.click_input()
+    def Dismiss_Dialogs(self):
+        """
+        Press OK on every open Orpheus warning dialog (DIALOG_BUTTONS) and
+        return how many were dismissed. Dialogs are separate top-level windows
+        of the process, so the windows are listed again after each one.
+        """
+        dismissed = 0
+        while dismissed < MAX_DIALOGS:
+            button = None
+            for window in self.app.windows():
+                for automation_id in DIALOG_BUTTONS:
+                    button = find_element_fast(window.element_info.element, automation_id)
+                    if button is not None:
+                        break
+                if button is not None:
+                    break
+            if button is None:
+                break
+            try:
+                button.invoke()
+            except (COMError, NoPatternInterfaceError):
+                button.click_input()
+            dismissed += 1
+        if dismissed:
+            # The dialog may have replaced controls of the main window
+            self.elements.invalidate()
+        return dismissed
 
     def FOE_Value(self):
-        FOE_Button_Pane = find_element_fast(self.root, "txtFOE")
-        FOE_Button_Element = find_element_fast(FOE_Button_Pane.element_info.element, "txtData")
-        return FOE_Button_Element.get_value()
+        return self._call("txtFOE/txtData", lambda element: element.get_value())
     
     def Depth_Value(self,value):
-        Depth_Button_Pane = find_element_fast(self.root, "txtDepth")
-        Depth_Button_Element = find_element_fast(Depth_Button_Pane.element_info.element, "txtData")
-        Depth_Button_Element.click_input()
-        Depth_Button_Element.type_keys("^a")  # Select all
-        Depth_Button_Element.type_keys(value)
+        self._set_value("txtDepth/txtData", value)
 
     def Depth_Value_get(self):
-        Depth_Button_Pane = find_element_fast(self.root, "txtDepth")
-        Depth_Button_Element = find_element_fast(Depth_Button_Pane.element_info.element, "txtData")
-        return Depth_Button_Element.get_value()
+        return self._call("txtDepth/txtData", lambda element: element.get_value())
 
     def Surface_Load(self):
         """Read the current surface load value"""
-        Surface_Load_Pane = find_element_fast(self.root, "txtSW")
-        Surface_Load_Element = find_element_fast(Surface_Load_Pane.element_info.element, "txtData")
-        return Surface_Load_Element.get_value()
+        return self._call("txtSW/txtData", lambda element: element.get_value())
     
     def WOB_input_box(self, value):
         """Set WOB (Weight on Bit) value"""
-        WOB_Pane = find_element_fast(self.root, "txtWOB")
-        WOB_Element = find_element_fast(WOB_Pane.element_info.element, "txtData")
-        WOB_Element.click_input()
-        WOB_Element.type_keys("^a")  # Select all
-        WOB_Element.type_keys(value)
+        self._set_value("txtWOB/txtData", value)
     
     def Bottom_Up_Button(self):
         """Click the Bottom Up button to recalculate"""
-        Bottom_Up_Button = find_element_fast(self.root, "optBU")
-        Bottom_Up_Button.click_input()
+        self._call("optBU", lambda element: element.click_input())
 
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 """
 GUI for Buckeling Automation
-Provides table-based interface for batch processing depth and surface weight inputs
+Provides table-based interface for batch processing depth and surface weight
+(or WOB, in Bottom Up mode) inputs
 """
 from __future__ import annotations
 
@@ -8,22 +9,28 @@ import csv
 import io
 import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-from typing import Any, Dict, List
-import pandas as pd
+from pathlib import Path
+from tkinter import filedialog, ttk, messagebox
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from Automation import run_automation_batch
+from completion_wait import CancelToken
+from input_files import HEADERLESS_COLUMNS, detect_columns
+from input_values import INPUT_COLUMNS
+from result_cache import ResultCache
+from result_export import CsvResultSink, correct_export, export_file
+from result_table import VirtualTable
+from run_journal import RunJournal
 
+if TYPE_CHECKING:
+    # numpy is only loaded once a batch runs
+    from result_store import ResultStore
 
-INPUT_COLUMNS = (
-    ("depth", "Depth (ft)"),
-    ("surface_weight", "Surface Weight (lbs)"),
-)
 
-
-def _normalize_header(value: str) -> str:
-    """Normalize header strings for clipboard matching."""
-    return value.lower().strip().replace(" ", "_").replace("(", "").replace(")", "")
+# New results and status are shown at most this often
+RESULT_FRAME_MS = 50
+# Unflagged rows re-run at random by Verify Results, as a spot check
+VERIFY_AUDIT_ROWS = 10
 
 
 class BuckelingAutomationGUI:
@@ -34,18 +41,28 @@ class BuckelingAutomationGUI:
         self.root.title("Buckeling Automation")
         self.root.geometry("900x600")
         
-        # Result storage
-        self.result_rows: List[Dict[str, Any]] = []
-        self.result_columns: List[str] = []
+        # Results of the running/last batch, appended by the worker thread
+        self.results: Optional[ResultStore] = None
+        self._shown_results = 0
+        # Streaming CSV export of the current/last batch
+        self.export_path: Path | None = None
+        # Opened on first use
+        self.result_cache: Optional[ResultCache] = None
+        # Off by default: only trust cached FOE when the model is known to be unchanged
+        self.use_cache = tk.BooleanVar(value=False)
         
         # Threading
         self.worker_thread: threading.Thread | None = None
         self.is_running = False
+        # Stop interrupts the running batch, even mid-Refresh
+        self.cancel_token = CancelToken()
+        self._pending_status: str | None = None
         
         # Status variables
         self.status_var = tk.StringVar(value="Ready")
         
         self._build_layout()
+        self._poll_results()
         
     def _build_layout(self):
         """Build the GUI layout"""
@@ -69,7 +86,7 @@ class BuckelingAutomationGUI:
         )
         for col, heading in INPUT_COLUMNS:
             self.input_tree.heading(col, text=heading)
-            self.input_tree.column(col, width=150, anchor=tk.CENTER)
+            self.input_tree.column(col, width=110, anchor=tk.CENTER)
         self.input_tree.pack(fill=tk.BOTH, expand=True, pady=(5, 5))
         self.input_tree.bind("<Double-1>", self._edit_input_cell)
         self.input_tree.bind("<Delete>", self._delete_selected_rows)
@@ -83,6 +100,8 @@ class BuckelingAutomationGUI:
         self.btn_remove.pack(side=tk.LEFT, padx=(5, 0))
         self.btn_paste = ttk.Button(button_row, text="Paste Rows", command=self._paste_rows)
         self.btn_paste.pack(side=tk.LEFT, padx=(5, 0))
+        self.btn_import = ttk.Button(button_row, text="Import File", command=self._import_file)
+        self.btn_import.pack(side=tk.LEFT, padx=(5, 0))
         
         # Control buttons
         control_row = ttk.Frame(input_frame)
@@ -91,6 +110,10 @@ class BuckelingAutomationGUI:
         self.btn_run.pack(side=tk.LEFT)
         self.btn_stop = ttk.Button(control_row, text="Stop", command=self._stop_automation, state=tk.DISABLED)
         self.btn_stop.pack(side=tk.LEFT, padx=(5, 0))
+        self.btn_resume = ttk.Button(control_row, text="Resume Last Run", command=self._resume_last_run)
+        self.btn_resume.pack(side=tk.LEFT, padx=(5, 0))
+        self.btn_verify = ttk.Button(control_row, text="Verify Results", command=self._verify_results)
+        self.btn_verify.pack(side=tk.LEFT, padx=(5, 0))
         
         # Status label
         ttk.Label(input_frame, textvariable=self.status_var).pack(anchor=tk.W, pady=(10, 0))
@@ -98,15 +121,21 @@ class BuckelingAutomationGUI:
         # Results frame (right side)
         ttk.Label(result_frame, text="Results").pack(anchor=tk.W)
         
-        # Results table
-        self.result_tree = ttk.Treeview(result_frame, columns=(), show="headings", selectmode="browse")
-        self.result_tree.pack(fill=tk.BOTH, expand=True, pady=(5, 5))
+        # Results table (only the visible rows are real Treeview items)
+        self.result_table = VirtualTable(result_frame)
+        self.result_table.pack(fill=tk.BOTH, expand=True, pady=(5, 5))
         
         # Copy results button
         copy_row = ttk.Frame(result_frame)
         copy_row.pack(fill=tk.X)
         self.btn_copy = ttk.Button(copy_row, text="Copy Results", command=self._copy_results)
         self.btn_copy.pack(side=tk.LEFT)
+        self.btn_export = ttk.Button(copy_row, text="Export Results", command=self._export_results)
+        self.btn_export.pack(side=tk.LEFT, padx=(5, 0))
+        self.btn_clear_cache = ttk.Button(copy_row, text="Clear Cache", command=self._clear_cache)
+        self.btn_clear_cache.pack(side=tk.LEFT, padx=(5, 0))
+        self.chk_use_cache = ttk.Checkbutton(copy_row, text="Use Cache", variable=self.use_cache)
+        self.chk_use_cache.pack(side=tk.LEFT, padx=(5, 0))
         
     def _add_input_row(self):
         """Add a new empty row to the input table"""
@@ -167,9 +196,39 @@ class BuckelingAutomationGUI:
         if not rows:
             messagebox.showinfo("Paste Rows", "No tabular rows detected in the clipboard.")
             return
+        self._insert_input_rows(rows)
+            
+    def _import_file(self):
+        """Load input rows from a CSV/XLSX file, skipping cells that fail validation"""
+        path = filedialog.askopenfilename(
+            title="Import Input Rows",
+            filetypes=[("Spreadsheets", "*.csv *.tsv *.txt *.xlsx *.xlsm"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        self.status_var.set(f"Importing {Path(path).name}...")
+        self.root.update_idletasks()
+        try:
+            # pandas is only loaded once rows are imported or validated
+            from input_import import read_input_file
+            validation = read_input_file(Path(path))
+        except Exception as exc:
+            self.status_var.set("Import failed")
+            messagebox.showerror("Import File", f"Could not read {path}:\n{exc}")
+            return
+        self._insert_input_rows(validation.rows)
+        message = f"Imported {len(validation.rows)} rows from {Path(path).name}"
+        if validation.duplicate_rows:
+            message += f" ({validation.duplicate_rows} duplicates)"
+        self.status_var.set(message)
+        if validation.issues:
+            messagebox.showwarning("Import File", validation.summary())
+        
+    def _insert_input_rows(self, rows: List[Dict[str, Any]]):
+        """Append rows to the input table"""
+        insert = self.input_tree.insert
         for row in rows:
-            values = [row.get(col, "") for col, _ in INPUT_COLUMNS]
-            self.input_tree.insert("", tk.END, values=values)
+            insert("", tk.END, values=[row.get(col, "") for col, _ in INPUT_COLUMNS])
             
     def _parse_clipboard_rows(self, raw: str) -> List[Dict[str, Any]]:
         """Parse clipboard data into rows"""
@@ -181,33 +240,20 @@ class BuckelingAutomationGUI:
         if not rows:
             return []
             
-        normalized_targets = [_normalize_header(value) for _, value in INPUT_COLUMNS]
-        normalized_sources = [_normalize_header(value) for value in rows[0]]
-        
-        header_lookup: Dict[str, int] = {}
-        data_rows = rows
-        if rows and normalized_sources:
-            has_header = all(target in normalized_sources for target in normalized_targets)
-            if has_header:
-                header_lookup = {value: idx for idx, value in enumerate(normalized_sources)}
-                data_rows = rows[1:]
-                
-        if not header_lookup:
-            header_lookup = {target: idx for idx, target in enumerate(normalized_targets)}
+        # Same header rules as file import; without a header the columns are depth, surface weight
+        positions, _ = detect_columns(rows[0])
+        data_rows = rows[1:]
+        if positions is None:
+            positions = {key: idx for idx, key in enumerate(HEADERLESS_COLUMNS)}
+            data_rows = rows
             
         parsed: List[Dict[str, Any]] = []
         for raw_row in data_rows:
-            row_map: Dict[str, Any] = {}
-            non_empty = False
-            for column_index, (target, (dest_key, _)) in enumerate(zip(normalized_targets, INPUT_COLUMNS)):
-                idx = header_lookup.get(target, column_index)
-                cell_value = raw_row[idx] if idx < len(raw_row) else ""
-                if isinstance(cell_value, str):
-                    cell_value = cell_value.strip()
-                row_map[dest_key] = cell_value
-                if cell_value not in ("", None):
-                    non_empty = True
-            if non_empty:
+            row_map = {
+                key: (raw_row[idx].strip() if idx < len(raw_row) else "")
+                for key, idx in positions.items()
+            }
+            if any(value != "" for value in row_map.values()):
                 parsed.append(row_map)
         return parsed
         
@@ -230,87 +276,212 @@ class BuckelingAutomationGUI:
         if not data_list:
             messagebox.showinfo("Automation", "Add at least one input row.")
             return
-            
+        # Reject bad cells now rather than failing halfway through the batch
+        from input_import import validate_rows
+        validation = validate_rows(data_list)
+        if validation.issues:
+            if not validation.rows:
+                messagebox.showerror("Automation", validation.summary())
+                return
+            if not messagebox.askyesno("Automation", validation.summary() + "\n\nSkip these rows and run the rest?"):
+                return
+        data_list = validation.rows
+        self._start_batch(data_list, RunJournal.create(rows=data_list))
+
+    def _resume_last_run(self):
+        """Reload the last interrupted run (or one with failed rows) and run the rows it has no result for"""
+        if self.worker_thread and self.worker_thread.is_alive():
+            messagebox.showinfo("Automation", "Worker already running.")
+            return
+        path = RunJournal.latest()
+        journal = RunJournal.open(path) if path else None
+        if journal is None or journal.finished or not journal.rows:
+            if journal is not None:
+                journal.close()
+            messagebox.showinfo("Resume Last Run", "There is no interrupted run to resume.")
+            return
+        data_list = journal.rows
+
+        # Show the resumed run's inputs in the input table
+        for item in self.input_tree.get_children():
+            self.input_tree.delete(item)
+        self._insert_input_rows(data_list)
+        self._start_batch(data_list, journal)
+        self.status_var.set(f"Resuming: {journal.completed} of {len(data_list)} rows already done")
+
+    def _start_batch(self, data_list: List[Dict[str, Any]], journal: RunJournal):
+        """Run data_list on a worker thread, journaling every completed row"""
         self._clear_results()
+        results = self.results
+        cache = self._batch_cache()
+        # Every row is written to disk as it arrives, so partial runs can be exported
+        sink = CsvResultSink(journal.path.with_suffix(".csv"))
+        self.export_path = sink.path
         self.is_running = True
+        self.cancel_token = cancel_token = CancelToken()
         self._set_controls_enabled(False)
-        
+
         def worker():
             try:
                 run_automation_batch(
                     data_list,
                     status_callback=self._update_status,
-                    result_callback=self._add_result_row,
-                    stop_check=lambda: not self.is_running
+                    cache=cache,
+                    journal=journal,
+                    sink=sink,
+                    cancel_token=cancel_token,
+                    store=results
                 )
                 self.root.after(0, lambda: self._handle_completion(len(data_list)))
             except Exception as exc:
                 self.root.after(0, lambda: self._handle_error(str(exc)))
-                
+            finally:
+                sink.close()
+                journal.close()
+
         self.worker_thread = threading.Thread(target=worker, daemon=True)
         self.worker_thread.start()
         
+    def _verify_results(self):
+        """Re-run a sample of suspect results (and a few random ones) and correct those that changed"""
+        if self.worker_thread and self.worker_thread.is_alive():
+            messagebox.showinfo("Verify Results", "Worker already running.")
+            return
+        results = self.results
+        if not results:
+            messagebox.showinfo("Verify Results", "No results to verify yet.")
+            return
+        rows = [results.inputs(idx) for idx in range(len(results))]
+        cache = self._batch_cache()
+        self.cancel_token = cancel_token = CancelToken()
+        self._set_controls_enabled(False)
+
+        def worker():
+            from result_verification import verify_results
+            try:
+                report = verify_results(
+                    rows,
+                    results,
+                    audit_size=VERIFY_AUDIT_ROWS,
+                    cache=cache,
+                    status_callback=self._update_status,
+                    cancel_token=cancel_token
+                )
+                self.root.after(0, lambda: self._handle_verification(report))
+            except Exception as exc:
+                self.root.after(0, lambda: self._handle_error(str(exc)))
+
+        self.worker_thread = threading.Thread(target=worker, daemon=True)
+        self.worker_thread.start()
+
+    def _handle_verification(self, report):
+        """Show corrected results in the table and the streamed export"""
+        self.result_table.refresh()
+        if report.corrected and self.export_path is not None and self.export_path.exists():
+            correct_export(self.export_path, {idx: self.results.foe_text(idx) for idx in report.corrected})
+        self._drain_results()
+        self.status_var.set(f"Verified: {len(report.corrected)} results corrected")
+        messagebox.showinfo("Verify Results", report.summary())
+        self._set_controls_enabled(True)
+
     def _update_status(self, message: str):
-        """Update status from automation thread"""
-        self.root.after(0, lambda: self.status_var.set(message))
-        
-    def _add_result_row(self, data: Dict[str, Any]):
-        """Add a result row to the results table"""
-        def update_gui():
-            self.result_rows.append(data)
-            if not self.result_columns:
-                self.result_columns = list(data.keys())
-                self.result_tree.configure(columns=self.result_columns)
-                for col in self.result_columns:
-                    self.result_tree.heading(col, text=col)
-                    self.result_tree.column(col, width=160, anchor=tk.CENTER)
-            values = [data.get(col, "") for col in self.result_columns]
-            self.result_tree.insert("", tk.END, values=values)
-        
-        self.root.after(0, update_gui)
+        """Update status from automation thread (only the latest message is shown)"""
+        self._pending_status = message
+        
+    def _poll_results(self):
+        """Show new results and status once per frame"""
+        self._drain_results()
+        self.root.after(RESULT_FRAME_MS, self._poll_results)
+        
+    def _drain_results(self):
+        """Show results the worker stored since the last frame (only the visible rows are drawn)"""
+        if self.results is not None and len(self.results) != self._shown_results:
+            self._shown_results = len(self.results)
+            self.result_table.refresh()
+        message, self._pending_status = self._pending_status, None
+        if message is not None:
+            self.status_var.set(message)
         
     def _clear_results(self):
         """Clear all results"""
-        self.result_rows.clear()
-        self.result_columns.clear()
-        for item in self.result_tree.get_children():
-            self.result_tree.delete(item)
-        self.result_tree.configure(columns=())
+        from result_store import TABLE_HEADINGS, ResultStore
+
+        self.results = ResultStore()
+        self._shown_results = 0
+        self.result_table.set_columns(TABLE_HEADINGS)
+        self.result_table.set_rows(self.results.table())
         
     def _stop_automation(self):
         """Stop the running automation"""
         self.is_running = False
+        self.cancel_token.cancel()
         self.status_var.set("Stopping...")
         
     def _handle_completion(self, total_rows: int):
         """Handle successful completion of automation"""
+        self._drain_results()
         self.status_var.set(f"Completed {total_rows} rows")
         messagebox.showinfo("Success", f"Automation completed!\nProcessed {total_rows} rows.")
         self._set_controls_enabled(True)
         
     def _copy_results(self):
-        """Copy results to clipboard"""
-        df = pd.DataFrame(self.result_rows)
-        if df.empty:
+        """Copy results (row, inputs and FOE) to clipboard"""
+        if not self.results:
             messagebox.showinfo("Copy Results", "No results to copy yet.")
             return
-        df = df.fillna("")
-        df = df.astype(str)
         buffer = io.StringIO()
-        df.to_csv(buffer, sep="\t", index=False, lineterminator="\n", header=False)
+        writer = csv.writer(buffer, delimiter="\t", lineterminator="\n")
+        writer.writerows(self.result_table.rows)
         self.root.clipboard_clear()
         self.root.clipboard_append(buffer.getvalue())
         messagebox.showinfo("Copy Results", "Results copied to clipboard.")
         
+    def _export_results(self):
+        """Save the streamed export of the current or last batch, even while it runs"""
+        if self.export_path is None or not self.export_path.exists():
+            messagebox.showinfo("Export Results", "No results to export yet.")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export Results",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet")],
+        )
+        if not path:
+            return
+        try:
+            count = export_file(self.export_path, Path(path))
+        except Exception as exc:
+            messagebox.showerror("Export Results", f"Could not export results:\n{exc}")
+            return
+        self.status_var.set(f"Exported {count} rows to {Path(path).name}")
+        
+    def _cache(self) -> ResultCache:
+        if self.result_cache is None:
+            self.result_cache = ResultCache()
+        return self.result_cache
+
+    def _batch_cache(self) -> Optional[ResultCache]:
+        """The result cache when "Use Cache" is ticked"""
+        return self._cache() if self.use_cache.get() else None
+
+    def _clear_cache(self):
+        """Forget cached results, e.g. after the loaded well model was edited"""
+        if not messagebox.askyesno("Clear Cache", "Forget all cached FOE results?"):
+            return
+        removed = self._cache().invalidate_model()
+        self.status_var.set(f"Cleared {removed} cached results")
+        
     def _set_controls_enabled(self, enabled: bool):
         """Enable/disable controls during automation"""
         state = tk.NORMAL if enabled else tk.DISABLED
-        for widget in (self.btn_run, self.btn_add, self.btn_remove, self.btn_paste, self.btn_copy):
+        for widget in (self.btn_run, self.btn_add, self.btn_remove, self.btn_paste, self.btn_import, self.btn_copy,
+                       self.btn_clear_cache, self.chk_use_cache, self.btn_resume, self.btn_verify):
             widget.configure(state=state)
         self.btn_stop.configure(state=tk.DISABLED if enabled else tk.NORMAL)
         
     def _handle_error(self, message: str):
         """Handle errors during automation"""
+        self._drain_results()
         self.status_var.set("Error occurred")
         messagebox.showerror("Error", f"An error occurred during automation:\n{message}")
         self._set_controls_enabled(True)
@@ -0,0 +1,13 @@
+"""
+Locations for files the application keeps between runs
+"""
+import os
+from pathlib import Path
+
+
+def app_data_dir() -> Path:
+    """Per-user data folder (%LOCALAPPDATA%\\BuckelingAutomation on Windows)"""
+    base = os.environ.get("LOCALAPPDATA") or Path.home()
+    path = Path(base) / "BuckelingAutomation"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
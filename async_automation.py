@@ -0,0 +1,100 @@
+"""
+asyncio interface to the batch engine
+
+aiter_automation_batch is an async generator over the same ordered results
+as iter_automation_batch. The engine, and with it every blocking UIA call,
+runs on one dedicated executor thread (UIA objects stay on the thread that
+created them); the event loop only awaits finished results.
+
+Backpressure: the engine runs at most max_ahead results ahead of the
+consumer and then waits, so a slow sink (GUI, file, network) never makes
+results pile up in memory. Cancelling the consuming task, or leaving the
+async for loop early, cancels the batch through a CancelToken, which also
+interrupts a Refresh wait in progress.
+
+    async for result in aiter_automation_batch(rows, cache=ResultCache()):
+        await send(result)
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from Automation import iter_automation_batch
+from completion_wait import CancelToken
+
+
+DEFAULT_MAX_AHEAD = 16
+# Callbacks that are moved from the engine thread to the event loop thread
+LOOP_CALLBACKS = ("status_callback", "result_callback")
+
+_DONE = object()
+
+
+async def aiter_automation_batch(
+    rows: Iterable[Dict[str, Any]],
+    max_ahead: int = DEFAULT_MAX_AHEAD,
+    cancel_token: Optional[CancelToken] = None,
+    **batch_kwargs: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield each result in input order without blocking the event loop.
+
+    Parameters
+    ----------
+    rows : Iterable[Dict[str, Any]]
+        Input rows, consumed lazily on the engine thread
+    max_ahead : int
+        Results the engine may compute before the consumer asks for them
+    cancel_token : Optional[CancelToken]
+        Cancels the batch from elsewhere; one is created when omitted. It is
+        cancelled when the consumer stops early.
+    **batch_kwargs
+        Passed to iter_automation_batch (repo, cache, journal, sink,
+        chunk_size, row_timeout, ...). status_callback and result_callback
+        are called on the event loop thread; a sink is written from the
+        engine thread.
+    """
+    if max_ahead < 1:
+        raise ValueError("max_ahead must be at least 1")
+    loop = asyncio.get_running_loop()
+    token = cancel_token or CancelToken()
+    for name in LOOP_CALLBACKS:
+        if batch_kwargs.get(name) is not None:
+            batch_kwargs[name] = _on_loop(loop, batch_kwargs[name])
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orpheus-batch")
+    results = iter_automation_batch(rows, cancel_token=token, **batch_kwargs)
+    # The executor has one thread, so queued next() calls run one after another
+    ahead: "deque[asyncio.Future]" = deque()
+    finished = False
+    try:
+        while True:
+            while len(ahead) < max_ahead:
+                ahead.append(loop.run_in_executor(executor, next, results, _DONE))
+            result = await ahead.popleft()
+            if result is _DONE:
+                finished = True
+                return
+            yield result
+    finally:
+        if not finished:
+            token.cancel()
+        for future in ahead:
+            future.cancel()
+        # Runs after any next() still in progress, then releases the engine's resources
+        await loop.run_in_executor(executor, results.close)
+        executor.shutdown(wait=False)
+
+
+async def arun_automation_batch(data_list: Iterable[Dict[str, Any]], **kwargs: Any) -> List[Dict[str, Any]]:
+    """Awaitable run_automation_batch: every result, in input order"""
+    return [result async for result in aiter_automation_batch(data_list, **kwargs)]
+
+
+def _on_loop(loop: asyncio.AbstractEventLoop, callback: Callable[..., Any]) -> Callable[..., None]:
+    def call(*args: Any):
+        loop.call_soon_threadsafe(callback, *args)
+    return call
@@ -0,0 +1,55 @@
+"""
+Automation backend interface
+
+The batch engine only talks to Orpheus through these operations. The real
+implementation is Button_Repository (pywinauto/comtypes, Windows only);
+SimulatedOrpheus implements the same interface in pure Python so the engine
+can be tested and benchmarked anywhere.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Protocol
+
+
+class AutomationBackend(Protocol):
+    """Operations the engine performs on an Orpheus session"""
+
+    def Surface_Weight_Button(self) -> None:
+        """Select Surface Weight mode"""
+
+    def Surface_Weight_Button_Value(self, value: Any) -> None:
+        """Type a surface weight"""
+
+    def Depth_Value(self, value: Any) -> None:
+        """Type a depth"""
+
+    def Depth_Value_get(self) -> str:
+        """Read the depth currently shown"""
+
+    def Surface_Load(self) -> str:
+        """Read the surface weight currently shown"""
+
+    def FOE_Value(self) -> str:
+        """Read the FOE result currently shown"""
+
+    def Refresh(self) -> None:
+        """Start a recalculation; FOE updates when Orpheus finishes"""
+
+    def WOB_input_box(self, value: Any) -> None:
+        """Type a weight on bit"""
+
+    def Bottom_Up_Button(self) -> None:
+        """Select Bottom Up (WOB) mode"""
+
+    def Model_Fingerprint(self) -> str:
+        """Identifier of the loaded well model, used to key the result cache"""
+
+
+# Optional: backends that can read every field at once implement
+#   Snapshot() -> {"surface_weight", "depth", "wob", "foe": str, "mode": str}
+# with mode "surface_weight", "bottom_up" or "". Without it fields are read one by one.
+#
+# Optional: backends that can push FOE changes implement
+#   subscribe_value_changed(path: str, callback: Callable[[], None]) -> Callable[[], None]
+# returning an unsubscribe function. Without it the engine polls.
+ValueChangedSubscriber = Callable[[str, Callable[[], None]], Callable[[], None]]
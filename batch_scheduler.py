@@ -0,0 +1,161 @@
+"""
+Batch planning for the automation engine
+
+Before any UI work, input rows are collapsed to unique (mode, depth, load)
+keys, grouped by mode so the Surface Weight / Bottom Up option is switched as
+rarely as possible, and ordered within each mode so consecutive steps share
+one input. The engine then only retypes the field that changed. Results are
+handed back in the user's original row order through OrderedResults.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from input_values import ROW_MODES, canonical_number, parse_number, row_mode
+
+
+@dataclass
+class PlannedStep:
+    """One UI evaluation answering one or more identical input rows"""
+    inputs: Dict[str, Any]
+    key: Tuple[str, ...]
+    row_indices: List[int] = field(default_factory=list)
+
+
+@dataclass
+class BatchPlan:
+    steps: List[PlannedStep]
+    total_rows: int
+
+    @property
+    def duplicate_rows(self) -> int:
+        return self.total_rows - len(self.steps)
+
+
+def row_key(row: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Canonical (mode, depth, load) key, load being surface weight or WOB by
+    mode; raises ValueError for an unknown mode or non-numeric cells
+    """
+    mode = row_mode(row)
+    return (mode,) + tuple(canonical_number(row.get(name, "")) for name in ROW_MODES[mode][1])
+
+
+def plan_batch(
+    data_list: List[Dict[str, Any]],
+    current_inputs: Optional[Dict[str, Any]] = None,
+) -> BatchPlan:
+    """
+    Collapse duplicate rows and order the unique ones to minimise UI edits.
+
+    Rows run mode by mode, starting with the mode Orpheus is already in.
+    Within a mode, rows are grouped on the input with fewer distinct values
+    and the other input is swept up and down alternately (serpentine), so
+    most steps change a single field. A first step equal to the current
+    Orpheus inputs is moved back so it is never evaluated without a change.
+
+    Parameters
+    ----------
+    data_list : List[Dict[str, Any]]
+        Input rows with 'depth' and 'surface_weight' or 'wob' keys and an
+        optional 'mode' (see input_values.row_mode)
+    current_inputs : Optional[Dict[str, Any]]
+        Inputs and mode currently shown in Orpheus
+    """
+    steps_by_key: Dict[Tuple[str, ...], PlannedStep] = {}
+    for idx, row in enumerate(data_list):
+        key = row_key(row)
+        step = steps_by_key.get(key)
+        if step is None:
+            step = steps_by_key[key] = PlannedStep(inputs=dict(row), key=key)
+        step.row_indices.append(idx)
+
+    by_mode: Dict[str, List[PlannedStep]] = {}
+    for step in steps_by_key.values():
+        by_mode.setdefault(step.key[0], []).append(step)
+    current_mode = (current_inputs or {}).get("mode")
+    modes = sorted(by_mode, key=lambda mode: (mode != current_mode, list(ROW_MODES).index(mode)))
+
+    ordered: List[PlannedStep] = []
+    for mode in modes:
+        ordered.extend(_serpentine(by_mode[mode]))
+
+    if current_inputs and len(ordered) > 1:
+        try:
+            current_key = row_key(current_inputs)
+        except ValueError:
+            current_key = None
+        if ordered[0].key == current_key:
+            ordered[0], ordered[1] = ordered[1], ordered[0]
+
+    return BatchPlan(steps=ordered, total_rows=len(data_list))
+
+
+def _serpentine(steps: List[PlannedStep]) -> List[PlannedStep]:
+    """Order the steps of one mode; key positions 1 and 2 are its two inputs"""
+    distinct = [len({step.key[pos] for step in steps}) for pos in (1, 2)]
+    group_pos = 1 if distinct[0] <= distinct[1] else 2
+    sweep_pos = 3 - group_pos
+
+    groups: Dict[str, List[PlannedStep]] = {}
+    for step in steps:
+        groups.setdefault(step.key[group_pos], []).append(step)
+
+    ordered: List[PlannedStep] = []
+    for number, group_value in enumerate(sorted(groups, key=float)):
+        group = sorted(groups[group_value], key=lambda step: float(step.key[sweep_pos]))
+        if number % 2:
+            group.reverse()
+        ordered.extend(group)
+    return ordered
+
+
+def changed_fields(inputs: Dict[str, Any], current_inputs: Dict[str, Any]) -> List[str]:
+    """Input fields of the row's mode whose numeric value differs from what Orpheus currently shows"""
+    changed = []
+    for name in ROW_MODES[row_mode(inputs)][1]:
+        try:
+            same = parse_number(inputs[name]) == parse_number(current_inputs.get(name, ""))
+        except ValueError:
+            same = False
+        if not same:
+            changed.append(name)
+    return changed
+
+
+class OrderedResults:
+    """
+    Collects step results and releases them in original row order.
+
+    Each row's result is passed to result_callback as soon as every earlier
+    row has one, so streaming consumers always see input order.
+    """
+
+    def __init__(self, total_rows: int, result_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.total_rows = total_rows
+        self.result_callback = result_callback
+        self.results: List[Dict[str, Any]] = []
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, step: PlannedStep, result_data: Dict[str, Any]):
+        for idx in step.row_indices:
+            self._pending[idx] = dict(result_data)
+        self._release()
+
+    def add_row(self, idx: int, result_data: Dict[str, Any]):
+        """Result for a single row that was not part of the plan (e.g. resumed)"""
+        self._pending[idx] = dict(result_data)
+        self._release()
+
+    def _release(self):
+        while len(self.results) in self._pending:
+            result = self._pending.pop(len(self.results))
+            self.results.append(result)
+            if self.result_callback:
+                self.result_callback(result)
+
+    @property
+    def held_back(self) -> int:
+        """Results finished but waiting on an earlier row"""
+        return len(self._pending)
@@ -0,0 +1,140 @@
+"""
+Engine benchmark suite
+
+Runs run_automation_batch against SimulatedOrpheus and reports throughput
+(rows/sec) and per-row latency, so engine optimizations can be measured on
+any machine without Orpheus:
+
+    python benchmark.py
+    python benchmark.py --scenario grid --refresh-latency 0.2 --jitter 0.3
+    python benchmark.py --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from Automation import run_automation_batch
+from result_cache import ResultCache
+from simulated_orpheus import SimulatedOrpheus
+
+
+def grid_rows(depths: int, weights: int) -> List[Dict[str, str]]:
+    return [
+        {"depth": str(4000 + 25 * d), "surface_weight": str(90000 + 500 * w)}
+        for d in range(depths)
+        for w in range(weights)
+    ]
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0.0 when empty)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+def run_scenario(
+    name: str,
+    rows: List[Dict[str, str]],
+    make_backend: Callable[[], SimulatedOrpheus],
+    cache: Optional[ResultCache] = None,
+) -> Dict[str, Any]:
+    """Time one batch and summarise per-row latency"""
+    backend = make_backend()
+    # Results are released in input order, not execution order, so per-row
+    # latency is measured between the engine's "Processing row" updates
+    stamps: List[float] = []
+
+    def on_status(message: str):
+        if message.startswith("Processing row"):
+            stamps.append(time.perf_counter())
+
+    start = time.perf_counter()
+    results = run_automation_batch(rows, status_callback=on_status, cache=cache, repo=backend)
+    elapsed = time.perf_counter() - start
+    stamps.append(time.perf_counter())
+    gaps = [later - earlier for earlier, later in zip(stamps, stamps[1:])]
+    return {
+        "scenario": name,
+        "rows": len(results),
+        "seconds": round(elapsed, 4),
+        "rows_per_sec": round(len(results) / elapsed, 2) if elapsed > 0 else float("inf"),
+        "row_p50_ms": round(percentile(gaps, 0.50) * 1000, 3),
+        "row_p95_ms": round(percentile(gaps, 0.95) * 1000, 3),
+        "row_max_ms": round(max(gaps, default=0.0) * 1000, 3),
+        "refreshes": backend.calls.get("Refresh", 0),
+        "typed_fields": backend.calls.get("Surface_Weight_Button_Value", 0)
+        + backend.calls.get("Depth_Value", 0),
+    }
+
+
+def run_suite(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    latency = {
+        "click": args.click_latency,
+        "type": args.type_latency,
+        "read": args.read_latency,
+        "refresh": args.refresh_latency,
+    }
+
+    def make_backend() -> SimulatedOrpheus:
+        return SimulatedOrpheus(latency=latency, jitter=args.jitter, seed=args.seed)
+
+    grid = grid_rows(args.depths, args.weights)
+    scenarios: Dict[str, Callable[[], Dict[str, Any]]] = {
+        # Every row unique: cost of typing, Refresh and completion detection
+        "grid": lambda: run_scenario("grid", grid, make_backend),
+        # Same grid pasted three times, shuffled: planning and de-duplication
+        "duplicates": lambda: run_scenario(
+            "duplicates", grid[::-1] + grid + grid[::2] + grid[1::2], make_backend
+        ),
+        # Second run over a warm result cache: engine overhead without UI work
+        "cached": lambda: _cached_scenario(grid, make_backend),
+    }
+    selected = scenarios if args.scenario == "all" else {args.scenario: scenarios[args.scenario]}
+    return [run() for run in selected.values()]
+
+
+def _cached_scenario(rows, make_backend) -> Dict[str, Any]:
+    cache = ResultCache(":memory:")
+    run_scenario("warm-up", rows, make_backend, cache)
+    return run_scenario("cached", rows, make_backend, cache)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the automation engine against a simulated Orpheus.")
+    parser.add_argument("--scenario", choices=("all", "grid", "duplicates", "cached"), default="all")
+    parser.add_argument("--depths", type=int, default=20, help="Distinct depths in the grid (default 20)")
+    parser.add_argument("--weights", type=int, default=10, help="Distinct surface weights in the grid (default 10)")
+    parser.add_argument("--refresh-latency", type=float, default=0.05, help="Simulated calculation seconds")
+    parser.add_argument("--type-latency", type=float, default=0.005, help="Seconds to type one field")
+    parser.add_argument("--click-latency", type=float, default=0.002, help="Seconds per click")
+    parser.add_argument("--read-latency", type=float, default=0.001, help="Seconds per field read")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative latency jitter (default 0.2)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    reports = run_suite(args)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+
+    columns = ("scenario", "rows", "seconds", "rows_per_sec", "row_p50_ms", "row_p95_ms",
+               "row_max_ms", "refreshes", "typed_fields")
+    print("  ".join(f"{column:>12}" for column in columns))
+    for report in reports:
+        print("  ".join(f"{report[column]!s:>12}" for column in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
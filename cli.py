@@ -0,0 +1,216 @@
+"""
+Buckeling Automation - Command-line batch runner
+
+Streams depth/surface weight (or depth/WOB, see input_values.ROW_MODES) rows
+from a CSV or XLSX file through the automation engine and writes each result
+to the output file as soon as it is produced, so large batches can run
+unattended (e.g. overnight).
+
+    python cli.py inputs.csv results.csv
+    python cli.py inputs.xlsx results.csv --start 1000 --limit 500
+    python cli.py inputs.csv results.csv --resume <journal>.jsonl
+
+A row with a bad cell never reaches Orpheus: it is written with its line
+number and problem in the Error column, and the run continues.
+
+Does not import Tk; pandas is only loaded to validate the rows.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from input_files import EXCEL_SUFFIXES, HEADERLESS_COLUMNS, detect_columns, prepend_row, read_cells
+from result_export import ERROR_COLUMN, RESULT_COLUMNS
+from version import __version__
+
+
+# Appended to the input columns in the output file
+OUTPUT_COLUMNS = (*RESULT_COLUMNS, ERROR_COLUMN)
+
+
+class CsvResultWriter:
+    """Writes one CSV line per result and flushes it straight to disk"""
+
+    def __init__(self, path: Path, header: Sequence[str]):
+        self._handle = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._handle)
+        self._writer.writerow(header)
+
+    def write(self, values: Sequence[Any]):
+        self._writer.writerow(values)
+        self._handle.flush()
+
+    def close(self):
+        self._handle.close()
+
+
+class XlsxResultWriter:
+    """
+    Streams rows into a write-only workbook. The file is only complete once
+    closed, so prefer CSV output when a run may be interrupted.
+    """
+
+    def __init__(self, path: Path, header: Sequence[str]):
+        from openpyxl import Workbook
+
+        self.path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Results")
+        self._sheet.append(list(header))
+
+    def write(self, values: Sequence[Any]):
+        self._sheet.append(list(values))
+
+    def close(self):
+        self._workbook.save(self.path)
+
+
+def open_writer(path: Path, header: Sequence[str]):
+    if path.suffix.lower() in EXCEL_SUFFIXES:
+        return XlsxResultWriter(path, header)
+    return CsvResultWriter(path, header)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Run a Buckeling Automation batch from a CSV/XLSX file without the GUI."
+    )
+    parser.add_argument("input", type=Path, help="CSV, TSV or XLSX file with Depth and Surface Weight columns")
+    parser.add_argument("output", type=Path, help="CSV or XLSX file to write results to")
+    parser.add_argument("--start", type=int, default=0, help="Skip this many data rows first (default 0)")
+    parser.add_argument("--limit", type=int, default=None, help="Process at most this many data rows")
+    parser.add_argument("--chunk-size", type=int, default=500,
+                        help="Rows planned and de-duplicated together (default 500)")
+    parser.add_argument("--row-timeout", type=float, default=None,
+                        help="Seconds to wait for Orpheus per row before failing")
+    parser.add_argument("--cache", action="store_true",
+                        help="Answer rows already calculated for the loaded model from the result cache")
+    parser.add_argument("--journal", type=Path, default=None,
+                        help="Write a crash-safe run journal (default: per-user journals folder)")
+    parser.add_argument("--resume", type=Path, default=None, metavar="JOURNAL",
+                        help="Continue an interrupted run: rows already in JOURNAL are not recalculated")
+    parser.add_argument("--trace", type=Path, default=None, metavar="PREFIX",
+                        help="Time every step and write PREFIX.json, PREFIX_steps.csv and PREFIX_rows.csv")
+    parser.add_argument("--export", type=Path, default=None,
+                        help="Also stream row, inputs, FOE, source and timing to this CSV or Parquet file")
+    parser.add_argument("--quiet", action="store_true", help="Only print errors")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Entry point; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+    if args.start < 0 or (args.limit is not None and args.limit < 0) or args.chunk_size < 1:
+        print("--start and --limit must be >= 0 and --chunk-size >= 1", file=sys.stderr)
+        return 2
+
+    from Automation import iter_automation_batch
+
+    cells = read_cells(args.input)
+    first_row = next(cells, None)
+    if first_row is None:
+        print(f"{args.input} is empty", file=sys.stderr)
+        return 1
+    positions, header = detect_columns(first_row)
+    first_line = 2
+    if positions is None:
+        # No header: first two columns are depth and surface weight
+        positions = {key: idx for idx, key in enumerate(HEADERLESS_COLUMNS)}
+        cells = prepend_row(first_row, cells)
+        first_line = 1
+
+    data_lines = ((line, row) for line, row in enumerate(cells, first_line) if any(str(value).strip() for value in row))
+    stop = None if args.limit is None else args.start + args.limit
+    data_lines = islice(data_lines, args.start, stop)
+
+    from input_import import check_rows
+
+    # Raw cells of rows read but not yet written, with the problem of rejected rows
+    pending: "deque[Tuple[List[str], str]]" = deque()
+
+    def engine_rows() -> Iterator[Dict[str, Any]]:
+        # Rejected rows never reach the engine; they are written with their problem
+        for row, inputs, problem in check_rows(data_lines, positions):
+            pending.append((row, problem))
+            if inputs is not None:
+                yield inputs
+
+    def write_rejected():
+        nonlocal written, rejected
+        while pending and pending[0][1]:
+            row, problem = pending.popleft()
+            writer.write(list(row) + [{ERROR_COLUMN: problem}.get(col, "") for col in OUTPUT_COLUMNS])
+            written += 1
+            rejected += 1
+
+    status = None if args.quiet else (lambda message: print(message, flush=True))
+    batch_kwargs: Dict[str, Any] = {}
+    if args.row_timeout is not None:
+        batch_kwargs["row_timeout"] = args.row_timeout
+    if args.cache:
+        from result_cache import ResultCache
+        batch_kwargs["cache"] = ResultCache()
+
+    from run_journal import RunJournal
+    if args.resume is not None:
+        journal = RunJournal.open(args.resume)
+        if status:
+            status(f"Resuming {args.resume}: {journal.completed} rows already done")
+    else:
+        journal = RunJournal.create(args.journal, meta={
+            "input": str(args.input.resolve()), "start": args.start, "limit": args.limit,
+        })
+        if status:
+            status(f"Run journal: {journal.path}")
+    batch_kwargs["journal"] = journal
+    if args.trace is not None:
+        batch_kwargs["trace_callback"] = lambda tracer: _export_trace(tracer, args.trace)
+
+    sink = None
+    if args.export is not None:
+        from result_export import open_sink
+        sink = batch_kwargs["sink"] = open_sink(args.export)
+
+    writer = open_writer(args.output, list(header) + list(OUTPUT_COLUMNS))
+    written = rejected = 0
+    try:
+        for result in iter_automation_batch(
+            engine_rows(), status_callback=status, chunk_size=args.chunk_size, **batch_kwargs
+        ):
+            write_rejected()
+            row, _ = pending.popleft()
+            writer.write(list(row) + [result.get(col, "") for col in OUTPUT_COLUMNS])
+            written += 1
+        write_rejected()
+    except KeyboardInterrupt:
+        print(f"Interrupted after {written} rows", file=sys.stderr)
+        return 130
+    except Exception as exc:
+        print(f"Error after {written} rows: {exc}", file=sys.stderr)
+        print(f"Continue later with: --resume \"{journal.path}\"", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+        if sink is not None:
+            sink.close()
+        journal.close()
+
+    if status:
+        status(f"Wrote {written} rows to {args.output}" + (f" ({rejected} rejected)" if rejected else ""))
+    return 0
+
+
+def _export_trace(tracer, prefix: Path):
+    tracer.export_json(prefix.with_name(prefix.name + ".json"))
+    tracer.export_csv(prefix.with_name(prefix.name + "_steps.csv"), prefix.with_name(prefix.name + "_rows.csv"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
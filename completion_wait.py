@@ -0,0 +1,250 @@
+"""
+Completion detection for Orpheus recalculations
+
+After Refresh is clicked the FOE field is rewritten once Orpheus finishes.
+CompletionWaiter returns as soon as that happens: it wakes on a UIA value
+changed event when one can be subscribed, and otherwise polls with an
+interval that starts short and backs off. Typical Refresh latency is learned
+from recent rows (EWMA) so the first poll lands close to when the result is
+expected. A hard per-row timeout replaces the old open-ended sleep loop.
+
+A recalculation that leaves FOE unchanged is still detected: the value
+changed event fires whenever Orpheus rewrites the field, even with the same
+text, so an event after Refresh counts as completion. Where no event can
+arrive (polling) or no change is expected, the value shown once Orpheus has
+been quiet for a few typical Refresh latencies is taken, so a row whose FOE
+equals the previous row's does not wait out the row timeout.
+
+A CancelToken interrupts a wait from any thread: the waiter wakes at once
+and raises CompletionCancelledError instead of waiting out the row timeout.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+
+DEFAULT_ROW_TIMEOUT = 60.0
+# Unchanged value is accepted after this many typical Refresh latencies...
+QUIET_LATENCIES = 3.0
+# ...but never sooner than this, and this long before any latency is known
+MIN_QUIET = 0.5
+DEFAULT_QUIET = 3.0
+
+
+class CompletionTimeoutError(TimeoutError):
+    """Raised when Orpheus does not produce a new result within the row timeout"""
+
+
+class CompletionCancelledError(Exception):
+    """Raised when a wait is interrupted through its CancelToken"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation of a batch. cancel() may be called from any
+    thread; it wakes every wait registered with on_cancel().
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to seconds, returning early (True) once cancelled"""
+        return self._cancelled.wait(seconds)
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call callback on cancel() (now, if already cancelled); returns a function that removes it"""
+        with self._lock:
+            self._callbacks.append(callback)
+            cancelled = self.cancelled
+        if cancelled:
+            callback()
+
+        def remove():
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+        return remove
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of Refresh latency in seconds"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.average: Optional[float] = None
+        self.samples = 0
+
+    def record(self, seconds: float):
+        if self.average is None:
+            self.average = seconds
+        else:
+            self.average = self.alpha * seconds + (1 - self.alpha) * self.average
+        self.samples += 1
+
+
+class CompletionWaiter:
+    """
+    Wait for a field to change after a recalculation is triggered.
+
+    Parameters
+    ----------
+    read_value : Callable[[], Any]
+        Reads the current value of the watched field (e.g. repo.FOE_Value)
+    subscribe : Optional[Callable[[Callable[[], None]], Callable[[], None]]]
+        Registers a change callback and returns a function that removes it.
+        When omitted, or when subscribing fails, only polling is used.
+    timeout : float
+        Seconds to wait for a change before raising CompletionTimeoutError
+    min_interval, max_interval, backoff : float
+        Poll interval starts at min_interval and is multiplied by backoff
+        after every unchanged read, up to max_interval
+    cancel_token : Optional[CancelToken]
+        Cancelling it ends a running or later wait with CompletionCancelledError
+    """
+
+    def __init__(
+        self,
+        read_value: Callable[[], Any],
+        subscribe: Optional[Callable[[Callable[[], None]], Callable[[], None]]] = None,
+        timeout: float = DEFAULT_ROW_TIMEOUT,
+        min_interval: float = 0.05,
+        max_interval: float = 1.0,
+        backoff: float = 1.6,
+        latency: Optional[LatencyTracker] = None,
+        cancel_token: Optional[CancelToken] = None,
+    ):
+        self.read_value = read_value
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.latency = latency or LatencyTracker()
+        self._changed = threading.Event()
+        self._armed_at = time.perf_counter()
+        # Events received in total and at the last arm()
+        self._events = 0
+        self._events_at_arm = 0
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        self.cancel_token = cancel_token
+        self._remove_cancel = cancel_token.on_cancel(self._changed.set) if cancel_token else None
+        if subscribe is not None:
+            try:
+                self._unsubscribe = subscribe(self._on_event)
+            except Exception as exc:
+                print(f"Value change events unavailable, polling instead: {exc}")
+
+    @property
+    def uses_events(self) -> bool:
+        return self._unsubscribe is not None
+
+    def arm(self):
+        """Call immediately before triggering the recalculation"""
+        self._changed.clear()
+        self._armed_at = time.perf_counter()
+        self._events_at_arm = self._events
+
+    def _on_event(self):
+        self._events += 1
+        self._changed.set()
+
+    @property
+    def quiet_period(self) -> float:
+        """Seconds after which an unchanged value is accepted when nothing else can signal completion"""
+        if self.latency.average is None:
+            return DEFAULT_QUIET
+        return max(MIN_QUIET, QUIET_LATENCIES * self.latency.average)
+
+    def wait_for_change(self, previous: Any) -> Any:
+        """
+        Block until the watched value differs from previous and return it.
+        Raises CompletionTimeoutError if the row timeout expires first.
+        """
+        return self._wait(previous, accept_event=False, expect_change=True)
+
+    def wait_for_refresh(self, previous: Any, expect_change: bool = True) -> Any:
+        """
+        Block until the recalculation triggered after arm() has finished and
+        return the value then shown, which may equal previous.
+
+        Finished means the value differs from previous, or a value changed
+        event arrived since arm(). An unchanged value is also accepted once
+        quiet_period has passed without an event, when expect_change=False
+        (inputs equal to what Orpheus already showed) or when no events are
+        subscribed, as polling cannot see Orpheus rewrite the same value.
+        Raises CompletionTimeoutError if the row timeout expires first.
+        """
+        return self._wait(previous, accept_event=True, expect_change=expect_change)
+
+    def _wait(self, previous: Any, accept_event: bool, expect_change: bool) -> Any:
+        deadline = self._armed_at + self.timeout
+        quiet_at = self._armed_at + self.quiet_period
+        # Without events a recalculation to the same value looks like no recalculation
+        accept_quiet = not expect_change or (accept_event and not self.uses_events)
+        interval = self.min_interval
+
+        # Skip polls that are almost certainly too early for this workstation
+        if self.latency.average is not None:
+            self._sleep_until(min(self._armed_at + 0.8 * self.latency.average, deadline))
+
+        while True:
+            if self.cancel_token is not None and self.cancel_token.cancelled:
+                raise CompletionCancelledError("Wait for FOE cancelled")
+            signalled = accept_event and self._events != self._events_at_arm
+            value = self.read_value()
+            if value != previous or signalled:
+                self.latency.record(time.perf_counter() - self._armed_at)
+                return value
+
+            now = time.perf_counter()
+            if accept_quiet and now >= quiet_at:
+                return value
+            if now >= deadline:
+                raise CompletionTimeoutError(
+                    f"No new FOE value within {self.timeout:g}s after Refresh "
+                    f"(still showing {previous!r}). Check Orpheus for a warning dialog."
+                )
+            wake_at = min(now + interval, deadline)
+            if accept_quiet:
+                wake_at = min(wake_at, max(quiet_at, now))
+            self._sleep_until(wake_at)
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def _sleep_until(self, wake_at: float):
+        """Sleep until wake_at, or until a change event arrives"""
+        remaining = wake_at - time.perf_counter()
+        if remaining <= 0:
+            return
+        if self.uses_events or self.cancel_token is not None:
+            # Set by value changed events and by cancellation
+            if self._changed.wait(remaining):
+                self._changed.clear()
+        else:
+            time.sleep(remaining)
+
+    def close(self):
+        """Remove the event subscription and cancellation callback"""
+        if self._remove_cancel is not None:
+            self._remove_cancel()
+            self._remove_cancel = None
+        if self._unsubscribe is not None:
+            try:
+                self._unsubscribe()
+            finally:
+                self._unsubscribe = None
@@ -0,0 +1,70 @@
+"""
+Reading input rows from CSV, TSV and XLSX files
+
+Shared by the command-line runner, the bulk import and the GUI paste: cells
+are read lazily as strings, and the first row is either a header naming the
+input columns or already data (depth and surface weight, in that order).
+"""
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from input_values import INPUT_COLUMNS, normalize_header
+
+
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+
+# Columns of a file without a header row
+HEADERLESS_COLUMNS = ("depth", "surface_weight")
+
+# Normalized header names of each input column, besides its key and heading
+HEADER_ALIASES = {
+    "surface_weight": ("surface_load", "weight"),
+    "wob": ("weight_on_bit", "weight_on_bit_lbs"),
+}
+
+
+def read_cells(path: Path) -> Iterator[List[str]]:
+    """Yield each row of a CSV/TSV/XLSX file as a list of strings, lazily"""
+    if path.suffix.lower() in EXCEL_SUFFIXES:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for values in workbook.active.iter_rows(values_only=True):
+                yield ["" if value is None else str(value) for value in values]
+        finally:
+            workbook.close()
+    else:
+        delimiter = "\t" if path.suffix.lower() in (".tsv", ".txt") else ","
+        with open(path, newline="", encoding="utf-8-sig") as handle:
+            yield from csv.reader(handle, delimiter=delimiter)
+
+
+def detect_columns(first_row: Sequence[str]) -> Tuple[Optional[Dict[str, int]], List[str]]:
+    """
+    Map input keys to column positions from a header row. A header needs a
+    depth column and a surface weight or WOB column; mode is optional.
+    Returns (None, default headings) when the first row is data, not a header.
+    """
+    normalized = [normalize_header(str(value)) for value in first_row]
+    positions: Dict[str, int] = {}
+    for key, heading in INPUT_COLUMNS:
+        # Whole names only: "Model" is not a mode column, nor "WOB Buckeling" a WOB column
+        names = {key, normalize_header(heading), *HEADER_ALIASES.get(key, ())}
+        for idx, value in enumerate(normalized):
+            if value in names:
+                positions[key] = idx
+                break
+    if "depth" in positions and ("surface_weight" in positions or "wob" in positions):
+        return positions, [str(value) for value in first_row]
+    headings = dict(INPUT_COLUMNS)
+    return None, [headings[key] for key in HEADERLESS_COLUMNS]
+
+
+def prepend_row(first: List[str], rest: Iterable[List[str]]) -> Iterator[List[str]]:
+    """Put a row read ahead (the first row, when it was data) back in front"""
+    yield first
+    yield from rest
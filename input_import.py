@@ -0,0 +1,236 @@
+"""
+Bulk import and validation of input rows
+
+Reads a CSV, TSV or XLSX file in chunks, then checks and normalizes the mode,
+depth, surface weight and WOB columns in one vectorized pass. Each row only
+needs the inputs of its mode (see input_values.ROW_MODES). Unknown modes and
+non-numeric, missing and out-of-range cells are reported with their file line
+and left out of the imported rows, so a batch never aborts halfway on a bad
+cell. Duplicate rows are reported but kept (the engine evaluates them once).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from input_files import HEADERLESS_COLUMNS, detect_columns, prepend_row, read_cells
+from input_values import DEFAULT_MODE, INPUT_COLUMNS, MODE_ALIASES, ROW_MODES, normalize_header
+
+
+# Accepted (min, max) for each input; values outside are reported, not imported
+INPUT_RANGES: Dict[str, Tuple[float, float]] = {
+    "depth": (0.0, 60000.0),
+    "surface_weight": (-2000000.0, 2000000.0),
+    "wob": (0.0, 2000000.0),
+}
+
+IMPORT_CHUNK_ROWS = 10000
+
+
+@dataclass
+class InputIssue:
+    """One rejected cell; line is the 1-based line in the source file"""
+    line: int
+    column: str
+    value: str
+    problem: str
+
+    def __str__(self) -> str:
+        return f"Line {self.line}, {self.column}: {self.problem} ({self.value!r})"
+
+
+@dataclass
+class InputValidation:
+    rows: List[Dict[str, str]]
+    issues: List[InputIssue] = field(default_factory=list)
+    total_rows: int = 0
+    duplicate_rows: int = 0
+
+    @property
+    def rejected_rows(self) -> int:
+        return self.total_rows - len(self.rows)
+
+    def problems_by_line(self) -> Dict[int, str]:
+        """Line -> "Line 5, depth: not a number ('abc')" for every rejected line"""
+        problems: Dict[int, List[str]] = {}
+        for issue in self.issues:
+            problems.setdefault(issue.line, []).append(str(issue))
+        return {line: "; ".join(texts) for line, texts in problems.items()}
+
+    def summary(self, max_issues: int = 10) -> str:
+        """Human readable report listing at most max_issues problems"""
+        lines = [f"{len(self.rows)} of {self.total_rows} rows are valid."]
+        if self.rejected_rows:
+            counts: Dict[str, int] = {}
+            for issue in self.issues:
+                counts[issue.problem] = counts.get(issue.problem, 0) + 1
+            detail = ", ".join(f"{count} {problem}" for problem, count in sorted(counts.items()))
+            lines.append(f"{self.rejected_rows} rows skipped ({detail}).")
+        if self.duplicate_rows:
+            lines.append(f"{self.duplicate_rows} duplicate rows (calculated once).")
+        lines.extend(str(issue) for issue in self.issues[:max_issues])
+        if len(self.issues) > max_issues:
+            lines.append(f"... and {len(self.issues) - max_issues} more")
+        return "\n".join(lines)
+
+
+def validate_inputs(
+    frame: pd.DataFrame,
+    lines: Optional[Sequence[int]] = None,
+    ranges: Dict[str, Tuple[float, float]] = INPUT_RANGES,
+) -> InputValidation:
+    """
+    Check every input column of frame at once.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        Columns named by INPUT_COLUMNS keys, cells as text or numbers; absent
+        columns count as blank
+    lines : Optional[Sequence[int]]
+        Source line of each row for the report (default: 1, 2, ...)
+    ranges : Dict[str, Tuple[float, float]]
+        Inclusive (min, max) per column
+
+    Returns
+    -------
+    InputValidation
+        Valid rows as {"mode", plus that mode's inputs} with numbers
+        normalized ("5,374.0" -> "5374"), plus issues
+    """
+    keys = [key for key, _ in INPUT_COLUMNS]
+    line_numbers = np.arange(1, len(frame) + 1) if lines is None else np.asarray(lines)
+    raw = {
+        key: (frame[key].fillna("").astype(str) if key in frame else pd.Series("", index=frame.index, dtype=object))
+        for key in keys
+    }
+    issues: List[Tuple[int, int, InputIssue]] = []
+
+    def report(mask: np.ndarray, position: int, key: str, problem: str):
+        cells = raw[key].to_numpy()
+        for idx in np.flatnonzero(mask):
+            issues.append((int(line_numbers[idx]), position, InputIssue(
+                int(line_numbers[idx]), key, cells[idx], problem
+            )))
+
+    # Mode named in the Mode column, else inferred as input_values.row_mode does
+    mode_text = raw["mode"].str.strip()
+    named = mode_text.map(normalize_header).map(MODE_ALIASES).fillna("").to_numpy(dtype=object)
+    only_wob = ((raw["wob"].str.strip() != "") & (raw["surface_weight"].str.strip() == "")).to_numpy()
+    blank_mode = (mode_text == "").to_numpy()
+    modes = np.where(blank_mode, np.where(only_wob, "bottom_up", DEFAULT_MODE), named).astype(object)
+    unknown = modes == ""
+    report(unknown, keys.index("mode"), "mode", "unknown mode")
+    valid = ~unknown
+
+    normalized: Dict[str, List[str]] = {}
+    for position, key in enumerate(keys):
+        if key == "mode":
+            continue
+        # Only the inputs of the row's own mode are checked and kept
+        required = np.isin(modes, [mode for mode, (_, fields) in ROW_MODES.items() if key in fields])
+        text = raw[key].str.strip().str.replace(",", "", regex=False)
+        values = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        blank = (text == "").to_numpy()
+        finite = np.isfinite(values)
+        low, high = ranges.get(key, (-np.inf, np.inf))
+        with np.errstate(invalid="ignore"):
+            in_range = finite & (values >= low) & (values <= high)
+        report(required & blank, position, key, "missing")
+        report(required & ~blank & ~finite, position, key, "not a number")
+        report(required & finite & ~in_range, position, key, f"outside {low:g} to {high:g}")
+        valid &= in_range | ~required
+        normalized[key] = [format(value, ".15g") for value in values]
+
+    rows: List[Dict[str, str]] = []
+    for idx in np.flatnonzero(valid):
+        mode = modes[idx]
+        row = {"mode": mode}
+        row.update((key, normalized[key][idx]) for key in ROW_MODES[mode][1])
+        rows.append(row)
+    duplicate_rows = int(pd.DataFrame(rows, dtype=object).fillna("").duplicated().sum()) if rows else 0
+
+    issues.sort(key=lambda item: item[:2])
+    return InputValidation(
+        rows=rows,
+        issues=[issue for _, _, issue in issues],
+        total_rows=len(frame),
+        duplicate_rows=duplicate_rows,
+    )
+
+
+def validate_rows(rows: Iterable[Dict[str, Any]]) -> InputValidation:
+    """validate_inputs for row dictionaries, e.g. the GUI input table"""
+    keys = [key for key, _ in INPUT_COLUMNS]
+    frame = pd.DataFrame([[row.get(key, "") for key in keys] for row in rows], columns=keys, dtype=object)
+    return validate_inputs(frame)
+
+
+def check_rows(
+    lines: Iterable[Tuple[int, List[str]]],
+    positions: Dict[str, int],
+    chunk_rows: int = IMPORT_CHUNK_ROWS,
+) -> Iterator[Tuple[List[str], Optional[Dict[str, str]], str]]:
+    """
+    Validate (line number, cells) pairs a chunk at a time, for streaming
+    callers such as the command-line runner. Yields (cells, row, problem)
+    for every line in order: the validated row and "", or None and what is
+    wrong with the line.
+    """
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, chunk_rows))
+        if not chunk:
+            return
+        frame = pd.DataFrame(
+            {key: [cells[idx] if idx < len(cells) else "" for _, cells in chunk] for key, idx in positions.items()},
+            dtype=object,
+        )
+        validation = validate_inputs(frame, [line for line, _ in chunk])
+        problems = validation.problems_by_line()
+        rows = iter(validation.rows)
+        for line, cells in chunk:
+            if line in problems:
+                yield cells, None, problems[line]
+            else:
+                yield cells, next(rows), ""
+
+
+def read_input_file(path: Path, chunk_rows: int = IMPORT_CHUNK_ROWS) -> InputValidation:
+    """Read input rows from a CSV, TSV or XLSX file and validate them"""
+    cells = read_cells(Path(path))
+    first_row = next(cells, None)
+    if first_row is None:
+        return InputValidation(rows=[])
+    positions, _ = detect_columns(first_row)
+    first_line = 2
+    if positions is None:
+        # No header: first two columns are depth and surface weight
+        positions = {key: idx for idx, key in enumerate(HEADERLESS_COLUMNS)}
+        cells = prepend_row(first_row, cells)
+        first_line = 1
+
+    width = max(positions.values()) + 1
+    frames: List[pd.DataFrame] = []
+    lines: List[np.ndarray] = []
+    line = first_line
+    while True:
+        chunk = list(islice(cells, chunk_rows))
+        if not chunk:
+            break
+        frame = pd.DataFrame([row[:width] + [""] * (width - len(row)) for row in chunk], dtype=object)
+        numbers = np.arange(line, line + len(chunk))
+        line += len(chunk)
+        # Drop fully empty lines, as a spreadsheet paste would
+        filled = frame.apply(lambda column: column.astype(str).str.strip() != "").any(axis=1).to_numpy()
+        frames.append(pd.DataFrame({key: frame[idx][filled] for key, idx in positions.items()}))
+        lines.append(numbers[filled])
+
+    if not frames:
+        return InputValidation(rows=[])
+    return validate_inputs(pd.concat(frames, ignore_index=True), np.concatenate(lines))
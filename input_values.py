@@ -0,0 +1,86 @@
+"""
+Input value helpers shared by the batch engine and its caches
+
+A row names its calculation mode and carries that mode's inputs:
+    {"mode": "surface_weight", "depth": ..., "surface_weight": ...}
+    {"mode": "bottom_up", "depth": ..., "wob": ...}
+Rows without a mode are Surface Weight rows, unless they only have a WOB.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict
+
+
+# Row schema: mode -> (label, input fields typed into Orpheus for that mode)
+ROW_MODES = {
+    "surface_weight": ("Surface Weight", ("depth", "surface_weight")),
+    "bottom_up": ("Bottom Up", ("depth", "wob")),
+}
+DEFAULT_MODE = "surface_weight"
+
+# Normalized spellings accepted in a "Mode" cell
+MODE_ALIASES = {
+    "surface_weight": "surface_weight",
+    "surface": "surface_weight",
+    "sw": "surface_weight",
+    "bottom_up": "bottom_up",
+    "bottomup": "bottom_up",
+    "bu": "bottom_up",
+    "wob": "bottom_up",
+}
+
+INPUT_COLUMNS = (
+    ("mode", "Mode"),
+    ("depth", "Depth (ft)"),
+    ("surface_weight", "Surface Weight (lbs)"),
+    ("wob", "WOB (lbs)"),
+)
+
+
+def normalize_header(value: str) -> str:
+    """Normalize header strings for column matching ("Depth (ft)" -> "depth_ft")."""
+    return value.lower().strip().replace(" ", "_").replace("(", "").replace(")", "")
+
+
+def parse_number(value: Any) -> float:
+    """Parse a depth/weight cell ("5,374", " 5374.0 ", 5374) into a finite float"""
+    if isinstance(value, str):
+        value = value.strip().replace(",", "")
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Not a finite number: {value!r}")
+    return number
+
+
+def canonical_number(value: Any) -> str:
+    """Canonical text for a numeric input so "5374", "5374.0" and 5374 compare equal"""
+    return repr(parse_number(value))
+
+
+def row_mode(row: Dict[str, Any]) -> str:
+    """Mode of a row (see ROW_MODES); raises ValueError for an unknown mode"""
+    text = normalize_header(str(row.get("mode") or ""))
+    if not text:
+        has_wob = str(row.get("wob") or "").strip() != ""
+        has_weight = str(row.get("surface_weight") or "").strip() != ""
+        return "bottom_up" if has_wob and not has_weight else DEFAULT_MODE
+    try:
+        return MODE_ALIASES[text]
+    except KeyError:
+        raise ValueError(f"Unknown mode: {row.get('mode')!r}") from None
+
+
+def row_inputs(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The row's mode plus only the inputs that mode uses"""
+    mode = row_mode(row)
+    inputs: Dict[str, Any] = {"mode": mode}
+    inputs.update((name, row.get(name, "")) for name in ROW_MODES[mode][1])
+    return inputs
+
+
+def canonical_inputs(row: Dict[str, Any]) -> str:
+    """Canonical, order-independent text for a row's numeric inputs (and mode, if given)"""
+    return "|".join(
+        f"{name}={row[name] if name == 'mode' else canonical_number(row[name])}" for name in sorted(row)
+    )
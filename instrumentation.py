@@ -0,0 +1,167 @@
+"""
+Per-step timing for the automation loop
+
+TraceCollector records how long every backend operation (typing, clicks,
+reads, Refresh) and every wait takes, plus one span per evaluated row, and
+exports latency histograms and row spans as JSON or CSV. When no collector
+is requested the engine uses NULL_TRACER, whose spans do nothing.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+class TraceCollector:
+    """Latency samples per step name and one span per evaluated row"""
+
+    enabled = True
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.rows: List[Dict[str, Any]] = []
+        self._row: Optional[Dict[str, Any]] = None
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.samples.setdefault(name, []).append(seconds)
+        if self._row is not None:
+            steps = self._row["steps"]
+            steps[name] = steps.get(name, 0.0) + seconds
+
+    @contextmanager
+    def row(self, inputs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Span covering one evaluated row; callers may add keys such as "source" """
+        start = time.perf_counter()
+        self._row = {"row": len(self.rows) + 1, "inputs": dict(inputs), "steps": {}}
+        try:
+            yield self._row
+        finally:
+            span, self._row = self._row, None
+            span["start"] = start - self.started
+            span["seconds"] = time.perf_counter() - start
+            self.rows.append(span)
+            self.samples.setdefault("row", []).append(span["seconds"])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count, total, p50, p95 and max (seconds) for every step name"""
+        result = {}
+        for name, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            result[name] = {
+                "count": len(ordered),
+                "total": sum(ordered),
+                "p50": _percentile(ordered, 0.50),
+                "p95": _percentile(ordered, 0.95),
+                "max": ordered[-1],
+            }
+        return result
+
+    def export_json(self, path: Path):
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"steps": self.summary(), "rows": self.rows}, handle, indent=2)
+
+    def export_csv(self, path: Path, rows_path: Optional[Path] = None):
+        """Write the step histogram to path and, optionally, the row spans to rows_path"""
+        with open(path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["step", "count", "total_s", "p50_ms", "p95_ms", "max_ms"])
+            for name, stats in self.summary().items():
+                writer.writerow([
+                    name, stats["count"], f"{stats['total']:.6f}",
+                    f"{stats['p50'] * 1000:.3f}", f"{stats['p95'] * 1000:.3f}", f"{stats['max'] * 1000:.3f}",
+                ])
+        if rows_path is None:
+            return
+        step_names = sorted({name for span in self.rows for name in span["steps"]})
+        input_names = sorted({name for span in self.rows for name in span["inputs"]})
+        with open(rows_path, "w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["row", *input_names, "source", "start_s", "seconds", *[f"{n}_s" for n in step_names]])
+            for span in self.rows:
+                writer.writerow([
+                    span["row"],
+                    *[span["inputs"].get(name, "") for name in input_names],
+                    span.get("source", ""),
+                    f"{span['start']:.6f}",
+                    f"{span['seconds']:.6f}",
+                    *[f"{span['steps'].get(name, 0.0):.6f}" for name in step_names],
+                ])
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _NullTracer:
+    """Stand-in used when instrumentation is off; every call is a no-op"""
+
+    enabled = False
+
+    def span(self, name: str) -> _NullSpan:
+        return _NULL_SPAN
+
+    def row(self, inputs: Dict[str, Any]) -> _NullSpan:
+        return _NULL_SPAN
+
+    def record(self, name: str, seconds: float):
+        pass
+
+
+NULL_TRACER = _NullTracer()
+
+
+class InstrumentedBackend:
+    """Wraps a backend so every method call is timed as "repo.<method>" """
+
+    def __init__(self, backend: Any, tracer: TraceCollector):
+        self._backend = backend
+        self._tracer = tracer
+        self._wrapped: Dict[str, Callable[..., Any]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        attribute = getattr(self._backend, name)
+        if not callable(attribute) or name.startswith("_"):
+            return attribute
+        span_name = f"repo.{name}"
+        tracer = self._tracer
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                tracer.record(span_name, time.perf_counter() - start)
+
+        self._wrapped[name] = timed
+        return timed
@@ -0,0 +1,486 @@
+"""
+Shared job queue for one Orpheus workstation
+
+Several engineers can share one licensed Orpheus session: instead of each
+GUI driving the window, batches are submitted to a local HTTP/JSON service
+that owns the only Orpheus connection and runs jobs one round at a time.
+
+- Jobs are queued by priority (higher first), then submission order.
+- Identical rows (same mode and inputs) queued or running in any job are
+  calculated once and answered for every job that asked; rows finished
+  earlier come from the shared result cache.
+- Each round is planned and run through iter_automation_batch on one warm
+  backend, with the shared result cache, so a new urgent job waits at most
+  one round.
+- Results stream back to each submitter in its own row order.
+- Rows with a bad cell are answered at once with their problem as the error;
+  the rest of the job runs.
+
+    python job_server.py serve [--port 8765] [--simulate]
+    python job_server.py submit inputs.csv results.csv --priority 5
+
+API (JSON):
+    POST   /jobs               {"rows": [...], "priority": 0, "owner": "..."}
+    GET    /jobs               Summary of every job
+    GET    /jobs/<id>          Status and results so far
+    GET    /jobs/<id>/results  Results as NDJSON lines, streamed until the job ends
+    DELETE /jobs/<id>          Cancel
+"""
+from __future__ import annotations
+
+import argparse
+import getpass
+import itertools
+import json
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from automation_backend import AutomationBackend
+from batch_scheduler import row_key
+from completion_wait import CancelToken
+from result_cache import ResultCache
+from result_export import EXPORT_FIELDS, export_record
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Unique rows per round; a higher-priority job can start after at most this many
+DEFAULT_ROUND_ROWS = 50
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 200
+
+FINISHED_STATES = ("done", "cancelled", "failed")
+
+
+class Job:
+    """One submitted batch and its results, released in row order"""
+
+    def __init__(self, rows: List[Dict[str, Any]], priority: int = 0, owner: str = ""):
+        from input_import import validate_rows
+
+        self.id = uuid.uuid4().hex[:12]
+        validation = validate_rows(rows)
+        # Row number -> what is wrong with it; rejected rows are answered at once and never run
+        self.rejected = validation.problems_by_line()
+        valid = iter(validation.rows)
+        self.rows = [dict(row) if idx + 1 in self.rejected else next(valid) for idx, row in enumerate(rows)]
+        self.keys: List[Optional[Tuple[str, ...]]] = [
+            None if idx + 1 in self.rejected else row_key(row) for idx, row in enumerate(self.rows)
+        ]
+        self.priority = priority
+        self.owner = owner
+        self.submitted = datetime.now().isoformat(timespec="seconds")
+        self.status = "queued"
+        self.error = ""
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(self.rows)
+        self.released = 0
+        # Rows before cursor are answered or in a running round
+        self.cursor = 0
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def set_result(self, idx: int, record: Dict[str, Any]):
+        with self._changed:
+            if self.finished:
+                return
+            self.results[idx] = record
+            while self.released < len(self.results) and self.results[self.released] is not None:
+                self.released += 1
+            if self.released == len(self.results):
+                self.status = "done"
+            self._changed.notify_all()
+
+    def finish(self, status: str, error: str = ""):
+        with self._changed:
+            if not self.finished:
+                self.status, self.error = status, error
+            self._changed.notify_all()
+
+    def stream(self, start: int = 0, poll: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """Released results from row start on, waiting for new ones until the job ends"""
+        position = start
+        while True:
+            with self._changed:
+                while position >= self.released and not self.finished:
+                    self._changed.wait(poll)
+                ready = self.results[position:self.released]
+                ended = self.finished
+            yield from ready
+            position += len(ready)
+            if ended and position >= self.released:
+                return
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "owner": self.owner,
+            "priority": self.priority,
+            "submitted": self.submitted,
+            "status": self.status,
+            "rows": len(self.rows),
+            "completed": self.released,
+            "error": self.error,
+        }
+
+
+class _RoundSink:
+    """Result sink of one round: hands each record to every job row waiting on it"""
+
+    def __init__(self, queue: "JobQueue", keys: List[Tuple[str, ...]]):
+        self.queue = queue
+        self.keys = keys
+
+    def write(self, record: Dict[str, Any]):
+        for job, idx in self.queue._take_running(self.keys[record["row"] - 1]):
+            job.set_result(idx, dict(record, row=idx + 1))
+
+
+class JobQueue:
+    """
+    Priority queue of jobs run by a single worker thread on one backend.
+
+    Parameters
+    ----------
+    backend_factory : Callable[[], AutomationBackend]
+        Connects to Orpheus (default Button_Repository); called again after
+        a round fails, so a restarted Orpheus is picked up
+    cache : Optional[ResultCache]
+        Shared result cache
+    round_rows : int
+        Unique rows planned and run together
+    status_callback : Optional[Callable[[str], None]]
+        Engine status messages
+    """
+
+    def __init__(
+        self,
+        backend_factory: Optional[Callable[[], AutomationBackend]] = None,
+        cache: Optional[ResultCache] = None,
+        round_rows: int = DEFAULT_ROUND_ROWS,
+        status_callback: Optional[Callable[[str], None]] = None,
+    ):
+        self.backend_factory = backend_factory or _connect_orpheus
+        self.cache = cache
+        self.round_rows = round_rows
+        self.status_callback = status_callback
+        self.jobs: Dict[str, Job] = {}
+        # Row key -> job rows waiting for it, across all jobs, before and during its round
+        self._waiting: Dict[Tuple[str, ...], List[Tuple[Job, int]]] = {}
+        self._running: Dict[Tuple[str, ...], List[Tuple[Job, int]]] = {}
+        self._order = itertools.count()
+        self._sequence: Dict[str, int] = {}
+        self._lock = threading.Condition()
+        self._token = CancelToken()
+        self._repo: Optional[AutomationBackend] = None
+        self._worker = threading.Thread(target=self._run, daemon=True, name="job-queue")
+
+    def start(self):
+        self._worker.start()
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Stop after the current row; unfinished jobs are cancelled"""
+        self._token.cancel()
+        with self._lock:
+            self._lock.notify_all()
+        self._worker.join(timeout)
+        for job in list(self.jobs.values()):
+            job.finish("cancelled", "Server stopped")
+
+    def submit(self, rows: List[Dict[str, Any]], priority: int = 0, owner: str = "") -> Job:
+        """Queue rows as a new job; rows with a bad cell are answered with their problem"""
+        job = Job(rows, priority, owner)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+            self._sequence[job.id] = next(self._order)
+            for line, problem in job.rejected.items():
+                job.set_result(line - 1, export_record(line - 1, job.rows[line - 1], {"Error": problem}))
+            for idx, key in enumerate(job.keys):
+                if key is None:
+                    continue
+                # A row already in the running round is answered with it
+                waiters = self._running.get(key)
+                if waiters is None:
+                    waiters = self._waiting.setdefault(key, [])
+                waiters.append((job, idx))
+            if not job.rows:
+                job.finish("done")
+            self._lock.notify_all()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            job.finish("cancelled")
+            self._drop_waiters(job)
+        return True
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.summary() for job in self.jobs.values()]
+
+    def _drop_waiters(self, job: Job):
+        for key in set(job.keys[job.cursor:]):
+            waiters = [waiter for waiter in self._waiting.get(key, ()) if waiter[0] is not job]
+            if waiters:
+                self._waiting[key] = waiters
+            else:
+                self._waiting.pop(key, None)
+
+    def _take_running(self, key: Tuple[str, ...]) -> List[Tuple[Job, int]]:
+        with self._lock:
+            return self._running.pop(key, [])
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+            del self._sequence[job_id]
+
+    def _next_round(self) -> Tuple[List[Dict[str, Any]], List[Tuple[str, ...]]]:
+        """Up to round_rows unique rows and their keys, most urgent jobs first"""
+        rows: List[Dict[str, Any]] = []
+        keys: List[Tuple[str, ...]] = []
+        active = [job for job in self.jobs.values() if not job.finished]
+        active.sort(key=lambda job: (-job.priority, self._sequence[job.id]))
+        for job in active:
+            while job.cursor < len(job.rows) and len(rows) < self.round_rows:
+                key = job.keys[job.cursor]
+                if key in self._waiting:
+                    rows.append(job.rows[job.cursor])
+                    keys.append(key)
+                    self._running[key] = self._waiting.pop(key)
+                    job.status = "running"
+                job.cursor += 1
+            if len(rows) >= self.round_rows:
+                break
+        return rows, keys
+
+    def _run(self):
+        from Automation import iter_automation_batch
+
+        while not self._token.cancelled:
+            with self._lock:
+                rows, keys = self._next_round()
+                if not rows:
+                    self._lock.wait(1.0)
+                    continue
+            try:
+                if self._repo is None:
+                    self._repo = self.backend_factory()
+                for _ in iter_automation_batch(
+                    rows,
+                    status_callback=self.status_callback,
+                    cache=self.cache,
+                    repo=self._repo,
+                    sink=_RoundSink(self, keys),
+                    cancel_token=self._token,
+                ):
+                    pass
+            except Exception as exc:
+                # Reconnect next round; the rows of this round are answered with the error
+                self._repo = None
+                if self.status_callback:
+                    self.status_callback(f"Round failed: {exc}")
+                for key in keys:
+                    for job, idx in self._take_running(key):
+                        job.set_result(idx, export_record(idx, job.rows[idx], {"Error": str(exc)}))
+
+
+def _connect_orpheus() -> AutomationBackend:
+    from Button_Repository import Button_Repository
+    return Button_Repository()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a JobQueue (server.jobs)"""
+
+    server_version = "BuckelingJobServer/1.0"
+
+    def do_GET(self):
+        parts = self._parts()
+        queue: JobQueue = self.server.jobs
+        if parts == ["jobs"]:
+            return self._send_json(200, {"jobs": queue.summaries()})
+        job = queue.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            return self._send_json(404, {"error": "No such job"})
+        if len(parts) == 2:
+            return self._send_json(200, dict(job.summary(), results=job.results[:job.released]))
+        if parts[2:] == ["results"]:
+            return self._stream(job)
+        return self._send_json(404, {"error": "Unknown path"})
+
+    def do_POST(self):
+        if self._parts() != ["jobs"]:
+            return self._send_json(404, {"error": "Unknown path"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            rows = payload["rows"]
+            if not isinstance(rows, list):
+                raise ValueError("rows must be a list")
+            job = self.server.jobs.submit(rows, int(payload.get("priority", 0)), str(payload.get("owner", "")))
+        except (KeyError, TypeError, ValueError) as exc:
+            return self._send_json(400, {"error": f"Invalid job: {exc}"})
+        self._send_json(202, job.summary())
+
+    def do_DELETE(self):
+        parts = self._parts()
+        if len(parts) != 2 or parts[0] != "jobs" or not self.server.jobs.cancel(parts[1]):
+            return self._send_json(404, {"error": "No such job"})
+        self._send_json(200, self.server.jobs.jobs[parts[1]].summary())
+
+    def _parts(self) -> List[str]:
+        return [part for part in self.path.split("?")[0].split("/") if part]
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, job: Job):
+        # No Content-Length: the response ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for record in job.stream():
+                self.wfile.write(json.dumps(record).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            self.wfile.write(json.dumps({"status": job.status, "error": job.error}).encode("utf-8") + b"\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Submitter went away; the job keeps running
+
+
+def serve(jobs: JobQueue, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """HTTP server for jobs; call serve_forever() on it, and jobs.close() afterwards"""
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    server.jobs = jobs
+    jobs.start()
+    return server
+
+
+# -- Client ------------------------------------------------------------------
+
+def submit_job(server_url: str, rows: Sequence[Dict[str, Any]], priority: int = 0, owner: str = "") -> Dict[str, Any]:
+    """Submit rows to a job server; returns the job summary (with its "id")"""
+    body = json.dumps({"rows": list(rows), "priority": priority, "owner": owner}).encode("utf-8")
+    request = urllib.request.Request(
+        f"{server_url.rstrip('/')}/jobs", data=body, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def stream_results(server_url: str, job_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield a job's results in row order as the server releases them"""
+    with urllib.request.urlopen(f"{server_url.rstrip('/')}/jobs/{job_id}/results") as response:
+        for line in response:
+            record = json.loads(line)
+            if "row" not in record:
+                # Final status line
+                if record.get("status") != "done":
+                    raise RuntimeError(f"Job {job_id} {record.get('status')}: {record.get('error')}")
+                return
+            yield record
+
+
+def cancel_job(server_url: str, job_id: str):
+    request = urllib.request.Request(f"{server_url.rstrip('/')}/jobs/{job_id}", method="DELETE")
+    urllib.request.urlopen(request, timeout=30).close()
+
+
+# -- Command line ------------------------------------------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Share one Orpheus session through a local job queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    server = sub.add_parser("serve", help="Run the job server on this workstation")
+    server.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default {DEFAULT_HOST})")
+    server.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default {DEFAULT_PORT})")
+    server.add_argument("--round-rows", type=int, default=DEFAULT_ROUND_ROWS,
+                        help=f"Unique rows run between priority checks (default {DEFAULT_ROUND_ROWS})")
+    server.add_argument("--cache", action="store_true",
+                        help="Answer rows already calculated for the loaded model from the result cache")
+    server.add_argument("--simulate", action="store_true", help="Serve a SimulatedOrpheus instead of Orpheus")
+    server.add_argument("--quiet", action="store_true", help="Only print errors")
+
+    submit = sub.add_parser("submit", help="Submit an input file and write its results")
+    submit.add_argument("input", type=Path, help="CSV, TSV or XLSX file of input rows")
+    submit.add_argument("output", type=Path, help="CSV or XLSX file to write results to")
+    submit.add_argument("--server", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", help="Job server URL")
+    submit.add_argument("--priority", type=int, default=0, help="Higher runs first (default 0)")
+    submit.add_argument("--owner", default=None, help="Shown in the job list (default: user name)")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        factory = None
+        if args.simulate:
+            from simulated_orpheus import SimulatedOrpheus
+            factory = SimulatedOrpheus
+        status = None if args.quiet else (lambda message: print(message, flush=True))
+        jobs = JobQueue(factory, ResultCache() if args.cache else None, args.round_rows, status)
+        server = serve(jobs, args.host, args.port)
+        print(f"Job server on http://{args.host}:{server.server_port}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            jobs.close()
+        return 0
+
+    from cli import open_writer
+    from input_import import read_input_file
+
+    validation = read_input_file(args.input)
+    if validation.issues:
+        print(validation.summary(), file=sys.stderr)
+    if not validation.rows:
+        return 1
+    job = submit_job(args.server, validation.rows, args.priority, args.owner or getpass.getuser())
+    print(f"Job {job['id']}: {job['rows']} rows queued", flush=True)
+    started = time.perf_counter()
+    writer = open_writer(args.output, list(EXPORT_FIELDS))
+    written = 0
+    try:
+        for record in stream_results(args.server, job["id"]):
+            writer.write([record.get(col, "") for col in EXPORT_FIELDS])
+            written += 1
+    except KeyboardInterrupt:
+        cancel_job(args.server, job["id"])
+        print(f"Cancelled after {written} rows", file=sys.stderr)
+        return 130
+    except RuntimeError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    print(f"Wrote {written} rows to {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
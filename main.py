@@ -2,24 +2,84 @@
 Buckeling Automation - Main Entry Point
 Author: Brad Smith
 Version: 1.0.0
+
+    python main.py                  Start the GUI
+    python main.py --startup-time   Report import cost per module and time to first window
 """
-from GUI_Automation import launch_gui
-from updater import check_and_update
+import builtins
+import sys
+import time
+
 from version import __version__
 #from Automation import results
 
 
+class ImportTimer:
+    """Records self and cumulative seconds of every module imported while installed"""
+
+    def __init__(self):
+        self.times = {}
+        self._children = []
+        self._import = builtins.__import__
+
+    def __enter__(self):
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.__import__ = self._import
+        return False
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        self._children.append(0.0)
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - start
+            children = self._children.pop()
+            self.times[name] = (cumulative - children, cumulative)
+            if self._children:
+                self._children[-1] += cumulative
+
+
+def profile_startup(top=20):
+    """Import and draw the GUI, print where the startup time went, then exit"""
+    started = time.perf_counter()
+    with ImportTimer() as timer:
+        from GUI_Automation import BuckelingAutomationGUI
+        imported = time.perf_counter()
+        app = BuckelingAutomationGUI()
+        app.root.update()
+    shown = time.perf_counter()
+    app.root.destroy()
+
+    print(f"Imports: {(imported - started) * 1000:8.1f} ms")
+    print(f"Window:  {(shown - imported) * 1000:8.1f} ms")
+    print(f"Total:   {(shown - started) * 1000:8.1f} ms")
+    print(f"\n{'self ms':>9} {'total ms':>9}  module")
+    ranked = sorted(timer.times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_time, cumulative) in ranked[:top]:
+        print(f"{self_time * 1000:9.1f} {cumulative * 1000:9.1f}  {name}")
+    return 0
+
+
 def main():
     """Start the automation GUI application"""
-    # Check for updates first
+    if "--startup-time" in sys.argv[1:]:
+        return profile_startup()
+
     print(f"Buckeling Automation v{__version__}")
-    if check_and_update():
-        # Update is being installed, exit the application
-        return
-    
-    # Start the GUI
-    launch_gui()
+    from GUI_Automation import BuckelingAutomationGUI
+    from updater import check_for_updates_in_background
+
+    app = BuckelingAutomationGUI()
+    # Check for updates in the background; the window is usable meanwhile
+    check_for_updates_in_background(app.root, status_callback=app._update_status)
+    app.run()
     #print(f"\nFinal results: {results}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Parallel batches across several Orpheus windows on one workstation
+
+Each running Orpheus instance gets its own Button_Repository and worker
+thread. The planned rows are cut into contiguous chunks (so neighbouring
+rows, which share inputs, stay on one instance) and workers pull chunks from
+a shared queue. A row that fails on a working instance is recorded with its
+error. An instance that loses its window, or fails row after row, retires
+and its unfinished rows go back on the queue for the others; results are
+merged back into input order.
+"""
+from __future__ import annotations
+
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from Automation import run_automation_batch
+from Button_Repository import Button_Repository, OrpheusInstance, list_orpheus_instances
+from batch_scheduler import OrderedResults, PlannedStep, plan_batch
+from recovery import DEFAULT_RECOVERY, WINDOW
+
+
+CHUNKS_PER_INSTANCE = 4
+
+
+class _Chunk:
+    def __init__(self, steps: List[PlannedStep]):
+        self.steps = steps
+        self.last_error = ""
+
+
+class _InstanceFailed(RuntimeError):
+    """Raised from the chunk callback to retire the instance running it"""
+
+
+def run_parallel_batch(
+    data_list: List[Dict[str, Any]],
+    instances: Optional[Sequence[OrpheusInstance]] = None,
+    status_callback: Optional[Callable[[str], None]] = None,
+    result_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    stop_check: Optional[Callable[[], bool]] = None,
+    chunk_size: Optional[int] = None,
+    **batch_kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Execute a batch across every running Orpheus instance.
+
+    Parameters
+    ----------
+    data_list : List[Dict[str, Any]]
+        List of input dictionaries with 'depth' and 'surface_weight' keys
+    instances : Optional[Sequence[OrpheusInstance]]
+        Instances to use; defaults to all running Orpheus windows
+    status_callback, result_callback, stop_check
+        As for run_automation_batch. Results are delivered in input order.
+    chunk_size : Optional[int]
+        Unique rows handed to a worker at a time
+    **batch_kwargs
+        Passed to run_automation_batch for every chunk (row_timeout, cache,
+        recovery, ...). A row that still fails after the recovery policy's
+        retries is recorded with its error once its instance finishes
+        another row. An instance whose window is lost, or whose rows fail
+        max_consecutive_failures times in a row, retires instead, and those
+        rows go to another instance.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        One result per input row, in input order. Rows that no instance
+        could complete have an empty "WOB Buckeling" and an "Error" message.
+    """
+    if instances is None:
+        instances = list_orpheus_instances()
+    if not instances:
+        raise RuntimeError("No running Orpheus window found")
+
+    recovery = batch_kwargs.pop("recovery", DEFAULT_RECOVERY)
+    # Without recovery the first failed row stops the chunk and retires the instance
+    max_failures = recovery.max_consecutive_failures if recovery is not None else 1
+
+    plan = plan_batch(data_list)
+    ordered = OrderedResults(plan.total_rows, result_callback)
+    if not plan.steps:
+        return ordered.results
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(plan.steps) / (len(instances) * CHUNKS_PER_INSTANCE)))
+
+    work: "queue.Queue[_Chunk]" = queue.Queue()
+    for start in range(0, len(plan.steps), chunk_size):
+        work.put(_Chunk(plan.steps[start:start + chunk_size]))
+
+    lock = threading.Lock()
+    live_instances = {instance.process_id for instance in instances}
+    failed_chunks: List[_Chunk] = []
+    busy = 0
+
+    def report(message: str):
+        if status_callback:
+            with lock:
+                status_callback(message)
+
+    def stopped() -> bool:
+        return bool(stop_check and stop_check())
+
+    def worker(instance: OrpheusInstance):
+        nonlocal busy
+        label = f"[Orpheus {instance.process_id}]"
+        try:
+            repo = Button_Repository(process=instance.process_id)
+        except Exception as exc:
+            report(f"{label} Could not connect: {exc}")
+            with lock:
+                live_instances.discard(instance.process_id)
+            return
+
+        # Failed rows since this instance last finished a row: bad rows when
+        # the instance finishes the next one, a broken instance when they pile up
+        suspects: List[Tuple[PlannedStep, Dict[str, Any]]] = []
+
+        def record_suspects():
+            with lock:
+                for step, result_data in suspects:
+                    ordered.add(step, result_data)
+            suspects.clear()
+
+        while not stopped():
+            with lock:
+                try:
+                    chunk = work.get_nowait()
+                    busy += 1
+                except queue.Empty:
+                    if busy == 0:
+                        break
+                    chunk = None
+            if chunk is None:
+                # Another instance may still fail and hand rows back
+                time.sleep(0.1)
+                continue
+
+            done = 0
+
+            def chunk_result(result_data: Dict[str, Any]):
+                nonlocal done
+                step = chunk.steps[done]
+                done += 1
+                error = result_data.get("Error")
+                if not error:
+                    # The instance works, so rows that failed before this one were bad rows
+                    record_suspects()
+                    with lock:
+                        ordered.add(step, result_data)
+                    return
+                suspects.append((step, dict(result_data)))
+                # The failure kind prefixes the error (see Automation._BatchRunner._fail_row)
+                if error.startswith(f"{WINDOW}:") or len(suspects) >= max_failures:
+                    raise _InstanceFailed(error)
+
+            try:
+                run_automation_batch(
+                    [step.inputs for step in chunk.steps],
+                    status_callback=lambda message: report(f"{label} {message}"),
+                    result_callback=chunk_result,
+                    stop_check=stop_check,
+                    repo=repo,
+                    recovery=recovery,
+                    **batch_kwargs,
+                )
+            except Exception as exc:
+                # Isolate the failure: hand the failed and unfinished rows to another instance
+                remaining = _Chunk([step for step, _ in suspects] + chunk.steps[done:])
+                remaining.last_error = str(exc)
+                suspects.clear()
+                report(f"{label} Failed, reassigning {len(remaining.steps)} rows: {exc}")
+                with lock:
+                    live_instances.discard(instance.process_id)
+                    if live_instances:
+                        work.put(remaining)
+                    else:
+                        failed_chunks.append(remaining)
+                    busy -= 1
+                return
+            with lock:
+                busy -= 1
+        record_suspects()
+
+    threads = [
+        threading.Thread(target=worker, args=(instance,), daemon=True, name=f"orpheus-{instance.process_id}")
+        for instance in instances
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not stopped():
+        # Rows nobody could run (every instance failed) are recorded, not dropped
+        while not work.empty():
+            failed_chunks.append(work.get_nowait())
+        for chunk in failed_chunks:
+            for step in chunk.steps:
+                ordered.add(step, {"WOB Buckeling": "", "Error": chunk.last_error or "No Orpheus instance available"})
+
+    report(f"Completed {len(ordered.results)} rows on {len(instances)} Orpheus instances")
+    return ordered.results
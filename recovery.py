@@ -0,0 +1,79 @@
+"""
+Failure classification and retry policy for unattended batches
+
+When a row fails, the engine classifies the exception, dismisses any Orpheus
+warning dialog, reconnects if the window was lost, re-reads what Orpheus
+shows and retries the row after a growing delay. A row that still fails is
+recorded with an "Error" instead of ending the batch; only a long streak of
+failed rows (Orpheus gone for good) stops the run, which can then be resumed
+from its journal.
+
+Exceptions are classified by class name so this module does not need
+pywinauto or comtypes.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import FrozenSet
+
+
+# Failure kinds
+DIALOG = "dialog"    # A modal dialog blocks input or the recalculation
+STALE = "stale"      # A control was destroyed or could not be found
+WINDOW = "window"    # The Orpheus window or process is gone
+TIMEOUT = "timeout"  # No result within the row timeout
+INPUT = "input"      # A value could not be typed
+OTHER = "other"
+
+_KINDS_BY_NAME = {
+    "CompletionTimeoutError": TIMEOUT,
+    "ElementNotFoundError": STALE,
+    "ElementAmbiguousError": STALE,
+    "COMError": STALE,
+    "ElementNotEnabled": DIALOG,
+    "ElementNotVisible": DIALOG,
+    "SimulatedDialogError": DIALOG,
+    "WindowNotFoundError": WINDOW,
+    "ProcessNotFoundError": WINDOW,
+    "AppNotConnected": WINDOW,
+    "InputRejectedError": INPUT,
+}
+
+
+def classify_failure(exc: BaseException) -> str:
+    """Failure kind of an exception raised while evaluating a row"""
+    for cls in type(exc).__mro__:
+        kind = _KINDS_BY_NAME.get(cls.__name__)
+        if kind is not None:
+            return kind
+    return OTHER
+
+
+@dataclass(frozen=True)
+class RecoveryPolicy:
+    """
+    How the engine retries a failing row.
+
+    Parameters
+    ----------
+    max_attempts : int
+        Evaluations per row, including the first
+    backoff, max_backoff : float
+        Seconds before the first retry, doubled per retry up to max_backoff
+    max_consecutive_failures : int
+        Consecutive rows that may fail before the batch is stopped
+    retry_kinds : FrozenSet[str]
+        Failure kinds that are retried; others fail the row at once
+    """
+    max_attempts: int = 3
+    backoff: float = 1.0
+    max_backoff: float = 10.0
+    max_consecutive_failures: int = 10
+    retry_kinds: FrozenSet[str] = frozenset({DIALOG, STALE, WINDOW, TIMEOUT, INPUT})
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt (1-based)"""
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+
+
+DEFAULT_RECOVERY = RecoveryPolicy()
@@ -0,0 +1,174 @@
+"""
+Persistent FOE result cache
+
+Results are keyed on the canonical numeric inputs of a row plus a fingerprint
+of the model loaded in Orpheus, so "5374" and "5374.0" hit the same entry and
+results from a different well model never match. Lookups go through an
+in-memory LRU first and an on-disk SQLite store second.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app_paths import app_data_dir
+from input_values import canonical_inputs
+
+
+DEFAULT_MEMORY_ENTRIES = 4096
+DEFAULT_MAX_ENTRIES = 250_000
+DEFAULT_MAX_AGE_DAYS = 30.0
+
+
+def default_cache_path() -> Path:
+    return app_data_dir() / "result_cache.sqlite3"
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of FOE results.
+
+    Parameters
+    ----------
+    path : Optional[Path]
+        SQLite file, or ":memory:" for a throwaway store. Defaults to the
+        per-user application data folder.
+    memory_entries : int
+        Size of the in-memory LRU
+    max_entries : int
+        Disk entries kept by evict(); least recently used are dropped first
+    max_age_days : Optional[float]
+        Disk entries older than this are dropped by evict()
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_days: Optional[float] = DEFAULT_MAX_AGE_DAYS,
+    ):
+        self.path = str(path or default_cache_path())
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._memory: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                model TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                foe TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, inputs)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_last_used ON results (last_used)")
+        self._db.commit()
+        self.evict()
+
+    def get(self, model: str, inputs: Dict[str, Any]) -> Optional[str]:
+        """Cached FOE for inputs under model, or None"""
+        key = (model, canonical_inputs(inputs))
+        with self._lock:
+            foe = self._memory.get(key)
+            if foe is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return foe
+
+            row = self._db.execute(
+                "SELECT foe FROM results WHERE model = ? AND inputs = ?", key
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE results SET last_used = ? WHERE model = ? AND inputs = ?",
+                (time.time(), *key),
+            )
+            self._db.commit()
+            self.disk_hits += 1
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, model: str, inputs: Dict[str, Any], foe: str):
+        """Store a FOE result measured for inputs under model"""
+        key = (model, canonical_inputs(inputs))
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (model, inputs, foe, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, str(foe), now, now),
+            )
+            self._db.commit()
+            self._remember(key, str(foe))
+
+    def _remember(self, key: Tuple[str, str], foe: str):
+        self._memory[key] = foe
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def evict(self) -> int:
+        """Drop disk entries past max_age_days and beyond max_entries; returns count dropped"""
+        removed = 0
+        with self._lock:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._db.execute(
+                    "DELETE FROM results WHERE created < ?", (cutoff,)
+                ).rowcount
+            removed += self._db.execute(
+                "DELETE FROM results WHERE rowid IN ("
+                "SELECT rowid FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._db.commit()
+            if removed:
+                self._memory.clear()
+        return removed
+
+    def invalidate_model(self, model: Optional[str] = None) -> int:
+        """Forget results for one model fingerprint, or everything when model is None"""
+        with self._lock:
+            if model is None:
+                removed = self._db.execute("DELETE FROM results").rowcount
+                self._memory.clear()
+            else:
+                removed = self._db.execute(
+                    "DELETE FROM results WHERE model = ?", (model,)
+                ).rowcount
+                for key in [key for key in self._memory if key[0] == model]:
+                    del self._memory[key]
+            self._db.commit()
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
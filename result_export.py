@@ -0,0 +1,198 @@
+"""
+Streaming result export
+
+The batch engine hands every row to a result sink as soon as it is known:
+row number, inputs, FOE, where the value came from and how long it took.
+Rows arrive in the order they finish; the row number gives the input order.
+CsvResultSink appends and flushes one line per row, so a partial run can
+always be exported; ParquetResultSink writes a typed, columnar file in row
+groups (requires pyarrow). Neither keeps the whole run in memory.
+"""
+from __future__ import annotations
+
+import csv
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Protocol
+
+from input_values import INPUT_COLUMNS, parse_number
+
+
+RESULT_COLUMNS = ("WOB Buckeling",)
+# Present in the results of rows that failed after every retry
+ERROR_COLUMN = "Error"
+EXPORT_FIELDS = (
+    "row",
+    *(key for key, _ in INPUT_COLUMNS),
+    *RESULT_COLUMNS,
+    "error",
+    "source",
+    "seconds",
+    "finished",
+)
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+class ResultSink(Protocol):
+    """Receives one export record per input row, in the order rows finish"""
+
+    def write(self, record: Dict[str, Any]) -> None:
+        ...
+
+
+def export_record(
+    index: int,
+    inputs: Dict[str, Any],
+    result: Dict[str, Any],
+    source: str = "",
+    seconds: float = 0.0,
+) -> Dict[str, Any]:
+    """Flat record for row index (0-based) joining its inputs and result"""
+    record: Dict[str, Any] = {"row": index + 1}
+    record.update((key, inputs.get(key, "")) for key, _ in INPUT_COLUMNS)
+    record.update((col, result.get(col, "")) for col in RESULT_COLUMNS)
+    record["error"] = result.get(ERROR_COLUMN, "")
+    record["source"] = source
+    record["seconds"] = round(seconds, 6)
+    record["finished"] = datetime.now().isoformat(timespec="milliseconds")
+    return record
+
+
+class CsvResultSink:
+    """
+    CSV export flushed after every record. With append=True an existing file
+    is continued without repeating the header.
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = Path(path)
+        write_header = not (append and self.path.exists() and self.path.stat().st_size > 0)
+        self._handle = open(self.path, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._handle, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        if write_header:
+            self._writer.writeheader()
+            self._handle.flush()
+
+    def write(self, record: Dict[str, Any]):
+        self._writer.writerow(record)
+        self._handle.flush()
+
+    def close(self):
+        if not self._handle.closed:
+            self._handle.close()
+
+
+class ParquetResultSink:
+    """
+    Columnar export with typed columns (non-numeric FOE and the inputs a
+    row's mode does not use become null).
+    Records are written in row groups of batch_rows; the file is only
+    readable once closed, so keep a CSV sink for runs that may be interrupted.
+    """
+
+    def __init__(self, path: Path, batch_rows: int = 10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)") from exc
+
+        self.path = Path(path)
+        self.batch_rows = batch_rows
+        self._pa = pa
+        self._schema = pa.schema(
+            [("row", pa.int64())]
+            + [(key, pa.string() if key == "mode" else pa.float64()) for key, _ in INPUT_COLUMNS]
+            + [(col, pa.float64()) for col in RESULT_COLUMNS]
+            + [("error", pa.string()), ("source", pa.string()), ("seconds", pa.float64()), ("finished", pa.string())]
+        )
+        self._writer = pq.ParquetWriter(str(self.path), self._schema)
+        self._pending: List[Dict[str, Any]] = []
+
+    def write(self, record: Dict[str, Any]):
+        typed = dict(record, row=int(record["row"]))
+        for name in self._schema.names:
+            if self._schema.field(name).type == self._pa.float64():
+                typed[name] = _number_or_none(record.get(name))
+        self._pending.append(typed)
+        if len(self._pending) >= self.batch_rows:
+            self._flush()
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._flush()
+        self._writer.close()
+        self._writer = None
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+
+class MultiSink:
+    """Writes every record to each of several sinks"""
+
+    def __init__(self, *sinks: ResultSink):
+        self.sinks = sinks
+
+    def write(self, record: Dict[str, Any]):
+        for sink in self.sinks:
+            sink.write(record)
+
+
+def open_sink(path: Path, append: bool = False):
+    """CSV or Parquet sink chosen by file suffix"""
+    if Path(path).suffix.lower() in PARQUET_SUFFIXES:
+        return ParquetResultSink(path)
+    return CsvResultSink(path, append=append)
+
+
+def read_export(path: Path) -> Iterator[Dict[str, str]]:
+    """Records of a CSV export, streamed"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        yield from csv.DictReader(handle)
+
+
+def export_file(source: Path, destination: Path) -> int:
+    """Copy a CSV export (possibly still being written) to destination; returns rows copied"""
+    sink = open_sink(destination)
+    count = 0
+    try:
+        for record in read_export(source):
+            if record.get("finished") is None:
+                continue  # Last line still being written
+            sink.write(record)
+            count += 1
+    finally:
+        sink.close()
+    return count
+
+
+def correct_export(path: Path, corrections: Dict[int, Any], source: str = "verified") -> int:
+    """
+    Rewrite the FOE of a finished CSV export for row index -> FOE
+    corrections (0-based, e.g. from result_verification); returns rows changed
+    """
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    changed = 0
+    with open(temporary, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in read_export(path):
+            foe = corrections.get(int(record["row"]) - 1)
+            if foe is not None:
+                record.update({RESULT_COLUMNS[0]: foe, "error": "", "source": source})
+                changed += 1
+            writer.writerow(record)
+    temporary.replace(path)
+    return changed
+
+
+def _number_or_none(value: Any) -> Optional[float]:
+    try:
+        return parse_number(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,387 @@
+"""
+Compact columnar store for batch results
+
+Results of long sweeps are kept as typed numpy columns instead of one dict
+per row: mode, depth, surface weight, WOB and FOE as numbers, the decimals
+FOE was shown with, a status code, where the value came from and the seconds
+it took, about 40 bytes a row.
+The engine appends rows in input order (through OrderedStoreSink);
+readers take read-only views of the filled part of each column without
+copying, for verification, plotting or export. store[i] is a ResultRow, a
+two-slot mapping that stands in for a result dict in callbacks.
+
+FOE is given back exactly as Orpheus showed it ("1234.0" stays "1234.0"):
+the number and its decimals rebuild the text. Text is only kept for rows
+that need it: FOE text the number cannot rebuild (not a number, or written
+differently), and the error message of failed rows.
+"""
+from __future__ import annotations
+
+import math
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+from input_values import INPUT_COLUMNS, ROW_MODES, parse_number, row_inputs
+from result_export import ERROR_COLUMN, RESULT_COLUMNS
+
+
+# Row status codes
+OK = 0
+NOT_A_NUMBER = 1  # Orpheus showed something other than a number
+FAILED = 2        # The row failed after every retry
+CORRECTED = 3     # FOE replaced by a verification re-run
+NOT_RUN = 4       # Batch stopped before this row, but after a later one finished
+STATUS_NAMES = ("ok", "not a number", "failed", "corrected", "not run")
+
+MODES = tuple(ROW_MODES)
+SOURCES = ("", "orpheus", "cache", "journal")
+INPUT_FIELDS = tuple(key for key, _ in INPUT_COLUMNS if key != "mode")
+FOE_COLUMN = RESULT_COLUMNS[0]
+COLUMN_TYPES = {
+    "mode": np.int8,
+    **{key: np.float64 for key in INPUT_FIELDS},
+    "foe": np.float64,
+    "decimals": np.uint8,
+    "status": np.uint8,
+    "source": np.uint8,
+    "seconds": np.float32,
+}
+# Columns of the GUI results table and of copied results
+TABLE_HEADINGS = ("Row", *(heading for _, heading in INPUT_COLUMNS), FOE_COLUMN, ERROR_COLUMN)
+
+DEFAULT_CAPACITY = 1024
+# FOE text with more decimals than this is kept as text
+MAX_DECIMALS = 20
+
+
+def _number(value: Any) -> float:
+    try:
+        return parse_number(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _decimals(text: str) -> int:
+    """Digits after the decimal point of a number as text"""
+    point = text.find(".")
+    return len(text) - point - 1 if point >= 0 else 0
+
+
+def _text(value: float) -> str:
+    """Shortest text for a stored number; "" for a missing one"""
+    return "" if math.isnan(value) else format(value, ".15g")
+
+
+class ResultStore:
+    """
+    Append-only typed columns, one row per input row in input order.
+
+    Written by one thread (the engine) while others read: a row is complete
+    before it is counted in len(), and columns are only ever replaced by
+    larger copies, so a reader never sees a half-written row.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._columns = {name: np.empty(max(1, capacity), dtype) for name, dtype in COLUMN_TYPES.items()}
+        self._length = 0
+        # Row -> FOE text of rows whose FOE the number and decimals cannot rebuild
+        self._texts: Dict[int, str] = {}
+        self._errors: Dict[int, str] = {}
+
+    @classmethod
+    def from_results(cls, rows: Sequence[Dict[str, Any]], results: Sequence[Dict[str, Any]]) -> "ResultStore":
+        """Store for input rows and their result dicts"""
+        store = cls(len(results))
+        for row, result in zip(rows, results):
+            store.append(row, result.get(FOE_COLUMN, ""), result.get(ERROR_COLUMN, ""))
+        return store
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> "ResultRow":
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("result index out of range")
+        return ResultRow(self, index)
+
+    def __iter__(self) -> Iterator["ResultRow"]:
+        return (ResultRow(self, index) for index in range(self._length))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns (filled or not)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def append(
+        self,
+        inputs: Dict[str, Any],
+        foe: Any,
+        error: str = "",
+        source: str = "",
+        seconds: float = 0.0,
+    ) -> int:
+        """Add the next row; returns its index"""
+        inputs = row_inputs(inputs)
+        index = self._length
+        if index == len(self._columns["foe"]):
+            self._grow()
+        columns = self._columns
+        columns["mode"][index] = MODES.index(inputs["mode"])
+        for key in INPUT_FIELDS:
+            columns[key][index] = _number(inputs.get(key, ""))
+        value = self._put_foe(index, foe)
+        if error:
+            columns["status"][index] = FAILED
+            self._errors[index] = str(error)
+        elif math.isnan(value):
+            columns["status"][index] = NOT_A_NUMBER
+        else:
+            columns["status"][index] = OK
+        columns["source"][index] = SOURCES.index(source) if source in SOURCES else 0
+        columns["seconds"][index] = seconds
+        self._length = index + 1
+        return index
+
+    def write(self, record: Dict[str, Any]):
+        """Append an export record (see result_export.export_record)"""
+        self.append(
+            record,
+            record.get(FOE_COLUMN, ""),
+            record.get("error", ""),
+            record.get("source", ""),
+            float(record.get("seconds") or 0.0),
+        )
+
+    def append_not_run(self, inputs: Dict[str, Any]) -> int:
+        """Add a row that has no result; returns its index"""
+        index = self.append(inputs, "")
+        self._columns["status"][index] = NOT_RUN
+        return index
+
+    def _put_foe(self, index: int, foe: Any) -> float:
+        """Store a row's FOE as a number, and its text when the number cannot rebuild it"""
+        value = _number(foe)
+        text = "" if foe is None else str(foe)
+        decimals = _decimals(text)
+        self._columns["foe"][index] = value
+        self._texts.pop(index, None)
+        if not math.isnan(value) and decimals <= MAX_DECIMALS and format(value, f".{decimals}f") == text:
+            self._columns["decimals"][index] = decimals
+        elif text:
+            self._texts[index] = text
+        return value
+
+    def _grow(self):
+        for name, column in self._columns.items():
+            larger = np.empty(2 * len(column), column.dtype)
+            larger[:len(column)] = column
+            self._columns[name] = larger
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of the filled part of a column (no copy)"""
+        view = self._columns[name][:self._length]
+        view.flags.writeable = False
+        return view
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Read-only views of every column, all of the same length"""
+        length = self._length
+        views = {}
+        for name, column in self._columns.items():
+            views[name] = column[:length]
+            views[name].flags.writeable = False
+        return views
+
+    def load(self) -> np.ndarray:
+        """Surface weight or WOB of every row, whichever its mode sets"""
+        mode = self.column("mode")
+        load = np.full(len(mode), math.nan)
+        for code, name in enumerate(MODES):
+            field = ROW_MODES[name][1][1]
+            rows = mode == code
+            load[rows] = self.column(field)[rows]
+        return load
+
+    def foe_text(self, index: int) -> str:
+        """FOE as text, as Orpheus showed it and as it appears in a result dict"""
+        text = self._texts.get(index)
+        if text is not None:
+            return text
+        if self._columns["status"][index] in (OK, CORRECTED):
+            return format(self._columns["foe"][index], f".{self._columns['decimals'][index]}f")
+        return ""
+
+    def error(self, index: int) -> str:
+        return self._errors.get(index, "")
+
+    def inputs(self, index: int) -> Dict[str, Any]:
+        """Input dict of a row: its mode and that mode's fields, as text"""
+        mode = MODES[self._columns["mode"][index]]
+        inputs: Dict[str, Any] = {"mode": mode}
+        inputs.update((key, _text(self._columns[key][index])) for key in ROW_MODES[mode][1])
+        return inputs
+
+    def count(self, status: int, start: int = 0) -> int:
+        """Rows from start on with the given status code"""
+        return int(np.count_nonzero(self.column("status")[start:] == status))
+
+    def correct(self, index: int, foe: Any):
+        """Replace a row's FOE with a verified number and clear any error"""
+        # Raises for anything but a number
+        parse_number(foe)
+        self._put_foe(index, foe)
+        self._columns["status"][index] = CORRECTED
+        self._errors.pop(index, None)
+
+    def table(self, headings: Sequence[str] = TABLE_HEADINGS) -> "TableRows":
+        """Rows as lists of display text, formatted only when accessed"""
+        return TableRows(self, headings)
+
+
+class OrderedStoreSink:
+    """
+    Result sink that appends to a store in input order: a record that
+    finishes before an earlier row waits until that row's record arrives
+    """
+
+    def __init__(self, store: ResultStore):
+        self.store = store
+        self._next_row = 1
+        self._pending: Dict[int, Dict[str, Any]] = {}
+
+    def write(self, record: Dict[str, Any]):
+        self._pending[record["row"]] = record
+        while self._next_row in self._pending:
+            self.store.write(self._pending.pop(self._next_row))
+            self._next_row += 1
+
+    def flush(self, rows: Sequence[Dict[str, Any]]):
+        """
+        Store the rows still waiting after a stop. Earlier rows of rows
+        (the batch's inputs) that never finished are stored as NOT_RUN.
+        """
+        if not self._pending:
+            return
+        for row in range(self._next_row, max(self._pending) + 1):
+            record = self._pending.pop(row, None)
+            if record is not None:
+                self.store.write(record)
+            else:
+                self.store.append_not_run(rows[row - 1])
+        self._next_row = row + 1
+
+
+class ResultRow(Mapping):
+    """
+    Read-only result of one row, usable wherever a result dict is read:
+    "WOB Buckeling", and "Error" for failed rows. Typed values are
+    attributes (depth, foe, status, seconds, ...).
+    """
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store: ResultStore, index: int):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key: str) -> Any:
+        if key == FOE_COLUMN:
+            return self.store.foe_text(self.index)
+        if key == ERROR_COLUMN and self.store.error(self.index):
+            return self.store.error(self.index)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield FOE_COLUMN
+        if self.store.error(self.index):
+            yield ERROR_COLUMN
+
+    def __len__(self) -> int:
+        return 2 if self.store.error(self.index) else 1
+
+    def __repr__(self) -> str:
+        return f"ResultRow({self.index}, {dict(self)!r})"
+
+    def _value(self, name: str) -> Any:
+        return self.store._columns[name][self.index]
+
+    @property
+    def mode(self) -> str:
+        return MODES[self._value("mode")]
+
+    @property
+    def depth(self) -> float:
+        return float(self._value("depth"))
+
+    @property
+    def surface_weight(self) -> float:
+        return float(self._value("surface_weight"))
+
+    @property
+    def wob(self) -> float:
+        return float(self._value("wob"))
+
+    @property
+    def foe(self) -> float:
+        return float(self._value("foe"))
+
+    @property
+    def status(self) -> str:
+        return STATUS_NAMES[self._value("status")]
+
+    @property
+    def source(self) -> str:
+        return SOURCES[self._value("source")]
+
+    @property
+    def seconds(self) -> float:
+        return float(self._value("seconds"))
+
+    @property
+    def inputs(self) -> Dict[str, Any]:
+        return self.store.inputs(self.index)
+
+
+class TableRows(Sequence):
+    """Lazy rows of display text for a results table or the clipboard"""
+
+    def __init__(self, store: ResultStore, headings: Sequence[str] = TABLE_HEADINGS):
+        self.store = store
+        self.headings = list(headings)
+        keys = {heading: key for key, heading in INPUT_COLUMNS}
+        self._keys = [keys.get(heading, heading) for heading in self.headings]
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        return self._row(index)
+
+    def _row(self, index: int) -> List[str]:
+        store = self.store
+        values: List[Any] = []
+        for key in self._keys:
+            if key == "Row":
+                values.append(index + 1)
+            elif key == "mode":
+                values.append(MODES[store._columns["mode"][index]])
+            elif key in INPUT_FIELDS:
+                values.append(_text(store._columns[key][index]))
+            elif key == FOE_COLUMN:
+                values.append(store.foe_text(index))
+            elif key == ERROR_COLUMN:
+                values.append(store.error(index))
+            else:
+                values.append("")
+        return values
+
@@ -0,0 +1,136 @@
+"""
+Results table for very large batches
+
+VirtualTable shows any sequence of rows, e.g. the lazily formatted rows of a
+ResultStore that the automation thread appends to, and only materializes
+the Treeview items that fit on screen. The GUI refreshes it on a fixed frame
+timer instead of scheduling one Tk callback per result, so memory and redraw
+cost stay flat however many results a batch produces.
+"""
+from __future__ import annotations
+
+import tkinter as tk
+from tkinter import ttk
+from typing import Any, Sequence
+
+
+DEFAULT_ROW_HEIGHT = 20
+
+
+class VirtualTable(ttk.Frame):
+    """
+    Read-only table that only creates Treeview items for the visible rows.
+
+    While scrolled to the bottom the newest rows stay in view as they are
+    appended; scrolling up stops following until the bottom is reached again.
+    """
+
+    def __init__(self, parent: tk.Misc, column_width: int = 160):
+        super().__init__(parent)
+        self.column_width = column_width
+        self.tree = ttk.Treeview(self, columns=(), show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        try:
+            self.row_height = int(ttk.Style(self).lookup("Treeview", "rowheight") or DEFAULT_ROW_HEIGHT)
+        except (tk.TclError, ValueError):
+            self.row_height = DEFAULT_ROW_HEIGHT
+
+        self.rows: Sequence[Sequence[Any]] = []
+        self.first = 0
+        self.visible = 1
+        self.follow = True
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(3))
+        self._redraw()
+
+    def set_columns(self, columns: Sequence[str]):
+        """Replace the columns; existing rows are kept"""
+        self.tree.configure(columns=list(columns))
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=self.column_width, anchor=tk.CENTER)
+
+    def set_rows(self, rows: Sequence[Sequence[Any]]):
+        """Show rows of column values; call refresh() after rows grew or changed"""
+        self.rows = rows
+        self.first = 0
+        self.follow = True
+        self.refresh()
+
+    def refresh(self):
+        """Redraw the visible rows, following the newest ones while at the bottom"""
+        first_rows = not self.tree.get_children() and len(self.rows) > 0
+        if self.follow:
+            self.first = max(0, len(self.rows) - self.visible)
+        self._redraw()
+        if first_rows:
+            # Re-fit once a real row can be measured
+            self.after_idle(lambda: self._fit(self.tree.winfo_height()))
+
+    def clear(self):
+        """Remove every row and column"""
+        self.rows = []
+        self.first = 0
+        self.follow = True
+        self.tree.configure(columns=())
+        self._redraw()
+
+    def scroll_to(self, first: int):
+        last_start = max(0, len(self.rows) - self.visible)
+        self.first = min(max(0, first), last_start)
+        self.follow = self.first >= last_start
+        self._redraw()
+
+    def scroll_by(self, count: int):
+        self.scroll_to(self.first + count)
+
+    def _on_scrollbar(self, action: str, amount: str, unit: str = "units"):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = int(amount) * (self.visible if unit == "pages" else 1)
+            self.scroll_by(step)
+
+    def _on_mousewheel(self, event: tk.Event):
+        # Windows reports multiples of 120 per notch
+        self.scroll_by(-3 * int(event.delta / 120) if event.delta else 0)
+
+    def _on_configure(self, event: tk.Event):
+        self._fit(event.height)
+
+    def _fit(self, height: int):
+        """Size the visible window to height pixels"""
+        # Measure a drawn row when there is one; its top edge is the heading height
+        heading_height = self.row_height
+        children = self.tree.get_children()
+        box = self.tree.bbox(children[0]) if children else None
+        if box:
+            heading_height, self.row_height = box[1], max(1, box[3])
+        visible = max(1, (height - heading_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.scroll_to(len(self.rows) if self.follow else self.first)
+
+    def _redraw(self):
+        """Reuse the existing items for the rows in the visible window"""
+        window = self.rows[self.first:self.first + self.visible]
+        items = self.tree.get_children()
+        for idx, values in enumerate(window):
+            if idx < len(items):
+                self.tree.item(items[idx], values=list(values))
+            else:
+                self.tree.insert("", tk.END, values=list(values))
+        if len(items) > len(window):
+            self.tree.delete(*items[len(window):])
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + len(window)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,238 @@
+"""
+Post-batch verification of FOE results
+
+A stale or half-updated FOE read does not fail a row; it just leaves a
+wrong number. find_suspects looks for the traces such a value leaves, over
+the whole batch at once:
+
+- FOE that is not a number
+- FOE that runs against the trend of its neighbours: rows with the same
+  mode and depth sorted by load (or the same load sorted by depth) whose
+  FOE steps the other way than the group as a whole
+- the same FOE for different inputs (a stale read repeats another row's value)
+
+verify_results re-runs a sample of the suspects, plus an optional random
+audit of unflagged rows, through Orpheus without the result cache, and
+reports which stored results did not reproduce. Those are corrected in the
+results (and in the cache) for every row with the same inputs.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from input_values import parse_number, row_inputs
+from result_store import ResultStore
+
+
+# Suspect flags, combined bitwise per row
+NON_NUMERIC = 1
+NON_MONOTONIC = 2
+DUPLICATE = 4
+FLAG_NAMES = {NON_NUMERIC: "not a number", NON_MONOTONIC: "against trend", DUPLICATE: "duplicate value"}
+
+DEFAULT_SAMPLE_SIZE = 50
+# Re-run FOE within this of the stored value confirms it (FOE is shown to 0.1)
+DEFAULT_TOLERANCE = 0.1
+
+
+def describe_flags(flags: int) -> str:
+    """"against trend, duplicate value" for a flag combination"""
+    return ", ".join(name for flag, name in FLAG_NAMES.items() if flags & flag)
+
+
+def _number(value: Any) -> float:
+    try:
+        return parse_number(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def find_suspects(results: ResultStore) -> np.ndarray:
+    """Suspect flags per stored result (0 = nothing suspicious)"""
+    mode, depth, load, foe = results.column("mode"), results.column("depth"), results.load(), results.column("foe")
+    numeric = np.isfinite(foe)
+    flags = np.where(numeric, 0, NON_NUMERIC).astype(np.uint8)
+    flags[_against_trend(mode, depth, load, foe)] |= NON_MONOTONIC
+    flags[_against_trend(mode, load, depth, foe)] |= NON_MONOTONIC
+    flags[_duplicated_values(_input_ids(mode, depth, load), foe, numeric)] |= DUPLICATE
+    return flags
+
+
+def _input_ids(mode: np.ndarray, depth: np.ndarray, load: np.ndarray) -> np.ndarray:
+    """Same number for rows with the same inputs"""
+    if not len(mode):
+        return np.zeros(0, dtype=np.intp)
+    _, ids = np.unique(np.column_stack((mode, depth, load)), axis=0, return_inverse=True)
+    return ids.ravel()
+
+
+def _against_trend(mode: np.ndarray, group: np.ndarray, axis: np.ndarray, foe: np.ndarray) -> np.ndarray:
+    """Rows at either end of a step against their group's overall FOE trend along axis"""
+    order = np.lexsort((axis, group, mode))
+    m, g, a, f = mode[order], group[order], axis[order], foe[order]
+    step = f[1:] - f[:-1]
+    same_group = (m[1:] == m[:-1]) & (g[1:] == g[:-1])
+    valid = same_group & (a[1:] != a[:-1]) & np.isfinite(step)
+
+    # Group number of every step; trend is the sign of the group's total change
+    group_id = np.concatenate(([0], np.cumsum(~same_group)))[:-1]
+    groups = group_id[-1] + 1 if step.size else 0
+    trend = np.sign(np.bincount(group_id[valid], weights=step[valid], minlength=groups))
+    # A trend needs at least two steps to be meaningful
+    steps_per_group = np.bincount(group_id[valid], minlength=groups)
+    against = valid & (steps_per_group[group_id] >= 2) & (np.sign(step) == -trend[group_id]) & (trend[group_id] != 0)
+
+    flagged = np.zeros(len(foe), dtype=bool)
+    at = np.flatnonzero(against)
+    flagged[order[at]] = True
+    flagged[order[at + 1]] = True
+    return flagged
+
+
+def _duplicated_values(input_id: np.ndarray, foe: np.ndarray, numeric: np.ndarray) -> np.ndarray:
+    """Rows whose FOE also occurs for different inputs"""
+    flagged = np.zeros(len(foe), dtype=bool)
+    if not numeric.any():
+        return flagged
+    where = np.flatnonzero(numeric)
+    _, value_id = np.unique(foe[where], return_inverse=True)
+    pairs = np.unique(np.column_stack((value_id, input_id[where])), axis=0)
+    distinct_inputs = np.bincount(pairs[:, 0])
+    flagged[where] = distinct_inputs[value_id] > 1
+    return flagged
+
+
+def sample_rows(
+    flags: np.ndarray,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    audit_size: int = 0,
+    seed: Optional[int] = None,
+) -> tuple:
+    """(suspect rows, audit rows) to re-run: random samples of flagged and unflagged rows"""
+    rng = np.random.default_rng(seed)
+    suspects = np.flatnonzero(flags)
+    clean = np.flatnonzero(flags == 0)
+    if suspects.size > sample_size:
+        suspects = rng.choice(suspects, sample_size, replace=False)
+    audit = rng.choice(clean, min(audit_size, clean.size), replace=False) if audit_size else clean[:0]
+    return sorted(int(idx) for idx in suspects), sorted(int(idx) for idx in audit)
+
+
+@dataclass
+class VerificationReport:
+    flags: np.ndarray
+    checked: List[int] = field(default_factory=list)
+    audited: List[int] = field(default_factory=list)
+    # Row -> FOE measured again, for every row that was re-run
+    rerun: Dict[int, Any] = field(default_factory=dict)
+    # Rows whose stored FOE did not reproduce, and every row sharing their inputs
+    mismatched: List[int] = field(default_factory=list)
+    corrected: List[int] = field(default_factory=list)
+
+    @property
+    def suspects(self) -> int:
+        return int(np.count_nonzero(self.flags))
+
+    def summary(self, max_rows: int = 10) -> str:
+        counts = {name: int(np.count_nonzero(self.flags & flag)) for flag, name in FLAG_NAMES.items()}
+        detail = ", ".join(f"{count} {name}" for name, count in counts.items() if count)
+        lines = [f"{self.suspects} of {len(self.flags)} results flagged" + (f" ({detail})." if detail else ".")]
+        lines.append(
+            f"Re-ran {len(self.checked)} suspect and {len(self.audited)} audit rows: "
+            f"{len(self.mismatched)} did not reproduce, {len(self.corrected)} results corrected."
+        )
+        for idx in self.mismatched[:max_rows]:
+            lines.append(f"Row {idx + 1}: now {self.rerun.get(idx, '')!r} ({describe_flags(int(self.flags[idx])) or 'audit'})")
+        if len(self.mismatched) > max_rows:
+            lines.append(f"... and {len(self.mismatched) - max_rows} more")
+        return "\n".join(lines)
+
+
+def verify_results(
+    rows: Sequence[Dict[str, Any]],
+    results: Union[ResultStore, List[Dict[str, Any]]],
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+    audit_size: int = 0,
+    tolerance: float = DEFAULT_TOLERANCE,
+    seed: Optional[int] = None,
+    cache: Optional[Any] = None,
+    apply: bool = True,
+    status_callback: Optional[Callable[[str], None]] = None,
+    **batch_kwargs: Any,
+) -> VerificationReport:
+    """
+    Flag suspect results, re-run a sample of them in Orpheus and compare.
+
+    Parameters
+    ----------
+    rows : Sequence[Dict[str, Any]]
+        Inputs of a finished batch
+    results : Union[ResultStore, List[Dict[str, Any]]]
+        Its results in input order: the store run_automation_batch returned,
+        or result dicts
+    sample_size : int
+        Suspect rows re-run at most (a random sample when there are more)
+    audit_size : int
+        Unflagged rows re-run at random as a spot check
+    tolerance : float
+        Re-run FOE within this of the stored FOE confirms it
+    cache : Optional[ResultCache]
+        Bypassed for the re-run; results that did not reproduce are replaced
+        in it
+    apply : bool
+        Correct results of rows that did not reproduce (ResultStore.correct,
+        or a new "WOB Buckeling" and no "Error" in result dicts)
+    **batch_kwargs
+        Passed to run_automation_batch (repo, row_timeout, cancel_token, ...)
+    """
+    from Automation import cache_key_inputs, run_automation_batch
+
+    store = results if isinstance(results, ResultStore) else ResultStore.from_results(rows, results)
+    flags = find_suspects(store)
+    checked, audited = sample_rows(flags, sample_size, audit_size, seed)
+    report = VerificationReport(flags=flags, checked=checked, audited=audited)
+    selected = sorted(set(checked) | set(audited))
+    if not selected:
+        return report
+    if status_callback:
+        status_callback(f"Verifying {len(selected)} of {len(results)} results ({report.suspects} flagged)...")
+
+    repo = batch_kwargs.pop("repo", None)
+    if repo is None:
+        from Button_Repository import Button_Repository
+        repo = Button_Repository()
+    batch_kwargs.pop("cache", None)
+    # No cache and no journal: every selected row is measured again
+    again = run_automation_batch(
+        [rows[idx] for idx in selected], status_callback=status_callback, repo=repo, **batch_kwargs
+    )
+
+    input_ids = _input_ids(store.column("mode"), store.column("depth"), store.load())
+    model = repo.Model_Fingerprint() if cache is not None else ""
+
+    for idx, result in zip(selected, again):
+        if result.get("Error"):
+            continue
+        new_foe = result.get("WOB Buckeling")
+        report.rerun[idx] = new_foe
+        old, new = float(store.column("foe")[idx]), _number(new_foe)
+        if math.isfinite(old) and math.isfinite(new) and abs(old - new) <= tolerance:
+            continue
+        same_inputs = [int(row_idx) for row_idx in np.flatnonzero(input_ids == input_ids[idx])]
+        report.mismatched.extend(same_inputs)
+        if apply and math.isfinite(new):
+            for row_idx in same_inputs:
+                store.correct(row_idx, new_foe)
+                if store is not results:
+                    results[row_idx]["WOB Buckeling"] = new_foe
+                    results[row_idx].pop("Error", None)
+            report.corrected.extend(same_inputs)
+            if cache is not None:
+                cache.put(model, cache_key_inputs(row_inputs(rows[idx])), new_foe)
+    report.mismatched = sorted(set(report.mismatched))
+    report.corrected = sorted(set(report.corrected))
+    return report
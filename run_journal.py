@@ -0,0 +1,174 @@
+"""
+Crash-safe run journal
+
+Every completed row is appended to a JSON-lines file and fsync'd before the
+engine moves on, so a batch interrupted by an Orpheus hang or a reboot can be
+resumed: completed rows are answered from the journal and the run continues
+from the first unfinished row.
+
+File layout (one JSON object per line):
+    {"type": "run", "started": ..., "rows": [...] | null, "meta": {...}}
+    {"type": "row", "index": 0, "inputs": {...}, "result": {...}, "timestamp": ...}
+    ...
+    {"type": "end", "completed": N, "timestamp": ...}
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app_paths import app_data_dir
+from input_values import canonical_inputs, row_inputs
+
+
+KEEP_JOURNALS = 20
+
+
+def journal_dir() -> Path:
+    path = app_data_dir() / "journals"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _inputs_key(inputs: Dict[str, Any]) -> str:
+    # Mode and that mode's inputs only, so journals written before rows had a mode still resume
+    try:
+        return canonical_inputs(row_inputs(inputs))
+    except (TypeError, ValueError):
+        return json.dumps(inputs, sort_keys=True)
+
+
+class RunJournal:
+    """Append-only journal of one batch run"""
+
+    def __init__(self, path: Path, header: Dict[str, Any], entries: Dict[int, Dict[str, Any]], finished: bool):
+        self.path = Path(path)
+        self.header = header
+        self.entries = entries
+        self.finished = finished
+        self._handle = open(self.path, "a", encoding="utf-8")
+
+    @classmethod
+    def create(
+        cls,
+        path: Optional[Path] = None,
+        rows: Optional[List[Dict[str, Any]]] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> "RunJournal":
+        """
+        Start a new journal. Pass rows to store the full input list so the
+        run can later be resumed without the original input (GUI).
+        """
+        if path is None:
+            _prune_old_journals()
+            path = journal_dir() / f"run-{datetime.now():%Y%m%d-%H%M%S-%f}.jsonl"
+        header = {
+            "type": "run",
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "rows": rows,
+            "meta": meta or {},
+        }
+        journal = cls(path, header, {}, finished=False)
+        journal._append(header)
+        return journal
+
+    @classmethod
+    def open(cls, path: Path) -> "RunJournal":
+        """Load an existing journal for resuming; a torn final line is ignored"""
+        header: Dict[str, Any] = {}
+        entries: Dict[int, Dict[str, Any]] = {}
+        finished = False
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line from a crash
+                kind = record.get("type")
+                if kind == "run":
+                    header = record
+                elif kind == "row":
+                    entries[int(record["index"])] = record
+                elif kind == "end":
+                    finished = True
+        if not header:
+            raise ValueError(f"{path} is not a run journal")
+        journal = cls(path, header, entries, finished)
+        journal._terminate_torn_line()
+        return journal
+
+    @staticmethod
+    def latest(directory: Optional[Path] = None) -> Optional[Path]:
+        """Most recent journal file, or None"""
+        journals = sorted((directory or journal_dir()).glob("run-*.jsonl"))
+        return journals[-1] if journals else None
+
+    @property
+    def rows(self) -> Optional[List[Dict[str, Any]]]:
+        """Input rows stored when the journal was created, if any"""
+        return self.header.get("rows")
+
+    @property
+    def completed(self) -> int:
+        return len(self.entries)
+
+    def completed_result(self, index: int, inputs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Journaled result for row index, if it was run with the same inputs"""
+        entry = self.entries.get(index)
+        if entry is None or _inputs_key(entry["inputs"]) != _inputs_key(inputs):
+            return None
+        return entry["result"]
+
+    def record(self, index: int, inputs: Dict[str, Any], result: Dict[str, Any]):
+        """Durably append one completed row"""
+        entry = {
+            "type": "row",
+            "index": index,
+            "inputs": inputs,
+            "result": result,
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+        }
+        self._append(entry)
+        self.entries[index] = entry
+
+    def finish(self):
+        """Mark the run as complete so it is not offered for resume"""
+        self._append({
+            "type": "end",
+            "completed": self.completed,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        })
+        self.finished = True
+
+    def close(self):
+        if not self._handle.closed:
+            self._handle.close()
+
+    def _append(self, record: Dict[str, Any]):
+        self._handle.write(json.dumps(record) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+
+    def _terminate_torn_line(self):
+        """Make sure new records start on a fresh line after a crash mid-write"""
+        if self.path.stat().st_size == 0:
+            return
+        with open(self.path, "rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            if handle.read(1) != b"\n":
+                self._handle.write("\n")
+                self._handle.flush()
+
+
+def _prune_old_journals():
+    journals = sorted(journal_dir().glob("run-*.jsonl"))
+    for path in journals[:-KEEP_JOURNALS]:
+        # The GUI keeps each run's result export next to its journal
+        for stale in (path, path.with_suffix(".csv")):
+            try:
+                stale.unlink()
+            except OSError:
+                pass
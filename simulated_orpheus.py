@@ -0,0 +1,223 @@
+"""
+Simulated Orpheus session
+
+Pure-Python stand-in implementing AutomationBackend. FOE is a deterministic
+function of the inputs, and every operation can be given a latency with
+random jitter so engine changes can be tested and benchmarked off Windows.
+Like the real application, Refresh returns immediately and the FOE field is
+rewritten once the simulated calculation finishes. Warning dialogs can be
+injected to exercise the engine's recovery.
+"""
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from input_values import parse_number
+
+
+# Seconds per operation. "refresh" is the calculation time after Refresh.
+DEFAULT_LATENCY = {
+    "click": 0.0,
+    "type": 0.0,
+    "read": 0.0,
+    "refresh": 0.0,
+}
+
+
+def simulated_foe(mode: str, depth: float, load: float) -> float:
+    """Deterministic, smooth but non-linear FOE for a depth and surface weight/WOB"""
+    if mode == "bottom_up":
+        return load * 1.12 + depth * 3.1 - 0.00085 * depth ** 1.5
+    return load * 0.82 - depth * 9.4 + 0.0021 * depth ** 1.5 + 450.0 * math.sin(depth / 900.0)
+
+
+class SimulatedDialogError(RuntimeError):
+    """Raised for input while a simulated warning dialog is open"""
+
+
+class SimulatedOrpheus:
+    """
+    In-process Orpheus model for tests and benchmarks.
+
+    Parameters
+    ----------
+    latency : Optional[Dict[str, float]]
+        Seconds for "click", "type", "read" and "refresh" (calculation time)
+    jitter : float
+        Relative random jitter applied to each latency (0.2 = +/-20%)
+    seed : int
+        Seed for the jitter so runs are reproducible
+    depth, surface_weight, wob : float
+        Initial inputs shown in the window
+    model : str
+        Value returned by Model_Fingerprint
+    dialog_every : int
+        Every Nth Refresh opens a warning dialog instead of calculating; until
+        Dismiss_Dialogs() is called, clicks and typing raise
+        SimulatedDialogError (0 = never)
+    """
+
+    def __init__(
+        self,
+        latency: Optional[Dict[str, float]] = None,
+        jitter: float = 0.0,
+        seed: int = 0,
+        depth: float = 5000.0,
+        surface_weight: float = 100000.0,
+        wob: float = 20000.0,
+        model: str = "simulated",
+        dialog_every: int = 0,
+    ):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.jitter = jitter
+        self.model = model
+        self.dialog_every = dialog_every
+        self.dialog_open = False
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[], None]] = []
+        self._pending: Optional[threading.Timer] = None
+        self.mode = "surface_weight"
+        self.fields = {
+            "txtDepth": self._format(depth),
+            "txtSW": self._format(surface_weight),
+            "txtWOB": self._format(wob),
+            "txtFOE": "",
+        }
+        self.calls: Dict[str, int] = {}
+        self._calculate()
+
+    # -- AutomationBackend -------------------------------------------------
+
+    def Surface_Weight_Button(self):
+        self._op("Surface_Weight_Button", "click")
+        self.mode = "surface_weight"
+
+    def Bottom_Up_Button(self):
+        self._op("Bottom_Up_Button", "click")
+        self.mode = "bottom_up"
+
+    def Surface_Weight_Button_Value(self, value):
+        self._op("Surface_Weight_Button_Value", "type")
+        self.fields["txtSW"] = str(value)
+
+    def Depth_Value(self, value):
+        self._op("Depth_Value", "type")
+        self.fields["txtDepth"] = str(value)
+
+    def WOB_input_box(self, value):
+        self._op("WOB_input_box", "type")
+        self.fields["txtWOB"] = str(value)
+
+    def Depth_Value_get(self):
+        self._op("Depth_Value_get", "read")
+        return self.fields["txtDepth"]
+
+    def Surface_Load(self):
+        self._op("Surface_Load", "read")
+        return self.fields["txtSW"]
+
+    def FOE_Value(self):
+        self._op("FOE_Value", "read")
+        with self._lock:
+            return self.fields["txtFOE"]
+
+    def Refresh(self):
+        self._op("Refresh", "click")
+        if self.dialog_every and self.calls["Refresh"] % self.dialog_every == 0:
+            self.dialog_open = True
+            return
+        delay = self._delay("refresh")
+        with self._lock:
+            if self._pending is not None:
+                self._pending.cancel()
+            if delay <= 0:
+                self._pending = None
+            else:
+                self._pending = threading.Timer(delay, self._finish_refresh)
+                self._pending.daemon = True
+                self._pending.start()
+        if delay <= 0:
+            self._finish_refresh()
+
+    def Model_Fingerprint(self):
+        return self.model
+
+    def Dismiss_Dialogs(self):
+        """Close the injected warning dialog, like Button_Repository.Dismiss_Dialogs"""
+        dismissed = int(self.dialog_open)
+        self.dialog_open = False
+        return dismissed
+
+    def Reconnect(self):
+        self.calls["Reconnect"] = self.calls.get("Reconnect", 0) + 1
+
+    def Snapshot(self):
+        """All field values and the selected mode in one read, like Button_Repository.Snapshot"""
+        self._op("Snapshot", "read")
+        with self._lock:
+            return {
+                "surface_weight": self.fields["txtSW"],
+                "depth": self.fields["txtDepth"],
+                "wob": self.fields["txtWOB"],
+                "foe": self.fields["txtFOE"],
+                "mode": self.mode,
+            }
+
+    def subscribe_value_changed(self, path: str, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call callback when the FOE field is rewritten (only txtFOE/txtData is supported)"""
+        if not path.startswith("txtFOE"):
+            raise ValueError(f"Simulator only publishes FOE changes, not {path}")
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    # -- Simulation --------------------------------------------------------
+
+    def _op(self, name: str, kind: str):
+        if self.dialog_open and kind in ("click", "type"):
+            raise SimulatedDialogError(f"{name}: a warning dialog is open")
+        self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self._delay(kind)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _delay(self, kind: str) -> float:
+        base = self.latency.get(kind, 0.0)
+        if base <= 0:
+            return 0.0
+        if self.jitter:
+            base *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, base)
+
+    def _finish_refresh(self):
+        with self._lock:
+            self._pending = None
+            self._calculate()
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback()
+
+    def _calculate(self):
+        try:
+            depth = parse_number(self.fields["txtDepth"])
+            load_field = "txtWOB" if self.mode == "bottom_up" else "txtSW"
+            load = parse_number(self.fields[load_field])
+        except ValueError:
+            self.fields["txtFOE"] = "#ERR"
+            return
+        self.fields["txtFOE"] = self._format(simulated_foe(self.mode, depth, load))
+
+    @staticmethod
+    def _format(value: float) -> str:
+        return f"{value:.1f}"
@@ -0,0 +1,238 @@
+"""
+Surrogate (interpolation) mode for dense depth x surface weight grids
+
+Instead of driving Orpheus once per query point, a sparse anchor grid is
+evaluated through the real UI and a bilinear interpolant is fitted to it.
+The whole query set is then answered in one vectorized call. Cells whose
+estimated interpolation error exceeds the tolerance are refined with extra
+anchor lines and re-measured, for a bounded number of rounds.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from input_values import parse_number
+
+# Interpolated FOE is given to the precision Orpheus shows
+INTERPOLATED_FORMAT = ".1f"
+
+
+def _axis_curvature(values: np.ndarray, coords: np.ndarray, axis: int) -> np.ndarray:
+    """|second derivative| along axis at each node; zero when the axis has < 3 nodes"""
+    if coords.size < 3:
+        return np.zeros_like(values)
+    first = np.gradient(values, coords, axis=axis)
+    return np.abs(np.gradient(first, coords, axis=axis))
+
+
+class GridInterpolant:
+    """
+    Bilinear interpolant over a rectilinear (depth, surface_weight) anchor grid.
+
+    Parameters
+    ----------
+    depths, weights : Sequence[float]
+        Strictly increasing anchor coordinates. A single coordinate is
+        allowed; the interpolant is then constant along that axis.
+    values : np.ndarray
+        FOE at each anchor, shape (len(depths), len(weights))
+    """
+
+    def __init__(self, depths: Sequence[float], weights: Sequence[float], values: np.ndarray):
+        self.depths = np.asarray(depths, dtype=float)
+        self.weights = np.asarray(weights, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        if self.depths.size == 1:
+            self.depths = np.append(self.depths, self.depths[0] + 1.0)
+            self.values = np.repeat(self.values, 2, axis=0)
+        if self.weights.size == 1:
+            self.weights = np.append(self.weights, self.weights[0] + 1.0)
+            self.values = np.repeat(self.values, 2, axis=1)
+
+        # Bilinear error bound per cell: h^2/8 * max |f''| over the cell corners
+        depth_curv = _axis_curvature(self.values, self.depths, 0)
+        weight_curv = _axis_curvature(self.values, self.weights, 1)
+        hd = np.diff(self.depths)[:, None]
+        hw = np.diff(self.weights)[None, :]
+        self.depth_error = hd ** 2 / 8 * self._cell_max(depth_curv)
+        self.weight_error = hw ** 2 / 8 * self._cell_max(weight_curv)
+        # Cells touching an unmeasured anchor have unknown error
+        unknown = self._cell_max(np.isnan(self.values).astype(float)) > 0
+        self.depth_error[unknown] = np.inf
+        self.weight_error[unknown] = np.inf
+
+    @staticmethod
+    def _cell_max(node_values: np.ndarray) -> np.ndarray:
+        return np.maximum.reduce([
+            node_values[:-1, :-1], node_values[1:, :-1], node_values[:-1, 1:], node_values[1:, 1:]
+        ])
+
+    def cells(self, depths: np.ndarray, weights: np.ndarray):
+        i = np.clip(np.searchsorted(self.depths, depths, side="right") - 1, 0, self.depths.size - 2)
+        j = np.clip(np.searchsorted(self.weights, weights, side="right") - 1, 0, self.weights.size - 2)
+        return i, j
+
+    def __call__(self, depths: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        i, j = self.cells(depths, weights)
+        td = (depths - self.depths[i]) / (self.depths[i + 1] - self.depths[i])
+        tw = (weights - self.weights[j]) / (self.weights[j + 1] - self.weights[j])
+        v = self.values
+        return ((1 - td) * (1 - tw) * v[i, j] + td * (1 - tw) * v[i + 1, j]
+                + (1 - td) * tw * v[i, j + 1] + td * tw * v[i + 1, j + 1])
+
+    def error_estimate(self, depths: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        i, j = self.cells(depths, weights)
+        return self.depth_error[i, j] + self.weight_error[i, j]
+
+
+def _initial_axis(values: np.ndarray, count: int) -> np.ndarray:
+    """count evenly spread anchors over the query range, snapped to query values"""
+    unique = np.unique(values)
+    if unique.size <= count:
+        return unique
+    picks = np.linspace(0, unique.size - 1, count).round().astype(int)
+    return unique[np.unique(picks)]
+
+
+def _midpoints(axis: np.ndarray, cells: np.ndarray, query_axis: np.ndarray) -> np.ndarray:
+    """Query value nearest the middle of each selected anchor interval"""
+    unique = np.unique(query_axis)
+    mids = (axis[cells] + axis[cells + 1]) / 2
+    nearest = unique[np.clip(np.searchsorted(unique, mids), 0, unique.size - 1)]
+    inside = (nearest > axis[cells]) & (nearest < axis[cells + 1])
+    return np.unique(nearest[inside])
+
+
+def _default_evaluate(**batch_kwargs) -> Callable[[List[Dict[str, Any]]], List[Any]]:
+    def evaluate(rows: List[Dict[str, Any]]) -> List[Any]:
+        from Automation import run_automation_batch
+        results = run_automation_batch(rows, **batch_kwargs)
+        return [result.get("WOB Buckeling") for result in results]
+    return evaluate
+
+
+def run_surrogate_batch(
+    data_list: List[Dict[str, Any]],
+    tolerance: float,
+    anchors_per_axis: int = 5,
+    max_rounds: int = 4,
+    max_anchors: int = 400,
+    evaluate: Optional[Callable[[List[Dict[str, Any]]], List[Any]]] = None,
+    status_callback: Optional[Callable[[str], None]] = None,
+    **batch_kwargs: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Answer a dense set of (depth, surface_weight) rows from a refined anchor grid.
+
+    Parameters
+    ----------
+    data_list : List[Dict[str, Any]]
+        Query rows with 'depth' and 'surface_weight' keys
+    tolerance : float
+        Largest acceptable estimated FOE interpolation error
+    anchors_per_axis : int
+        Anchors per axis in the initial sparse grid
+    max_rounds : int
+        Refinement rounds after the initial grid
+    max_anchors : int
+        Upper bound on anchors measured through the UI
+    evaluate : Optional[Callable[[List[Dict[str, Any]]], List[Any]]]
+        Measures FOE for a list of rows. Defaults to run_automation_batch,
+        which receives status_callback and any extra keyword arguments.
+    status_callback : Optional[Callable[[str], None]]
+        Function to call with status updates
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        One result per query row, in input order, with "WOB Buckeling"
+        (as Orpheus showed it for measured rows), "Source" ("measured" or
+        "interpolated") and "Error Estimate"
+    """
+    if evaluate is None:
+        evaluate = _default_evaluate(status_callback=status_callback, **batch_kwargs)
+
+    depths = np.array([parse_number(row.get("depth", "")) for row in data_list], dtype=float)
+    weights = np.array([parse_number(row.get("surface_weight", "")) for row in data_list], dtype=float)
+    if depths.size == 0:
+        return []
+
+    depth_axis = _initial_axis(depths, anchors_per_axis)
+    weight_axis = _initial_axis(weights, anchors_per_axis)
+    measured: Dict[tuple, float] = {}
+    # FOE of every anchor as Orpheus showed it
+    readings: Dict[tuple, Any] = {}
+
+    def measure_missing():
+        missing = [(d, w) for d in depth_axis for w in weight_axis if (d, w) not in measured]
+        missing = missing[:max(0, max_anchors - len(measured))]
+        if not missing:
+            return
+        if status_callback:
+            status_callback(f"Measuring {len(missing)} anchor points...")
+        values = evaluate([{"depth": repr(float(d)), "surface_weight": repr(float(w))} for d, w in missing])
+        for point, value in zip(missing, values):
+            readings[point] = "" if value is None else value
+            try:
+                measured[point] = parse_number(value)
+            except (TypeError, ValueError):
+                measured[point] = float("nan")
+
+    def fit() -> GridInterpolant:
+        grid = np.array(
+            [[measured.get((d, w), np.nan) for w in weight_axis] for d in depth_axis], dtype=float
+        )
+        return GridInterpolant(depth_axis, weight_axis, grid)
+
+    measure_missing()
+    interpolant = fit()
+    on_grid = np.isin(depths, depth_axis) & np.isin(weights, weight_axis)
+
+    for round_number in range(max_rounds):
+        if len(measured) >= max_anchors:
+            break
+        errors = np.where(on_grid, 0.0, interpolant.error_estimate(depths, weights))
+        too_far = errors > tolerance
+        if not too_far.any():
+            break
+
+        i, j = interpolant.cells(depths[too_far], weights[too_far])
+        by_depth = interpolant.depth_error[i, j] >= interpolant.weight_error[i, j]
+        if depth_axis.size < 2:
+            by_depth[:] = False
+        elif weight_axis.size < 2:
+            by_depth[:] = True
+        new_depths = _midpoints(depth_axis, np.unique(i[by_depth]), depths)
+        new_weights = _midpoints(weight_axis, np.unique(j[~by_depth]), weights)
+        if new_depths.size == 0 and new_weights.size == 0:
+            break
+        if status_callback:
+            status_callback(f"Refinement round {round_number + 1}: {int(too_far.sum())} points above tolerance")
+
+        depth_axis = np.union1d(depth_axis, new_depths)
+        weight_axis = np.union1d(weight_axis, new_weights)
+        measure_missing()
+        interpolant = fit()
+        on_grid = np.isin(depths, depth_axis) & np.isin(weights, weight_axis)
+
+    foe = interpolant(depths, weights)
+    errors = interpolant.error_estimate(depths, weights)
+
+    results = []
+    for idx, (d, w) in enumerate(zip(depths, weights)):
+        point = (d, w)
+        if point in measured:
+            value, source, error = readings[point], "measured", 0.0
+        else:
+            value = "" if np.isnan(foe[idx]) else format(foe[idx], INTERPOLATED_FORMAT)
+            source, error = "interpolated", errors[idx]
+        results.append({
+            "WOB Buckeling": value,
+            "Source": source,
+            "Error Estimate": f"{error:.3g}",
+        })
+    if status_callback:
+        status_callback(f"Answered {len(results)} rows from {len(measured)} measured anchors")
+    return results
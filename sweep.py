@@ -0,0 +1,302 @@
+"""
+Parameter sweeps and threshold search
+
+Grid sweeps generate depth x surface weight rows lazily from range specs
+("4000:6000:25" or "4000,4500,5000") and stream them through the batch
+engine in chunks, so no input table is needed. Threshold search finds, per
+depth, the surface weight at which FOE reaches a target: the weight range is
+bracketed and narrowed with a safeguarded secant (Illinois) step, which
+needs about log2(range / tolerance) Refreshes per depth or fewer.
+
+    python sweep.py grid --depths 4000:6000:25 --weights 90000:150000:500 grid.csv
+    python sweep.py threshold --depths 4000:8000:250 --target 50000 \\
+        --low 50000 --high 300000 --tolerance 50 thresholds.csv
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from input_values import parse_number
+
+
+def format_number(value: float) -> str:
+    """Shortest text for an input value ("5000", "137500.5")"""
+    return format(value, ".15g")
+
+
+def parse_range(spec: str) -> List[float]:
+    """
+    Values of a range spec: "start:stop:step" (stop included when it lies
+    on the step) or a comma-separated list "4000,4500,5200".
+    """
+    if ":" not in spec:
+        return [parse_number(part) for part in spec.split(",") if part.strip()]
+    parts = spec.split(":")
+    if len(parts) != 3:
+        raise ValueError(f"Range spec must be start:stop:step, not {spec!r}")
+    start, stop, step = (parse_number(part) for part in parts)
+    if step == 0 or (stop - start) / step < 0:
+        raise ValueError(f"Step of {spec!r} does not lead from start to stop")
+    # Multiples of step avoid accumulating float error over long ranges
+    count = int(math.floor((stop - start) / step + 1e-9)) + 1
+    return [start + index * step for index in range(count)]
+
+
+def grid_rows(depths: Sequence[float], weights: Sequence[float]) -> Iterator[Dict[str, str]]:
+    """
+    Lazily yield every depth x weight row. Weights run up and down
+    alternately (serpentine), so consecutive rows differ in one input.
+    """
+    forward = [format_number(weight) for weight in weights]
+    backward = forward[::-1]
+    for number, depth in enumerate(depths):
+        depth_text = format_number(depth)
+        for weight in (backward if number % 2 else forward):
+            yield {"depth": depth_text, "surface_weight": weight}
+
+
+def run_grid_sweep(
+    depths: Sequence[float],
+    weights: Sequence[float],
+    chunk_size: int = 500,
+    **batch_kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Stream a grid through iter_automation_batch; yields rows with their FOE"""
+    from Automation import iter_automation_batch
+
+    rows = grid_rows(depths, weights)
+    pending: "deque[Dict[str, str]]" = deque()
+
+    def feed() -> Iterator[Dict[str, str]]:
+        for row in rows:
+            pending.append(row)
+            yield row
+
+    for result in iter_automation_batch(feed(), chunk_size=chunk_size, **batch_kwargs):
+        yield dict(pending.popleft(), **result)
+
+
+class ThresholdSearch:
+    """
+    Root finding for FOE(weight) = target at one depth.
+
+    Both ends of [low, high] are measured first; if FOE - target has the same
+    sign at both, there is no crossing to find. Otherwise the bracket is
+    narrowed with Illinois-modified regula falsi steps, falling back to
+    bisection whenever a step would not land strictly inside the bracket.
+    Stops when |FOE - target| <= tolerance, the bracket is narrower than
+    weight_tolerance, or after max_evaluations.
+    """
+
+    def __init__(
+        self,
+        depth: float,
+        target: float,
+        low: float,
+        high: float,
+        tolerance: float,
+        weight_tolerance: float = 1.0,
+        max_evaluations: int = 40,
+    ):
+        self.depth = depth
+        self.target = target
+        self.tolerance = tolerance
+        self.weight_tolerance = weight_tolerance
+        self.max_evaluations = max_evaluations
+        self.evaluations: List[tuple] = []
+        self.status = "searching"
+        self.best: Optional[tuple] = None
+        # Bracket ends as [weight, FOE - target]; None until measured
+        self._ends: List[Optional[List[float]]] = [None, None]
+        self._initial = [low, high]
+        self._stale_side: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status != "searching"
+
+    def next_weight(self) -> float:
+        """Weight to measure next"""
+        if self._initial:
+            return self._initial[0]
+        (w_low, g_low), (w_high, g_high) = self._ends
+        candidate = w_high - g_high * (w_high - w_low) / (g_high - g_low) if g_high != g_low else None
+        if candidate is None or not (min(w_low, w_high) < candidate < max(w_low, w_high)):
+            candidate = (w_low + w_high) / 2
+        return candidate
+
+    def record(self, weight: float, foe: Any):
+        """Add the FOE measured at weight and update the bracket"""
+        try:
+            value = parse_number(foe)
+        except (TypeError, ValueError):
+            self.evaluations.append((weight, foe))
+            self.status = "failed"
+            return
+        self.evaluations.append((weight, value))
+        residual = value - self.target
+        if self.best is None or abs(residual) < abs(self.best[1] - self.target):
+            self.best = (weight, value)
+
+        if self._initial:
+            self._ends[2 - len(self._initial)] = [weight, residual]
+            self._initial.pop(0)
+            if abs(residual) <= self.tolerance:
+                self.status = "converged"
+            elif not self._initial and self._ends[0][1] * self._ends[1][1] > 0:
+                self.status = "not bracketed"
+            self._check_budget()
+            return
+
+        if abs(residual) <= self.tolerance:
+            self.status = "converged"
+            return
+        # Replace the end with the same sign; halve the other end's residual if
+        # the same side was kept twice running (Illinois), so it cannot stall
+        side = 0 if residual * self._ends[0][1] > 0 else 1
+        self._ends[side] = [weight, residual]
+        if self._stale_side == 1 - side:
+            self._ends[1 - side][1] /= 2
+        self._stale_side = 1 - side
+        if abs(self._ends[1][0] - self._ends[0][0]) <= self.weight_tolerance:
+            self.status = "bracket closed"
+        self._check_budget()
+
+    def _check_budget(self):
+        if not self.done and len(self.evaluations) >= self.max_evaluations:
+            self.status = "max evaluations"
+
+    def result(self) -> Dict[str, Any]:
+        weight, foe = self.best if self.best is not None else ("", "")
+        return {
+            "depth": format_number(self.depth),
+            "surface_weight": format_number(weight) if weight != "" else "",
+            "WOB Buckeling": foe,
+            "evaluations": len(self.evaluations),
+            "status": self.status,
+        }
+
+
+def run_threshold_search(
+    depths: Iterable[float],
+    target: float,
+    low: float,
+    high: float,
+    tolerance: float,
+    weight_tolerance: float = 1.0,
+    max_evaluations: int = 40,
+    **batch_kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield ThresholdSearch.result() for each depth.
+
+    The next weight depends on the FOE just measured, so rows are generated
+    one at a time and fed to iter_automation_batch with chunk_size=1; the
+    Orpheus connection, result cache and completion waiter are shared by all
+    depths.
+    """
+    from Automation import iter_automation_batch
+
+    searches: List[ThresholdSearch] = []
+    asked: List[float] = []
+
+    def feed() -> Iterator[Dict[str, str]]:
+        for depth in depths:
+            search = ThresholdSearch(depth, target, low, high, tolerance, weight_tolerance, max_evaluations)
+            searches.append(search)
+            while not search.done:
+                weight = search.next_weight()
+                asked.append(weight)
+                yield {"depth": format_number(depth), "surface_weight": format_number(weight)}
+
+    for result in iter_automation_batch(feed(), chunk_size=1, **batch_kwargs):
+        # The engine only pulls the next row after this result was consumed
+        search = searches[-1]
+        search.record(asked.pop(0), result.get("WOB Buckeling"))
+        if search.done:
+            yield search.result()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Depth x surface weight sweeps and FOE threshold search.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    grid = sub.add_parser("grid", help="Evaluate every depth x surface weight combination")
+    grid.add_argument("--depths", required=True, help="Range spec, e.g. 4000:6000:25 or 4000,4500")
+    grid.add_argument("--weights", required=True, help="Range spec, e.g. 90000:150000:500")
+    grid.add_argument("--chunk-size", type=int, default=500, help="Rows planned together (default 500)")
+
+    threshold = sub.add_parser("threshold", help="Find the surface weight where FOE reaches a target")
+    threshold.add_argument("--depths", required=True, help="Range spec, e.g. 4000:8000:250")
+    threshold.add_argument("--target", type=float, required=True, help="FOE to reach")
+    threshold.add_argument("--low", type=float, required=True, help="Lowest surface weight to consider")
+    threshold.add_argument("--high", type=float, required=True, help="Highest surface weight to consider")
+    threshold.add_argument("--tolerance", type=float, required=True, help="Accept |FOE - target| <= this")
+    threshold.add_argument("--weight-tolerance", type=float, default=1.0,
+                           help="Stop once the weight bracket is this narrow (default 1)")
+    threshold.add_argument("--max-evaluations", type=int, default=40, help="Refreshes per depth (default 40)")
+
+    for mode in (grid, threshold):
+        mode.add_argument("output", type=Path, help="CSV or XLSX file to write")
+        mode.add_argument("--cache", action="store_true",
+                          help="Answer rows already calculated for the loaded model from the result cache")
+        mode.add_argument("--simulate", action="store_true",
+                          help="Run against SimulatedOrpheus to try out a spec without Orpheus")
+        mode.add_argument("--quiet", action="store_true", help="Only print errors")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    from cli import open_writer
+
+    try:
+        depths = parse_range(args.depths)
+        weights = parse_range(args.weights) if args.mode == "grid" else []
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+
+    batch_kwargs: Dict[str, Any] = {}
+    if not args.quiet:
+        batch_kwargs["status_callback"] = lambda message: print(message, flush=True)
+    if args.cache:
+        from result_cache import ResultCache
+        batch_kwargs["cache"] = ResultCache()
+    if args.simulate:
+        from simulated_orpheus import SimulatedOrpheus
+        batch_kwargs["repo"] = SimulatedOrpheus()
+
+    if args.mode == "grid":
+        columns = ["depth", "surface_weight", "WOB Buckeling"]
+        records = run_grid_sweep(depths, weights, chunk_size=args.chunk_size, **batch_kwargs)
+    else:
+        columns = ["depth", "surface_weight", "WOB Buckeling", "evaluations", "status"]
+        records = run_threshold_search(
+            depths, args.target, args.low, args.high, args.tolerance,
+            args.weight_tolerance, args.max_evaluations, **batch_kwargs
+        )
+
+    writer = open_writer(args.output, columns)
+    written = 0
+    try:
+        for record in records:
+            writer.write([record.get(col, "") for col in columns])
+            written += 1
+    except KeyboardInterrupt:
+        print(f"Interrupted after {written} rows", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+    if not args.quiet:
+        print(f"Wrote {written} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
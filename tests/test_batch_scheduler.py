@@ -0,0 +1,72 @@
+from batch_scheduler import OrderedResults, plan_batch, row_key
+
+
+def test_plan_batch_collapses_duplicate_rows():
+    rows = [
+        {"depth": "5374", "surface_weight": "138661.3"},
+        {"depth": "5206", "surface_weight": "135469.6"},
+        {"depth": "5,374.0", "surface_weight": " 138661.30 "},
+        {"mode": "bottom_up", "depth": "5374", "wob": "138661.3"},
+    ]
+    plan = plan_batch(rows)
+
+    assert plan.total_rows == 4
+    assert plan.duplicate_rows == 1
+    assert sorted(step.row_indices for step in plan.steps) == [[0, 2], [1], [3]]
+    assert row_key(rows[0]) == row_key(rows[2]) != row_key(rows[3])
+
+
+def test_plan_batch_groups_modes_and_sweeps_serpentine():
+    rows = [
+        {"depth": depth, "surface_weight": weight}
+        for weight in ("100", "200")
+        for depth in ("3", "1", "2")
+    ]
+    rows.append({"mode": "bottom_up", "depth": "1", "wob": "50"})
+    plan = plan_batch(rows, {"mode": "bottom_up"})
+
+    keys = [(step.key[0], float(step.key[1]), float(step.key[2])) for step in plan.steps]
+    # Mode Orpheus is in first; then grouped on the input with fewer values, swept up and down
+    assert keys == [
+        ("bottom_up", 1, 50),
+        ("surface_weight", 1, 100), ("surface_weight", 2, 100), ("surface_weight", 3, 100),
+        ("surface_weight", 3, 200), ("surface_weight", 2, 200), ("surface_weight", 1, 200),
+    ]
+
+
+def test_plan_batch_does_not_start_with_the_inputs_already_shown():
+    rows = [{"depth": "1", "surface_weight": "100"}, {"depth": "2", "surface_weight": "100"}]
+    plan = plan_batch(rows, {"mode": "surface_weight", "depth": "1", "surface_weight": "100"})
+
+    assert [step.row_indices for step in plan.steps] == [[1], [0]]
+
+
+def test_ordered_results_release_in_input_order():
+    rows = [{"depth": str(depth), "surface_weight": "100"} for depth in (3, 2, 1, 2)]
+    plan = plan_batch(rows)
+    released = []
+    ordered = OrderedResults(plan.total_rows, released.append)
+
+    # Planned ascending: depth 1 (row 2), depth 2 (rows 1 and 3), depth 3 (row 0)
+    ordered.add(plan.steps[0], {"WOB Buckeling": "1"})
+    ordered.add(plan.steps[1], {"WOB Buckeling": "2"})
+    assert released == []
+    assert ordered.held_back == 3
+
+    ordered.add(plan.steps[2], {"WOB Buckeling": "3"})
+    assert [result["WOB Buckeling"] for result in released] == ["3", "2", "1", "2"]
+    assert ordered.held_back == 0
+
+
+def test_ordered_results_hold_back_rows_after_a_gap_when_stopped():
+    plan = plan_batch([{"depth": str(depth), "surface_weight": "100"} for depth in (3, 1, 2)])
+    released = []
+    ordered = OrderedResults(plan.total_rows, released.append)
+
+    # Stopped after two steps: rows 1 and 2 are done, row 0 is not
+    for step in plan.steps[:2]:
+        ordered.add(step, {"WOB Buckeling": step.key[1]})
+
+    assert released == []
+    assert ordered.results == []
+    assert ordered.held_back == 2
@@ -0,0 +1,62 @@
+from Automation import iter_automation_batch, run_automation_batch
+from run_journal import RunJournal
+from simulated_orpheus import SimulatedOrpheus, simulated_foe
+
+ROWS = [
+    {"depth": "6200", "surface_weight": "140000"},
+    {"depth": "5800", "surface_weight": "140000"},
+    {"depth": "6200", "surface_weight": "140,000.0"},
+    {"depth": "5400", "surface_weight": "140000"},
+    {"mode": "bottom_up", "depth": "5400", "wob": "30000"},
+    {"depth": "5000", "surface_weight": "140000"},
+]
+
+
+def expected_foe(row):
+    mode = row.get("mode", "surface_weight")
+    load = row["wob" if mode == "bottom_up" else "surface_weight"].replace(",", "")
+    return f"{simulated_foe(mode, float(row['depth']), float(load)):.1f}"
+
+
+def test_results_come_back_in_input_order_with_duplicates_run_once():
+    repo = SimulatedOrpheus()
+    results = list(iter_automation_batch(ROWS, repo=repo))
+
+    assert [result["WOB Buckeling"] for result in results] == [expected_foe(row) for row in ROWS]
+    assert repo.calls["Refresh"] == len(ROWS) - 1
+
+
+def test_stopped_batch_keeps_finished_rows_and_marks_the_rest_not_run():
+    repo = SimulatedOrpheus()
+    # The plan sweeps depth upwards, so the last surface weight rows finish first
+    store = run_automation_batch(ROWS, repo=repo, stop_check=lambda: repo.calls.get("Refresh", 0) >= 3)
+
+    statuses = [store[i].status for i in range(len(store))]
+    assert "ok" in statuses and "not run" in statuses
+    for i, status in enumerate(statuses):
+        if status == "ok":
+            assert store[i]["WOB Buckeling"] == expected_foe(ROWS[i])
+        else:
+            assert status == "not run"
+            assert store[i]["WOB Buckeling"] == ""
+
+
+def test_interrupted_run_resumes_from_its_journal(tmp_path):
+    path = tmp_path / "run.jsonl"
+    journal = RunJournal.create(path, rows=ROWS)
+    repo = SimulatedOrpheus()
+    list(iter_automation_batch(ROWS, repo=repo, journal=journal, stop_check=lambda: repo.calls.get("Refresh", 0) >= 2))
+    journal.close()
+    assert not RunJournal.open(path).finished
+
+    journal = RunJournal.open(path)
+    done = journal.completed
+    assert done
+    repo = SimulatedOrpheus()
+    results = list(iter_automation_batch(journal.rows, repo=repo, journal=journal))
+    journal.close()
+
+    assert [result["WOB Buckeling"] for result in results] == [expected_foe(row) for row in ROWS]
+    # Only the rows missing from the journal were calculated again
+    assert repo.calls["Refresh"] == len(ROWS) - 1 - 2
+    assert RunJournal.open(path).finished
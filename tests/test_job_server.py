@@ -0,0 +1,91 @@
+import pytest
+
+from job_server import JobQueue
+from simulated_orpheus import SimulatedOrpheus, simulated_foe
+
+
+class RecordingOrpheus(SimulatedOrpheus):
+    """Simulator that remembers the depth of every Refresh"""
+
+    def __init__(self):
+        super().__init__()
+        self.refreshed = []
+
+    def Refresh(self):
+        self.refreshed.append(float(self.fields["txtDepth"]))
+        super().Refresh()
+
+
+def rows(*depths, weight="140000"):
+    return [{"depth": str(depth), "surface_weight": weight} for depth in depths]
+
+
+@pytest.fixture
+def repo():
+    return RecordingOrpheus()
+
+
+@pytest.fixture
+def queue(repo):
+    queue = JobQueue(backend_factory=lambda: repo, round_rows=2)
+    yield queue
+    queue.close()
+
+
+def test_higher_priority_job_runs_first(queue, repo):
+    low = queue.submit(rows(6100, 6200, 6300, 6400), priority=0, owner="low")
+    high = queue.submit(rows(5100, 5200, 5300, 5400), priority=5, owner="high")
+    queue.start()
+
+    high_results = list(high.stream(poll=0.1))
+    low_results = list(low.stream(poll=0.1))
+
+    assert high.status == low.status == "done"
+    assert sorted(repo.refreshed[:4]) == [5100, 5200, 5300, 5400]
+    assert sorted(repo.refreshed[4:]) == [6100, 6200, 6300, 6400]
+    assert [record["row"] for record in high_results] == [1, 2, 3, 4]
+    assert [record["depth"] for record in low_results] == ["6100", "6200", "6300", "6400"]
+
+
+def test_rows_shared_by_jobs_are_calculated_once(queue, repo):
+    first = queue.submit(rows(5100, 5200, 5300))
+    second = queue.submit(rows(5300, 5100, 5400))
+    queue.start()
+
+    first_results = list(first.stream(poll=0.1))
+    second_results = list(second.stream(poll=0.1))
+
+    assert sorted(repo.refreshed) == [5100, 5200, 5300, 5400]
+    for results in (first_results, second_results):
+        for record in results:
+            expected = simulated_foe("surface_weight", float(record["depth"]), 140000.0)
+            assert record["WOB Buckeling"] == f"{expected:.1f}"
+            assert not record["error"]
+
+
+def test_rejected_rows_are_answered_without_running(queue, repo):
+    job = queue.submit(rows(5100) + [{"depth": "deep", "surface_weight": "140000"}])
+    queue.start()
+
+    results = list(job.stream(poll=0.1))
+
+    assert repo.refreshed == [5100]
+    assert results[0]["WOB Buckeling"] and not results[0]["error"]
+    assert results[1]["WOB Buckeling"] == "" and results[1]["error"]
+
+
+def test_failed_round_answers_its_rows_with_the_error():
+    def connect():
+        raise RuntimeError("Orpheus window not found")
+
+    queue = JobQueue(backend_factory=connect, round_rows=2)
+    job = queue.submit(rows(5100))
+    queue.start()
+    try:
+        results = list(job.stream(poll=0.1))
+    finally:
+        queue.close()
+
+    assert results[0]["row"] == 1
+    assert results[0]["WOB Buckeling"] == ""
+    assert results[0]["error"] == "Orpheus window not found"
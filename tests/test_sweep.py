@@ -0,0 +1,37 @@
+from simulated_orpheus import SimulatedOrpheus, simulated_foe
+from sweep import run_grid_sweep, run_threshold_search
+
+
+def test_threshold_search_converges_on_the_simulator():
+    repo = SimulatedOrpheus()
+    results = list(run_threshold_search(
+        [4000, 5500, 7000], target=60000, low=50000, high=300000, tolerance=25, repo=repo
+    ))
+
+    assert [result["depth"] for result in results] == ["4000", "5500", "7000"]
+    for result in results:
+        assert result["status"] == "converged"
+        assert abs(float(result["WOB Buckeling"]) - 60000) <= 25
+        assert result["evaluations"] <= 10
+    assert repo.calls["Refresh"] == sum(result["evaluations"] for result in results)
+
+
+def test_threshold_search_reports_a_target_outside_the_bracket():
+    results = list(run_threshold_search(
+        [5000], target=10 ** 7, low=50000, high=300000, tolerance=25, repo=SimulatedOrpheus()
+    ))
+
+    assert results[0]["status"] == "not bracketed"
+    assert results[0]["evaluations"] == 2
+
+
+def test_grid_sweep_measures_every_point():
+    results = list(run_grid_sweep([4000, 5000], [120000, 150000], chunk_size=3, repo=SimulatedOrpheus()))
+
+    # Weights run up, then back down at the next depth
+    assert [(r["depth"], r["surface_weight"]) for r in results] == [
+        ("4000", "120000"), ("4000", "150000"), ("5000", "150000"), ("5000", "120000"),
+    ]
+    for r in results:
+        expected = simulated_foe("surface_weight", float(r["depth"]), float(r["surface_weight"]))
+        assert r["WOB Buckeling"] == f"{expected:.1f}"
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from updater import AutoUpdater, ChecksumMismatchError
+
+PAYLOAD = bytes(range(256)) * 1200
+ETAG = '"release-1"'
+
+
+class ReleaseServer(ThreadingHTTPServer):
+    """GitHub stand-in: release JSON with an ETag, a checksum asset and a ranged download"""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ReleaseHandler)
+        self.url = f"http://127.0.0.1:{self.server_port}"
+        self.checksum = hashlib.sha256(PAYLOAD).hexdigest()
+        self.requests = []
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        if self.path == "/release":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            release = {
+                "tag_name": "v99.0.0",
+                "assets": [
+                    {"name": "BuckelingAutomation.exe", "browser_download_url": f"{server.url}/app.exe"},
+                    {"name": "BuckelingAutomation.exe.sha256", "browser_download_url": f"{server.url}/app.sha256"},
+                ],
+            }
+            self._send(200, json.dumps(release).encode(), ETag=ETAG)
+        elif self.path == "/app.sha256":
+            self._send(200, f"{server.checksum}  BuckelingAutomation.exe\n".encode())
+        elif self.path == "/app.exe":
+            byte_range = self.headers.get("Range")
+            start = int(byte_range.split("=")[1].rstrip("-")) if byte_range else 0
+            self._send(206 if byte_range else 200, PAYLOAD[start:])
+        else:
+            self._send(404, b"")
+
+    def _send(self, status, body, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ReleaseServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def updater(server, tmp_path):
+    return AutoUpdater(api_url=f"{server.url}/release", cache_path=str(tmp_path / "update_check.json"))
+
+
+def release_requests(server):
+    return [headers for path, headers in server.requests if path == "/release"]
+
+
+def test_release_is_cached_and_revalidated_with_its_etag(server, updater):
+    assert updater.check_for_updates() == (True, "99.0.0", f"{server.url}/app.exe")
+    assert updater.checksum_url == f"{server.url}/app.sha256"
+
+    # Within the check interval GitHub is not asked again
+    assert updater.check_for_updates()[1] == "99.0.0"
+    assert len(release_requests(server)) == 1
+
+    # Afterwards the cached release is revalidated and a 304 keeps it
+    assert updater.check_for_updates(force=True)[1] == "99.0.0"
+    requests = release_requests(server)
+    assert len(requests) == 2
+    assert requests[1]["If-None-Match"] == ETAG
+
+
+def test_download_resumes_from_the_partial_file_and_verifies_sha256(server, updater, tmp_path):
+    updater.check_for_updates()
+    target = str(tmp_path / "BuckelingAutomation.exe")
+    with open(target + ".part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+    progress = []
+
+    checksum = updater.expected_checksum(updater.checksum_url, "BuckelingAutomation.exe")
+    updater.download_file(f"{server.url}/app.exe", target, checksum, lambda done, total: progress.append((done, total)))
+
+    with open(target, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(target + ".part")
+    downloads = [headers for path, headers in server.requests if path == "/app.exe"]
+    assert downloads[0]["Range"] == "bytes=1000-"
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+
+
+def test_checksum_mismatch_deletes_the_download(server, updater, tmp_path):
+    target = str(tmp_path / "BuckelingAutomation.exe")
+
+    with pytest.raises(ChecksumMismatchError):
+        updater.download_file(f"{server.url}/app.exe", target, "0" * 64)
+
+    assert not os.path.exists(target)
+    assert not os.path.exists(target + ".part")
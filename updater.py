@@ -3,16 +3,38 @@ Auto-updater for Buckeling Automation
 
 Checks GitHub releases for updates and provides functionality to download
 and install new versions automatically.
+
+Release metadata is cached with its ETag: GitHub is asked at most once per
+MIN_CHECK_INTERVAL, and then with If-None-Match so an unchanged release costs
+a 304. Downloads are streamed in chunks to a .part file that is resumed with
+a Range request after an interruption, and verified against the SHA-256 in
+the release's checksum asset (e.g. BuckelingAutomation.exe.sha256).
 """
 
+import urllib.error
 import urllib.request
+import hashlib
 import json
 import os
+import time
 import sys
 import subprocess
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from version import __version__
+from app_paths import app_data_dir
+
+
+# Seconds between two GitHub requests; within it the cached release is used
+MIN_CHECK_INTERVAL = 6 * 60 * 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+CHECKSUM_SUFFIXES = ('.sha256', '.sha256sum')
+CHECKSUM_NAMES = ('sha256sums', 'sha256sums.txt', 'checksums.txt')
+
+
+class ChecksumMismatchError(Exception):
+    """Raised when a downloaded file does not match the release checksum"""
 
 
 class AutoUpdater:
@@ -24,36 +46,95 @@ class AutoUpdater:
     # Create token at: https://github.com/settings/tokens (needs 'repo' scope)
     GITHUB_TOKEN = None  # Set to "ghp_yourtoken..." for private repos
     
-    def __init__(self):
+    def __init__(self, api_url=None, cache_path=None, min_check_interval=MIN_CHECK_INTERVAL):
+        """
+        api_url and cache_path default to the GitHub API and the per-user data
+        folder; tests point them at a local HTTP server and a temp file.
+        """
         self.current_version = __version__
+        self.api_url = api_url or self.GITHUB_API_URL
+        self.cache_path = cache_path or os.path.join(app_data_dir(), 'update_check.json')
+        self.min_check_interval = min_check_interval
+        # Set by check_for_updates from the release's checksum asset
+        self.checksum_url = None
     
-    def check_for_updates(self):
+    def _headers(self):
+        headers = {'User-Agent': 'BuckelingAutomation-Updater'}
+        if self.GITHUB_TOKEN:
+            headers['Authorization'] = f'token {self.GITHUB_TOKEN}'
+        return headers
+    
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_cache(self, cache):
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+        except OSError as e:
+            print(f"Could not cache release info: {e}")
+    
+    def fetch_release(self, force=False):
+        """
+        Latest release metadata, from the cache when it was checked less than
+        min_check_interval ago, otherwise with a conditional request
+        Returns: dict - GitHub release JSON
+        """
+        cache = self._load_cache()
+        release = cache.get('release')
+        fresh = time.time() - cache.get('checked', 0) < self.min_check_interval
+        if release is not None and fresh and not force:
+            return release
+        
+        headers = self._headers()
+        if release is not None and cache.get('etag'):
+            headers['If-None-Match'] = cache['etag']
+        req = urllib.request.Request(self.api_url, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=5) as response:
+                release = json.loads(response.read().decode())
+                cache = {'etag': response.headers.get('ETag'), 'release': release}
+        except urllib.error.HTTPError as e:
+            if e.code != 304 or release is None:
+                raise
+            # Not modified: the cached release is still the latest
+        cache['checked'] = time.time()
+        self._save_cache(cache)
+        return release
+    
+    def check_for_updates(self, force=False):
         """
         Check GitHub for the latest release
+        Pass force=True to ignore the minimum check interval
         Returns: (bool, str, str) - (update_available, latest_version, download_url)
         """
         try:
-            # Make request to GitHub API
-            headers = {'User-Agent': 'BuckelingAutomation-Updater'}
-            if self.GITHUB_TOKEN:
-                headers['Authorization'] = f'token {self.GITHUB_TOKEN}'
-            
-            req = urllib.request.Request(self.GITHUB_API_URL, headers=headers)
-            
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode())
+            data = self.fetch_release(force)
                 
             latest_version = data.get('tag_name', '').lstrip('v')
             
-            # Find the .exe asset in the release
+            # Find the .exe asset and its checksum in the release
             download_url = None
+            exe_name = None
             for asset in data.get('assets', []):
                 if asset['name'].endswith('.exe'):
                     download_url = asset['browser_download_url']
+                    exe_name = asset['name']
                     break
             
             if not download_url:
                 return False, latest_version, None
+            
+            self.checksum_url = None
+            for asset in data.get('assets', []):
+                name = asset['name'].lower()
+                if name in CHECKSUM_NAMES or name == exe_name.lower() + '.sha256' or (
+                        name.endswith(CHECKSUM_SUFFIXES) and self.checksum_url is None):
+                    self.checksum_url = asset['browser_download_url']
                 
             # Compare versions
             update_available = self._is_newer_version(latest_version, self.current_version)
@@ -80,11 +161,95 @@ class AutoUpdater:
         except:
             return False
     
-    def download_and_install_update(self, download_url, latest_version):
+    def expected_checksum(self, checksum_url, file_name):
+        """
+        SHA-256 of file_name from a checksum asset, either "<hash>  <name>"
+        lines (sha256sum format) or a single bare hash
+        Returns: str - lower-case hex digest
+        """
+        req = urllib.request.Request(checksum_url, headers={'User-Agent': 'BuckelingAutomation-Updater'})
+        with urllib.request.urlopen(req, timeout=10) as response:
+            text = response.read().decode('utf-8', 'replace')
+        
+        bare = []
+        for line in text.splitlines():
+            parts = line.strip().split()
+            if not parts or len(parts[0]) != 64:
+                continue
+            if len(parts) == 1:
+                bare.append(parts[0].lower())
+            elif parts[1].lstrip('*') == file_name:
+                return parts[0].lower()
+        if len(bare) == 1:
+            return bare[0]
+        raise ValueError(f"No SHA-256 for {file_name} in {checksum_url}")
+    
+    def _open_download(self, url, offset):
+        headers = {'User-Agent': 'BuckelingAutomation-Updater'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+        return urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=30)
+    
+    def download_file(self, url, path, expected_sha256=None, progress=None):
+        """
+        Stream url to path in chunks
+        Bytes left in path + '.part' by an interrupted download are kept and
+        only the remainder is requested (HTTP Range). progress(done, total) is
+        called after every chunk; total is None when the size is unknown.
+        Raises ChecksumMismatchError, after deleting the file, on a bad hash.
+        """
+        part = path + '.part'
+        done = os.path.getsize(part) if os.path.exists(part) else 0
+        try:
+            response = self._open_download(url, done)
+        except urllib.error.HTTPError as e:
+            if e.code != 416 or not done:
+                raise
+            # Range not satisfiable: the partial file is stale, start over
+            os.remove(part)
+            done = 0
+            response = self._open_download(url, done)
+        
+        with response:
+            if done and response.status != 206:
+                done = 0  # Server ignored the Range header and sent everything
+            length = response.headers.get('Content-Length')
+            total = done + int(length) if length else None
+            with open(part, 'ab' if done else 'wb') as f:
+                while True:
+                    chunk = response.read(DOWNLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+        if total is not None and done < total:
+            # Connection dropped; the .part file is kept and resumed next time
+            raise IOError(f"Download interrupted after {done} of {total} bytes")
+        
+        if expected_sha256:
+            digest = hashlib.sha256()
+            with open(part, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            if digest.hexdigest() != expected_sha256.lower():
+                os.remove(part)
+                raise ChecksumMismatchError(
+                    f"Downloaded file has SHA-256 {digest.hexdigest()}, expected {expected_sha256}"
+                )
+        os.replace(part, path)
+        return path
+    
+    def download_and_install_update(self, download_url, latest_version, progress=None, checksum_url=None):
         """
         Download the new version and replace the current executable
+        The download resumes a previous partial one and is checked against
+        checksum_url (default: the checksum asset found by check_for_updates).
+        progress(done_bytes, total_bytes) reports download progress.
         Returns: bool - Success status
         """
+        temp_exe = None
         try:
             # Get current executable path
             if getattr(sys, 'frozen', False):
@@ -99,7 +264,14 @@ class AutoUpdater:
             
             # Download new version
             print(f"Downloading update from {download_url}...")
-            urllib.request.urlretrieve(download_url, temp_exe)
+            checksum_url = checksum_url or self.checksum_url
+            expected = None
+            if checksum_url:
+                exe_name = urllib.request.url2pathname(download_url.rsplit('/', 1)[-1])
+                expected = self.expected_checksum(checksum_url, exe_name)
+            else:
+                print("Release has no checksum asset; download is not verified")
+            self.download_file(download_url, temp_exe, expected, progress)
             
             # Create batch file to replace the executable
             batch_file = os.path.join(exe_dir, 'update.bat')
@@ -122,22 +294,24 @@ del "%~f0"
             
         except Exception as e:
             print(f"Error installing update: {e}")
-            # Clean up temp files
-            if os.path.exists(temp_exe):
+            # Clean up temp files (a .part download is kept for resuming)
+            if temp_exe and os.path.exists(temp_exe):
                 try:
                     os.remove(temp_exe)
                 except:
                     pass
             return False
     
-    def prompt_user_for_update(self, latest_version, download_url):
+    def prompt_user_for_update(self, latest_version, download_url, parent=None):
         """
         Show dialog asking user if they want to update
+        Pass parent to show it over an existing window instead of a temporary one
         Returns: bool - Whether to proceed with update
         """
         # Create a temporary root window for the dialog
-        root = tk.Tk()
-        root.withdraw()
+        root = parent or tk.Tk()
+        if parent is None:
+            root.withdraw()
         
         message = (f"A new version is available!\n\n"
                   f"Current version: {self.current_version}\n"
@@ -148,10 +322,12 @@ del "%~f0"
         result = messagebox.askyesno(
             "Update Available",
             message,
-            icon='info'
+            icon='info',
+            parent=root
         )
         
-        root.destroy()
+        if parent is None:
+            root.destroy()
         return result
 
 
@@ -187,3 +363,59 @@ def check_and_update():
         print("No updates available.")
     
     return False
+
+
+def check_for_updates_in_background(root, status_callback=None, updater=None):
+    """
+    Check for updates without delaying startup
+    The GitHub request runs on a daemon thread and the answer is handed back
+    to root's event loop. If the user accepts, the download also runs in the
+    background, reporting progress to status_callback (which must be safe to
+    call from a worker thread), and root is closed once the installer has
+    been started.
+    Returns: threading.Thread - the update-check thread
+    """
+    updater = updater or AutoUpdater()
+
+    def check():
+        update_available, latest_version, download_url = updater.check_for_updates()
+        if update_available and download_url:
+            root.after(0, lambda: offer(latest_version, download_url))
+        else:
+            print("No updates available.")
+
+    def offer(latest_version, download_url):
+        print(f"Update available: {latest_version}")
+        if updater.prompt_user_for_update(latest_version, download_url, parent=root):
+            threading.Thread(target=install, args=(latest_version, download_url), daemon=True).start()
+
+    def install(latest_version, download_url):
+        shown = None
+
+        def progress(done, total):
+            nonlocal shown
+            if not status_callback:
+                return
+            if total:
+                percent = done * 100 // total
+                message = f"Downloading update {latest_version}: {percent}% of {total / 1e6:.1f} MB"
+            else:
+                message = f"Downloading update {latest_version}: {done / 1e6:.1f} MB"
+            if message != shown:
+                shown = message
+                status_callback(message)
+
+        if updater.download_and_install_update(download_url, latest_version, progress):
+            # Update is being installed, app should exit
+            root.after(0, root.destroy)
+        else:
+            root.after(0, lambda: messagebox.showerror(
+                "Update Failed",
+                "Failed to download or install the update. Please try again later.",
+                parent=root
+            ))
+
+    print(f"Checking for updates... (Current version: {updater.current_version})")
+    thread = threading.Thread(target=check, name="update-check", daemon=True)
+    thread.start()
+    return thread